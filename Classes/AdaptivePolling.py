@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+"""
+Class AdaptivePolling
+
+Description: Report aware ReadAttribute polling ( READ_ATTRIBUTES_REQUEST of Modules/heartbeat.py )
+
+An Attribute Report ( 0x8102 ) is as fresh as a Read Attribute response, so it refreshes the
+ReadAttributes['TimeStamps'] of its Ep/Cluster, and the next poll is postponed.
+
+The poll interval of each NwkId/Ep/Cluster is the READ_ATTRIBUTES_REQUEST one times a factor:
+    - the factor doubles, up to POLL_BACKOFF_MAX, each time the Cluster kept reporting during a full interval
+    - when a Cluster which used to report has to be polled, its reporting has gone silent: the factor drops to
+      1 / POLL_TIGHTEN, until a report comes again
+The interval is never below POLL_MIN_INTERVAL.
+"""
+
+import Domoticz
+
+from time import time
+
+POLL_BACKOFF_MAX = 8            # Max factor for the Clusters which report reliably
+POLL_TIGHTEN = 4                # Divider of the interval for the Clusters whose reporting went silent
+POLL_MIN_INTERVAL = 120         # sec
+
+
+class AdaptivePolling:
+
+    def __init__( self, ListOfDevices ):
+
+        self.ListOfDevices = ListOfDevices
+        self.Clusters = {}      # ( NwkId, Ep, Cluster ) -> { 'Factor', 'Reported', 'Changed' }
+
+    def _timeStampKey( self, ep, cluster ):
+        return ep + '-' + cluster.lower()
+
+    def reported( self, nwkid, ep, cluster ):
+        ' an Attribute Report was received, it counts as a fresh read '
+
+        if nwkid not in self.ListOfDevices:
+            return
+        now = int(time())
+        readAttributes = self.ListOfDevices[nwkid].setdefault( 'ReadAttributes', {} )
+        readAttributes.setdefault( 'Ep', {} )
+        readAttributes.setdefault( 'TimeStamps', {} )[ self._timeStampKey( ep, cluster ) ] = now
+
+        key = ( nwkid, ep, cluster.lower() )
+        if key not in self.Clusters:
+            self.Clusters[ key ] = { 'Factor': 1.0, 'Reported': now, 'Changed': now }
+            return
+        entry = self.Clusters[ key ]
+        entry['Reported'] = now
+        if entry['Factor'] < 1:
+            Domoticz.Debug("AdaptivePolling - %s/%s %s reporting again" %(nwkid, ep, cluster))
+            entry['Factor'] = 1.0
+            entry['Changed'] = now
+
+    def interval( self, nwkid, ep, cluster, base ):
+        ' return the poll interval, in sec, of the NwkId/Ep/Cluster '
+
+        entry = self.Clusters.get( ( nwkid, ep, cluster.lower() ) )
+        if entry is None:
+            return base
+        now = int(time())
+        if entry['Factor'] >= 1 and entry['Reported'] > entry['Changed'] and now >= entry['Changed'] + base * entry['Factor'] \
+                and entry['Factor'] < POLL_BACKOFF_MAX:
+            entry['Factor'] = min( entry['Factor'] * 2, POLL_BACKOFF_MAX )
+            entry['Changed'] = now
+            Domoticz.Debug("AdaptivePolling - %s/%s %s reports reliably, poll interval %s sec" %(nwkid, ep, cluster, int(base * entry['Factor'])))
+        return max( int(base * entry['Factor']), POLL_MIN_INTERVAL )
+
+    def polled( self, nwkid, ep, cluster ):
+        ' a ReadAttribute poll was sent. If the Cluster used to report, its reporting went silent '
+
+        entry = self.Clusters.get( ( nwkid, ep, cluster.lower() ) )
+        if entry is None or entry['Factor'] < 1:
+            return
+        Domoticz.Log("AdaptivePolling - %s/%s %s no report since %s sec, polling more often" \
+                %(nwkid, ep, cluster, int(time()) - entry['Reported']))
+        entry['Factor'] = 1 / POLL_TIGHTEN
+        entry['Changed'] = int(time())
+
+    def timeStamp( self, nwkid, ep, cluster ):
+        ' return the time of the last poll or report of the NwkId/Ep/Cluster, None if never '
+
+        timeStamps = self.ListOfDevices[nwkid].get( 'ReadAttributes', {} ).get( 'TimeStamps', {} )
+        timeStamp = timeStamps.get( self._timeStampKey( ep, cluster ) )
+        if timeStamp in ( None, {} ):
+            return None
+        return timeStamp
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+"""
+Class AdmissionControl
+
+Description: Airtime budget of the background requests ( token bucket )
+
+The Zigate and the network can take airtimeRate frames per second. Every command given to the Transport takes a
+token from a global bucket, which holds up to ADMISSION_BURST sec of frames. The user commands are never refused,
+and airtimeReserve % of the bucket is kept for them: a background request is only admitted while the bucket is
+above that reserve.
+
+Each background subsystem asks for its frames with admit( subsystem, frames ). The background rate is shared
+between the subsystems which asked for budget within the last ADMISSION_ACTIVE sec, according to their weight
+( ADMISSION_WEIGHTS ): a subsystem alone gets the whole background rate, several ones get their fair share.
+
+The frames admitted and refused are counted per subsystem. The frames not admitted by a subsystem ( user commands,
+retransmits, discovery ) are counted as 'Interactive'.
+"""
+
+import Domoticz
+
+from time import time
+
+ADMISSION_BURST = 5             # sec of airtimeRate the bucket holds
+ADMISSION_ACTIVE = 60           # sec, a subsystem which asked for budget since is sharing the background rate
+ADMISSION_DEBT = 2              # The bucket can go down to -ADMISSION_DEBT x capacity with the user commands
+
+INTERACTIVE = 'Interactive'
+
+# Background subsystems, and their weight in the share of the background rate
+ADMISSION_WEIGHTS = {
+    'WarmUp': 4,                # Start-up requests to the known devices
+    'ConfigureReporting': 3,
+    'Reporting': 3,             # Reconfiguration of the silent Attributes
+    'Groups': 3,
+    'Scenes': 2,                # Scene Membership checks
+    'ReadAttributes': 2,        # Polls
+    'RouteWarming': 2,
+    'LQI': 1,
+    'NetworkScan': 1,
+    }
+
+
+class AdmissionControl:
+
+    def __init__( self, pluginconf ):
+
+        self.pluginconf = pluginconf
+        self._tokens = self._capacity()
+        self._last = time()
+        self.Buckets = {}       # Subsystem -> { 'Tokens', 'Last', 'Requested' }
+        self.Stats = {}         # Subsystem -> { 'admitted', 'denied' } since the last snapshot
+        self.Totals = {}        # Subsystem -> { 'admitted', 'denied' } since the start
+        self._sent = 0          # Frames given to the Transport since the last snapshot
+
+    def _capacity( self ):
+        return max( 1, self.pluginconf.airtimeRate * ADMISSION_BURST )
+
+    def _refill( self, now ):
+
+        capacity = self._capacity()
+        self._tokens = min( self._tokens + ( now - self._last ) * self.pluginconf.airtimeRate, capacity )
+        self._last = now
+
+    def _count( self, subsystem, counter, frames ):
+
+        for stats in ( self.Stats, self.Totals ):
+            if subsystem not in stats:
+                stats[subsystem] = { 'admitted': 0, 'denied': 0 }
+            stats[subsystem][counter] += frames
+
+    def sent( self, frames=1 ):
+        ' a command was given to the Transport, it takes its airtime whatever its origin '
+
+        now = time()
+        self._refill( now )
+        self._tokens = max( self._tokens - frames, -ADMISSION_DEBT * self._capacity() )
+        self._sent += frames
+
+    def admit( self, subsystem, frames=1 ):
+        ' return True if the subsystem can send these frames now. The frames are then accounted to it '
+
+        if not self.pluginconf.airtimeRate:
+            self._count( subsystem, 'admitted', frames )
+            return True
+
+        now = time()
+        self._refill( now )
+        if subsystem not in self.Buckets:
+            self.Buckets[subsystem] = { 'Tokens': float(frames), 'Last': now, 'Requested': now }
+        bucket = self.Buckets[subsystem]
+        bucket['Requested'] = now
+
+        # Share of the background rate, among the active subsystems
+        weight = ADMISSION_WEIGHTS.get( subsystem, 1 )
+        active = sum( ADMISSION_WEIGHTS.get( other, 1 ) for other in self.Buckets
+                if now < self.Buckets[other]['Requested'] + ADMISSION_ACTIVE )
+        share = self.pluginconf.airtimeRate * ( 100 - self.pluginconf.airtimeReserve ) / 100 * weight / active
+        bucket['Tokens'] = min( bucket['Tokens'] + ( now - bucket['Last'] ) * share, max( frames, share * ADMISSION_BURST ))
+        bucket['Last'] = now
+
+        reserve = self._capacity() * self.pluginconf.airtimeReserve / 100
+        if self._tokens - frames < reserve or bucket['Tokens'] < frames:
+            self._count( subsystem, 'denied', frames )
+            return False
+        bucket['Tokens'] -= frames
+        self._count( subsystem, 'admitted', frames )
+        return True
+
+    def snapshot( self ):
+        ' return and reset the per subsystem counters, with the Interactive frames '
+
+        stats = self.Stats
+        background = sum( stats[subsystem]['admitted'] for subsystem in stats )
+        stats[INTERACTIVE] = { 'admitted': max( 0, self._sent - background ), 'denied': 0 }
+        self.Stats = {}
+        self._sent = 0
+        return stats
+
+    def writeReport( self, reportStore ):
+
+        reportStore.addAirtimeStats( self.snapshot() )
+
+    def printSummary( self ):
+
+        if not self.Totals:
+            return
+        Domoticz.Status("Airtime ( background frames admitted / refused ):")
+        for subsystem in sorted( self.Totals ):
+            Domoticz.Status("   %-18s: %s / %s" %(subsystem, self.Totals[subsystem]['admitted'], self.Totals[subsystem]['denied']))
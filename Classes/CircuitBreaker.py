@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+"""
+Class CircuitBreaker
+
+Description: Per device ( NwkId ) failure scoreboard, to stop the background traffic to unreachable devices
+
+The failures are:
+    - 0x8702 APS Data Confirm Fail for the device ( Decode8702 )
+    - 0x8000 with an error Status for a command addressed to the device ( Transport )
+    - a Data response which doesn't come in time for a command addressed to the device ( Transport )
+
+After breakerThreshold consecutive failures the circuit is open: the background traffic ( ReadAttribute polls,
+Configure Reporting ) is not sent anymore to the device, except one round of probes every probe interval. The
+interval starts at BREAKER_PROBE_MIN and doubles at each probe, up to BREAKER_PROBE_MAX.
+Any frame received from the device closes the circuit. Commands requested by the user are never blocked.
+"""
+
+import Domoticz
+
+from time import time
+
+BREAKER_PROBE_MIN = 60          # sec, first probe after the circuit opened
+BREAKER_PROBE_MAX = 3600        # sec, max interval between 2 probes
+
+# ZDP commands whose payload starts with the target NwkId. The ZCL/Group/Scene/IAS commands ( 0x0060 - 0x01FF, 0x0400,
+# 0x0530 ) start with an address mode and the target address
+ZDP_TARGET_COMMANDS = ( 0x0041, 0x0042, 0x0043, 0x0044, 0x0045, 0x004E )
+
+
+def commandTarget( cmd, datas ):
+    ' return the NwkId a command is sent to, None if not addressed to a single device by its NwkId '
+
+    iCmd = int(cmd, 16)
+    if iCmd in ZDP_TARGET_COMMANDS and len(datas) >= 4:
+        return datas[0:4]
+    if ( 0x0060 <= iCmd < 0x0200 or iCmd in ( 0x0400, 0x0530 ) ) and len(datas) >= 6 and datas[0:2] == '02':
+        return datas[2:6]
+    return None
+
+
+class CircuitBreaker:
+
+    def __init__( self, pluginconf ):
+
+        self.threshold = pluginconf.breakerThreshold
+        self.Circuits = {}      # NwkId -> { 'Failures', 'Open', 'Interval', 'NextProbe' }
+
+    def updateTunables( self, pluginconf ):
+        self.threshold = pluginconf.breakerThreshold
+
+    def failure( self, nwkid, reason ):
+        ' account a failure to reach the device '
+
+        if not self.threshold or nwkid in ( None, '0000', 'ffff' ):
+            return
+        if nwkid not in self.Circuits:
+            self.Circuits[nwkid] = { 'Failures': 0, 'Open': False, 'Interval': BREAKER_PROBE_MIN, 'NextProbe': 0 }
+        circuit = self.Circuits[nwkid]
+        circuit['Failures'] += 1
+        Domoticz.Debug("CircuitBreaker - %s failure %s ( %s )" %(nwkid, circuit['Failures'], reason))
+        if not circuit['Open'] and circuit['Failures'] >= self.threshold:
+            circuit['Open'] = True
+            circuit['NextProbe'] = time() + circuit['Interval']
+            Domoticz.Status("CircuitBreaker - %s unreachable after %s failures ( last: %s ), background requests suspended" \
+                    %(nwkid, circuit['Failures'], reason))
+
+    def heard( self, nwkid ):
+        ' a frame was received from the device, close its circuit '
+
+        if nwkid not in self.Circuits:
+            return
+        if self.Circuits[nwkid]['Open']:
+            Domoticz.Status("CircuitBreaker - %s is back, background requests resumed" %nwkid)
+        del self.Circuits[nwkid]
+
+    def isOpen( self, nwkid ):
+        return nwkid in self.Circuits and self.Circuits[nwkid]['Open']
+
+    def allow( self, nwkid ):
+        ' return True if background requests can be sent to the device now. An open circuit lets a probe go when due '
+
+        if not self.isOpen( nwkid ):
+            return True
+        circuit = self.Circuits[nwkid]
+        now = time()
+        if now < circuit['NextProbe']:
+            return False
+        circuit['Interval'] = min( circuit['Interval'] * 2, BREAKER_PROBE_MAX )
+        circuit['NextProbe'] = now + circuit['Interval']
+        Domoticz.Debug("CircuitBreaker - %s probe, next one in %s sec" %(nwkid, circuit['Interval']))
+        return True
+
+    def openCircuits( self ):
+        return [ nwkid for nwkid in self.Circuits if self.Circuits[nwkid]['Open'] ]
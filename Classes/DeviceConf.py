@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+"""
+Class DeviceConfIndex
+
+Description: Compiled representation of Conf/DeviceConf.txt
+
+The file is parsed without eval ( ast.literal_eval ) and each Model is compiled once into:
+    Models[Model] = { 'Type': global Type, 'HasType': True if the global Type is set in the file,
+                      'Ep': { ep: { 'Clusters': [], 'Type': '' or None, 'ColorMode': int or None } },
+                      'EpList': [ ep, ... ],
+                      'ProfileID', 'ZDeviceID',
+                      'Downsample': { Cluster: { 'MinInterval', 'Deadband', 'Average' } } }
+
+Model variants ( 'TRADFRI bulb E27 W opal 1000lm (new)' ) are resolved against the longest known Model which is a prefix
+of it, followed by a separator. The Manufacturer/ProfileID/ZDeviceID quirks are kept in a single index.
+
+The file is reloaded when its mtime changes, so new Models can be added without restarting the plugin.
+"""
+
+import Domoticz
+import ast
+import os.path
+
+DEVICECONF_FILENAME = "DeviceConf.txt"
+NOT_CLUSTERS = ( 'Type', 'ClusterType', 'ColorMode' )
+VARIANT_SEPARATORS = ( ' ', '-', '_', '/', '(' )   # '.' is not a separator, as it is part of the Xiaomi naming
+
+# Manufacturer ( 0x8042 code ), ProfileID, ZDeviceID quirks
+QUIRKS = [
+        { 'Manufacturer': '117c', 'ProfileID': 'c05e', 'ZDeviceID': '0830', 'Type': 'Ikea_Round_5b' },
+        { 'Manufacturer': '117c', 'ProfileID': 'c05e', 'ZDeviceID': '0820', 'Type': 'Ikea_Round_OnOff' },
+        ]
+
+# Manufacturer name ( from the Basic cluster ) quirks. Matched on a sub-string
+MANUFACTURER_NAME_QUIRKS = {
+        'LIVOLO': 'LivoloSWL/LivoloSWR',
+        }
+
+# ProfileID, ZDeviceID only. Used when the Manufacturer is not relevant ( TypeFromCluster )
+PROFILE_ZDEVICE_QUIRKS = { ( quirk['ProfileID'], quirk['ZDeviceID'] ): quirk['Type'] for quirk in QUIRKS }
+
+
+class DeviceConfIndex:
+
+    def __init__( self, PluginConf ):
+
+        self.pluginconf = PluginConf
+        self.filename = self.pluginconf.pluginConfig + DEVICECONF_FILENAME
+        self.mtime = None
+
+        self.DeviceConf = {}        # Raw ( but normalized ) content of DeviceConf.txt
+        self.Models = {}            # Compiled Models
+        self._resolved = {}         # Cache of Model variant -> Model
+
+        self.Quirks = {}
+        for quirk in QUIRKS:
+            self.Quirks[ ( quirk['Manufacturer'], quirk['ProfileID'], quirk['ZDeviceID'] ) ] = quirk['Type']
+
+    def _normalize( self, conf ):
+        ' Some entries are described as set ( {"0006"} ) instead of dict, make them all dict '
+
+        for model in conf:
+            if not isinstance( conf[model], dict ):
+                continue
+            if 'Ep' not in conf[model] or not isinstance( conf[model]['Ep'], dict ):
+                conf[model]['Ep'] = {}
+            for ep in conf[model]['Ep']:
+                if isinstance( conf[model]['Ep'][ep], ( set, list, tuple )):
+                    conf[model]['Ep'][ep] = { cluster: '' for cluster in conf[model]['Ep'][ep] }
+        return conf
+
+    def _compile( self, model, entry ):
+
+        compiled = {}
+        compiled['Type'] = str(entry.get('Type', ''))
+        compiled['HasType'] = 'Type' in entry
+        compiled['ProfileID'] = entry.get('ProfileID', '')
+        compiled['ZDeviceID'] = entry.get('ZDeviceID', '')
+        compiled['Ep'] = {}
+        for ep in entry['Ep']:
+            compiled['Ep'][ep] = {}
+            compiled['Ep'][ep]['Clusters'] = [ cluster for cluster in entry['Ep'][ep] if cluster not in NOT_CLUSTERS ]
+            compiled['Ep'][ep]['Type'] = None
+            if 'Type' in entry['Ep'][ep]:
+                compiled['Ep'][ep]['Type'] = str(entry['Ep'][ep]['Type'])
+            compiled['Ep'][ep]['ColorMode'] = None
+            if 'ColorMode' in entry['Ep'][ep]:
+                compiled['Ep'][ep]['ColorMode'] = int(entry['Ep'][ep]['ColorMode'])
+        compiled['EpList'] = sorted( compiled['Ep'] )
+        compiled['Downsample'] = {}
+        if isinstance( entry.get('Downsample'), dict ):
+            compiled['Downsample'] = { cluster: entry['Downsample'][cluster] for cluster in entry['Downsample']
+                    if isinstance( entry['Downsample'][cluster], dict ) }
+        return compiled
+
+    def load( self ):
+        ' Parse and compile DeviceConf.txt. Return True if the new content is in place '
+
+        if not os.path.isfile( self.filename ):
+            Domoticz.Error("DeviceConf - Cannot access %s" %self.filename)
+            return False
+
+        mtime = os.path.getmtime( self.filename )
+        with open( self.filename, 'r') as myfile:
+            tmpread = myfile.read()
+        try:
+            conf = ast.literal_eval( tmpread )
+        except (SyntaxError, ValueError) as e:
+            Domoticz.Error("Error while loading %s: %s" %(self.filename, e))
+            self.mtime = mtime      # Do not retry until the file is changed again
+            return False
+        if not isinstance( conf, dict ):
+            Domoticz.Error("Error while loading %s: not a dictionary" %self.filename)
+            self.mtime = mtime
+            return False
+
+        # Remove comments
+        for iterDevType in list(conf):
+            if iterDevType == '' or not isinstance( conf[iterDevType], dict ):
+                del conf[iterDevType]
+
+        conf = self._normalize( conf )
+        models = {}
+        for model in conf:
+            models[model] = self._compile( model, conf[model] )
+
+        self.DeviceConf = conf
+        self.Models = models
+        self._resolved = {}
+        self.mtime = mtime
+        Domoticz.Status("DeviceConf loaded - %s Models" %len(self.Models))
+        return True
+
+    def isModified( self ):
+
+        if not os.path.isfile( self.filename ):
+            return False
+        return os.path.getmtime( self.filename ) != self.mtime
+
+    def resolveModel( self, model ):
+        ' Return the DeviceConf Model for that Model name ( exact or variant ), or None '
+
+        if not isinstance( model, str ) or model == '':
+            return None
+        if model in self.Models:
+            return model
+        if model in self._resolved:
+            return self._resolved[model]
+
+        found = None
+        for known in self.Models:
+            if len(known) < len(model) and model.startswith( known ) and model[len(known)] in VARIANT_SEPARATORS:
+                if found is None or len(known) > len(found):
+                    found = known
+        if found:
+            Domoticz.Log("DeviceConf - Model %s handled as a variant of %s" %(model, found))
+        self._resolved[model] = found
+        return found
+
+    def isKnown( self, model ):
+
+        return self.resolveModel( model ) is not None
+
+    def getModelConf( self, model ):
+
+        known = self.resolveModel( model )
+        if known is None:
+            return None
+        return self.Models[known]
+
+    def getEpList( self, model ):
+
+        conf = self.getModelConf( model )
+        if conf is None:
+            return []
+        return conf['EpList']
+
+    def getType( self, model, ep ):
+        ' Return the Type for the Model/Ep ( Ep level first, then global ). None if the Model is unknown '
+
+        conf = self.getModelConf( model )
+        if conf is None:
+            return None
+        if ep in conf['Ep']:
+            if conf['Ep'][ep]['Type'] is None:
+                return ''
+            return conf['Ep'][ep]['Type']
+        return conf['Type']
+
+    def quirkType( self, manufacturer, profileID, zDeviceID ):
+        ' Return the Type forced by a Manufacturer/ProfileID/ZDeviceID quirk, or None '
+
+        manufacturer = str(manufacturer)
+        key = ( manufacturer, str(profileID), str(zDeviceID) )
+        if key in self.Quirks:
+            return self.Quirks[ key ]
+        for name in MANUFACTURER_NAME_QUIRKS:
+            if manufacturer.find( name ) != -1:
+                return MANUFACTURER_NAME_QUIRKS[ name ]
+        return None
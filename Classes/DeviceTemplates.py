@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+"""
+Class DeviceTemplates
+
+Description: Learned interview templates for Models which are not described in DeviceConf.txt
+
+When a device not known in DeviceConf.txt has been fully discovered ( 0x0045, 0x0043 per Ep, Basic cluster read
+and Attributes Discovery ), its Ep/Cluster layout, the resolved Type per Ep, the ColorMode and the
+Attributes List are stored. The next device of the same Model ( and Manufacturer/App Version ) will be
+provisioned from that template and go straight to the Widget creation.
+
+Templates[Model][Variant] = { 'Model', 'Manufacturer', 'App Version', 'ProfileID', 'ZDeviceID',
+                              'Ep': { ep: { 'Clusters': [], 'Type': '' } },
+                              'ColorMode', 'Attributes List', 'Learned', 'Count' }
+
+Variant is 'Manufacturer|App Version' as it was known at learning time.
+"""
+
+import Domoticz
+import json
+import os.path
+
+from time import time
+
+TEMPLATES_FILENAME = "LearnedTemplates.json"
+ATTRIBUTES_LIST_DELAY = 300     # Time given to the Attributes Discovery ( 0x0140 ) to complete after creation
+NOT_CLUSTERS = ( 'Type', 'ClusterType', 'ColorMode' )
+
+class DeviceTemplates:
+
+    def __init__( self, PluginConf, ListOfDevices ):
+
+        self.pluginconf = PluginConf
+        self.ListOfDevices = ListOfDevices  # Point to the Global ListOfDevices
+        self.Templates = {}
+        self.Pending = {}                   # Nwkid -> ( Model, Variant, TimeStamp ) waiting for Attributes List
+        self.dirty = False
+
+        self.templatesFilename = self.pluginconf.pluginData + TEMPLATES_FILENAME
+        self._loadTemplates()
+
+    def _loadTemplates( self ):
+
+        if not os.path.isfile( self.templatesFilename ):
+            Domoticz.Debug("DeviceTemplates - no learned templates yet")
+            return
+        try:
+            with open( self.templatesFilename, 'rt') as handle:
+                self.Templates = json.load( handle )
+        except (ValueError, OSError) as e:
+            Domoticz.Error("DeviceTemplates - Unable to load %s: %s" %(self.templatesFilename, e))
+            self.Templates = {}
+            return
+        Domoticz.Status("DeviceTemplates - %s learned Model(s) loaded" %len(self.Templates))
+
+    def _writeTemplates( self ):
+
+        Domoticz.Debug("DeviceTemplates - Write %s" %self.templatesFilename)
+        try:
+            with open( self.templatesFilename, 'wt') as handle:
+                json.dump( self.Templates, handle, indent=4, sort_keys=True)
+        except OSError as e:
+            Domoticz.Error("DeviceTemplates - Unable to write %s: %s" %(self.templatesFilename, e))
+            return
+        self.dirty = False
+
+    @staticmethod
+    def _value( device, key ):
+        ' Return the value as a string, or an empty string if not yet known '
+
+        value = device.get( key, '' )
+        if value == {} or value is None:
+            return ''
+        return str(value)
+
+    @staticmethod
+    def _sameManufacturer( learned, current ):
+        ' Manufacturer can be the 0x8042 code ( 117c ) or the Basic cluster name ( IKEA of Sweden ) '
+
+        if learned == '' or current == '':
+            return True
+        learnedIsCode = len(learned) == 4 and all( c in '0123456789abcdef' for c in learned )
+        currentIsCode = len(current) == 4 and all( c in '0123456789abcdef' for c in current )
+        if learnedIsCode != currentIsCode:
+            return True
+        return learned == current
+
+    def isEnabled( self ):
+
+        return self.pluginconf.enableLearnedTemplates == 1
+
+    def hasTemplates( self ):
+
+        return self.isEnabled() and len(self.Templates) > 0
+
+    def isLearned( self, model ):
+
+        return self.isEnabled() and model in self.Templates
+
+    def findTemplate( self, nwkid ):
+        """
+        Return the best template for this device, or None.
+        An exact Manufacturer/App Version match is preferred, otherwise any variant which is not contradicting
+        what we already know from the device.
+        """
+
+        if not self.isEnabled() or nwkid not in self.ListOfDevices:
+            return None
+
+        device = self.ListOfDevices[nwkid]
+        model = self._value( device, 'Model' )
+        if model == '' or model not in self.Templates:
+            return None
+
+        manufacturer = self._value( device, 'Manufacturer' )
+        appVersion = self._value( device, 'App Version' )
+
+        variants = self.Templates[model]
+        variant = manufacturer + '|' + appVersion
+        if variant in variants:
+            return variants[variant]
+
+        for iterVariant in variants:
+            template = variants[iterVariant]
+            if appVersion != '' and template['App Version'] != '' and template['App Version'] != appVersion:
+                continue
+            if not self._sameManufacturer( template['Manufacturer'], manufacturer ):
+                continue
+            return template
+        return None
+
+    def applyTemplate( self, nwkid ):
+        """
+        Provision the device with the learned template. Return True if the device can be fast tracked to 'createDB'
+        """
+
+        template = self.findTemplate( nwkid )
+        if template is None:
+            return False
+
+        device = self.ListOfDevices[nwkid]
+        Domoticz.Status("[-] NEW OBJECT: %s provisioned from learned template %s ( %s, App Version: %s )" \
+                %(nwkid, template['Model'], template['Manufacturer'], template['App Version']))
+
+        device['ConfigSource'] = 'Template'
+        for ep in template['Ep']:
+            if ep not in device['Ep']:
+                device['Ep'][ep] = {}
+            for cluster in template['Ep'][ep]['Clusters']:
+                if cluster not in device['Ep'][ep]:
+                    device['Ep'][ep][cluster] = {}
+            if template['Ep'][ep]['Type'] != '':
+                device['Ep'][ep]['Type'] = template['Ep'][ep]['Type']
+
+        if self._value( device, 'ProfileID' ) == '':
+            device['ProfileID'] = template['ProfileID']
+        if self._value( device, 'ZDeviceID' ) == '':
+            device['ZDeviceID'] = template['ZDeviceID']
+
+        if template.get('ColorMode') is not None:
+            if 'ColorInfos' not in device:
+                device['ColorInfos'] = {}
+            device['ColorInfos']['ColorMode'] = template['ColorMode']
+
+        if template.get('Attributes List'):
+            device['Attributes List'] = json.loads( json.dumps( template['Attributes List'] ))
+
+        template['Count'] += 1
+        self.dirty = True
+        return True
+
+    def learnTemplate( self, nwkid, epTypes ):
+        """
+        Store the result of a successful interview. epTypes is the resolved Type for each Ep
+        """
+
+        if not self.isEnabled() or nwkid not in self.ListOfDevices:
+            return
+
+        device = self.ListOfDevices[nwkid]
+        model = self._value( device, 'Model' )
+        if model == '' or device.get('ConfigSource') in ( 'DeviceConf', 'Template' ):
+            return
+
+        manufacturer = self._value( device, 'Manufacturer' )
+        appVersion = self._value( device, 'App Version' )
+        variant = manufacturer + '|' + appVersion
+
+        template = {}
+        template['Model'] = model
+        template['Manufacturer'] = manufacturer
+        template['App Version'] = appVersion
+        template['ProfileID'] = self._value( device, 'ProfileID' )
+        template['ZDeviceID'] = self._value( device, 'ZDeviceID' )
+        template['Ep'] = {}
+        for ep in device['Ep']:
+            template['Ep'][ep] = {}
+            template['Ep'][ep]['Clusters'] = [ cluster for cluster in device['Ep'][ep] if cluster not in NOT_CLUSTERS ]
+            template['Ep'][ep]['Type'] = epTypes.get( ep, '' )
+        template['ColorMode'] = None
+        if 'ColorInfos' in device and 'ColorMode' in device['ColorInfos']:
+            template['ColorMode'] = device['ColorInfos']['ColorMode']
+        template['Attributes List'] = {}
+        template['Learned'] = int(time())
+        template['Count'] = 0
+
+        if model not in self.Templates:
+            self.Templates[model] = {}
+        self.Templates[model][variant] = template
+        self.Pending[nwkid] = ( model, variant, int(time()) )
+        self.dirty = True
+        Domoticz.Status("DeviceTemplates - learned template for %s ( %s )" %(model, variant))
+
+    def removeTemplate( self, model ):
+
+        if model in self.Templates:
+            del self.Templates[model]
+            self.dirty = True
+
+    def heartbeat( self ):
+        """
+        Complete pending templates with the Attributes List once the Attributes Discovery had time to finish,
+        and persist on change only.
+        """
+
+        now = int(time())
+        for nwkid in list(self.Pending):
+            model, variant, stamp = self.Pending[nwkid]
+            if now < stamp + ATTRIBUTES_LIST_DELAY:
+                continue
+            del self.Pending[nwkid]
+            if model not in self.Templates or variant not in self.Templates[model]:
+                continue
+            if nwkid in self.ListOfDevices and 'Attributes List' in self.ListOfDevices[nwkid]:
+                self.Templates[model][variant]['Attributes List'] = json.loads( json.dumps( self.ListOfDevices[nwkid]['Attributes List'] ))
+                self.dirty = True
+
+        if self.dirty:
+            self._writeTemplates()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+"""
+Class ReportDownsampler
+
+Description: Downsampling of the chatty power/metering reports before the widget update
+
+Smart plugs can report their instant power several times per second. Each report is kept at full resolution in
+ListOfDevices, but the widget ( MajDomoDevice -> Devices[x].Update -> Domoticz database ) is only updated when:
+    - MinInterval sec have passed since the last update, and
+    - the value has moved by more than Deadband % of the last value published ( at least DOWNSAMPLE_DEADBAND_MIN ),
+      or DOWNSAMPLE_MAX_INTERVAL sec have passed, so the widget LastUpdate stays fresh
+
+The value published is the average of the reports received since the last update ( Average: 1 ), or the last one.
+The reports held back are published by the heartbeat once MinInterval is over, so the last change is never lost.
+
+The policy is the PluginConf one ( downsampleMinInterval, downsampleDeadband, downsampleAverage ), and can be
+overwritten per Model and per Cluster in DeviceConf.txt:
+    'Downsample': { '0702': { 'MinInterval': 30, 'Deadband': 10, 'Average': 1 } }
+A MinInterval of 0 disables the downsampling.
+"""
+
+import Domoticz
+
+from time import time
+
+DOWNSAMPLE_CLUSTERS = ( '0702', '000c', '0b04' )    # Metering, Analog Input ( Xiaomi plugs ), Electrical Measurement
+DOWNSAMPLE_DEADBAND_MIN = 1.0       # Min deadband, in the unit of the value ( W )
+DOWNSAMPLE_MAX_INTERVAL = 300       # sec, the widget is updated at least this often while reports come
+
+# Cluster given to MajDomoDevice, when the widget is not the one of the reported Cluster
+DOWNSAMPLE_WIDGET_CLUSTER = { '000c': '0702' }
+
+
+class ReportDownsampler:
+
+    def __init__( self, pluginconf, DeviceConfIndex, ListOfDevices ):
+
+        self.pluginconf = pluginconf
+        self.DeviceConfIndex = DeviceConfIndex
+        self.ListOfDevices = ListOfDevices
+        self.Windows = {}       # ( NwkId, Ep, Cluster ) -> { 'Published', 'PublishedAt', 'Sum', 'Count', 'Last', 'Policy' }
+        self.dropped = 0        # Reports not published to the widget
+
+    def _policy( self, nwkid, cluster ):
+
+        policy = { 'MinInterval': self.pluginconf.downsampleMinInterval,
+                   'Deadband': self.pluginconf.downsampleDeadband,
+                   'Average': self.pluginconf.downsampleAverage }
+        model = self.ListOfDevices.get( nwkid, {} ).get( 'Model' )
+        modelConf = self.DeviceConfIndex.getModelConf( model ) if self.DeviceConfIndex else None
+        if modelConf and cluster in modelConf['Downsample']:
+            policy.update( modelConf['Downsample'][cluster] )
+        return policy
+
+    def _candidate( self, window ):
+
+        if window['Policy']['Average'] and window['Count']:
+            return window['Sum'] / window['Count']
+        return window['Last']
+
+    def _due( self, window, now ):
+        ' return the value to publish if the window is over, None otherwise. The window is restarted when over '
+
+        if now < window['PublishedAt'] + window['Policy']['MinInterval']:
+            return None
+        value = self._candidate( window )
+        deadband = max( abs(window['Published']) * window['Policy']['Deadband'] / 100, DOWNSAMPLE_DEADBAND_MIN )
+        window['Sum'] = 0.0
+        window['Count'] = 0
+        if abs( value - window['Published'] ) < deadband and now < window['PublishedAt'] + DOWNSAMPLE_MAX_INTERVAL:
+            return None
+        window['Published'] = value
+        window['PublishedAt'] = now
+        return round( value, 3 )
+
+    def accept( self, nwkid, ep, cluster, value ):
+        ' return the value to publish to the widget now, None if the report is held back '
+
+        if cluster not in DOWNSAMPLE_CLUSTERS:
+            return value
+        policy = self._policy( nwkid, cluster )
+        if not policy['MinInterval']:
+            return value
+
+        now = time()
+        key = ( nwkid, ep, cluster )
+        window = self.Windows.get( key )
+        if window is None:
+            self.Windows[ key ] = { 'Published': value, 'PublishedAt': now, 'Sum': 0.0, 'Count': 0, 'Last': value, 'Policy': policy }
+            return value
+
+        window['Policy'] = policy
+        window['Sum'] += value
+        window['Count'] += 1
+        window['Last'] = value
+        published = self._due( window, now )
+        if published is None:
+            self.dropped += 1
+            return None
+        Domoticz.Debug("ReportDownsampler - %s/%s %s: %s published ( last: %s )" %(nwkid, ep, cluster, published, value))
+        return published
+
+    def due( self ):
+        ' return the ( NwkId, Ep, Cluster, value ) held back whose MinInterval is over. Called by the heartbeat '
+
+        now = time()
+        published = []
+        for key in list( self.Windows ):
+            if key[0] not in self.ListOfDevices:
+                del self.Windows[ key ]
+                continue
+            window = self.Windows[ key ]
+            if window['Count'] == 0:
+                continue
+            value = self._due( window, now )
+            if value is not None:
+                published.append( ( key[0], key[1], DOWNSAMPLE_WIDGET_CLUSTER.get( key[2], key[2] ), value ) )
+        return published
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+"""
+Class DuplicateFilter
+
+Description: Suppression of the duplicated Attribute Reports ( 0x8102 ) before they are decoded
+
+The MAC/APS retries, and the different routes, can deliver the same ZCL frame several times. For each
+( NwkId, Ep, Cluster, Attribute ) a sliding window of the last SQN_WINDOW SQN is kept as a bitset ( bit n set:
+'highest SQN - n' was received ). A frame whose SQN is already in the window is dropped.
+The Attribute is part of the key, as the Zigate delivers one 0x8102 per Attribute of a report, all with the SQN of
+the ZCL frame. The Read Attribute responses ( 0x8100 ) are not filtered: their SQN is the one of the Zigate request,
+not a device sequence.
+
+The window is restarted when it has not been used since SQN_WINDOW_TIMEOUT sec: the duplicates come within a few
+seconds, and a device restart or a SQN wrap must not be taken for a duplicate.
+
+Per device, the frames received, the duplicates, and the SQN gaps ( an estimate of the frames lost, as the SQN is
+shared with the frames the device sends to other nodes ) are counted, and stored hourly in the ReportStore.
+"""
+
+import Domoticz
+
+from time import time
+
+SQN_WINDOW = 64                 # Number of SQN in the window
+SQN_WINDOW_TIMEOUT = 30         # sec, the window restarts after this silence
+SQN_MAX_GAP = 32                # A larger SQN gap is considered as a restart, not as lost frames
+
+
+class DuplicateFilter:
+
+    def __init__( self, pluginconf ):
+
+        self.pluginconf = pluginconf
+        self.Windows = {}       # ( NwkId, Ep, Cluster, Attribute ) -> [ highest SQN, bitset, last update ]
+        self.LastSQN = {}       # NwkId -> last SQN accepted from the device
+        self.Stats = {}         # NwkId -> { 'received', 'duplicates', 'lost' } since the last snapshot
+
+    def _count( self, nwkid, counter, value=1 ):
+
+        if nwkid not in self.Stats:
+            self.Stats[nwkid] = { 'received': 0, 'duplicates': 0, 'lost': 0 }
+        self.Stats[nwkid][counter] += value
+
+    def isDuplicate( self, nwkid, ep, cluster, attribute, sqn ):
+        ' return True if this Attribute Report was already received '
+
+        try:
+            iSqn = int(sqn, 16)
+        except (TypeError, ValueError):
+            return False
+        self._count( nwkid, 'received' )
+        now = time()
+        key = ( nwkid, ep, cluster, attribute )
+        window = self.Windows.get( key )
+
+        if window is None or now > window[2] + SQN_WINDOW_TIMEOUT:
+            self.Windows[ key ] = [ iSqn, 1, now ]
+            self._gap( nwkid, iSqn )
+            return False
+
+        highest, bitset, lastUpdate = window
+        ahead = ( iSqn - highest ) % 256
+        behind = ( highest - iSqn ) % 256
+        if ahead == 0 or ( behind < SQN_WINDOW and bitset & ( 1 << behind )):
+            self._count( nwkid, 'duplicates' )
+            Domoticz.Debug("DuplicateFilter - duplicate %s/%s %s/%s SQN: %s" %(nwkid, ep, cluster, attribute, sqn))
+            return bool( self.pluginconf.dropDuplicateFrames )
+
+        if ahead < 128:
+            # Slide the window
+            window[0] = iSqn
+            window[1] = ( ( bitset << ahead ) | 1 ) & ( ( 1 << SQN_WINDOW ) - 1 )
+        elif behind < SQN_WINDOW:
+            # Late frame, in the window
+            window[1] = bitset | ( 1 << behind )
+        else:
+            self.Windows[ key ] = window = [ iSqn, 1, now ]
+        window[2] = now
+        self._gap( nwkid, iSqn )
+        return False
+
+    def _gap( self, nwkid, iSqn ):
+
+        if nwkid in self.LastSQN:
+            gap = ( iSqn - self.LastSQN[nwkid] ) % 256
+            if 1 < gap <= SQN_MAX_GAP:
+                self._count( nwkid, 'lost', gap - 1 )
+            elif gap == 0 or gap > 128:
+                return      # Same ZCL frame ( several Attributes ), or a late one
+        self.LastSQN[nwkid] = iSqn
+
+    def snapshot( self ):
+        ' return and reset the per device counters '
+
+        stats = self.Stats
+        self.Stats = {}
+        return stats
+
+    def writeReport( self, reportStore ):
+
+        reportStore.addFrameStats( self.snapshot() )
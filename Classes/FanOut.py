@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+"""
+Class FanOutOptimizer
+
+Description: Group-cast for the bursts of identical commands to the members of a group
+
+When Domoticz scripts switch many devices at once, mgtCommand sends one unicast command per device. The first ones
+are sent right away, the next ones wait in the Transport queue ( pacing window ).
+
+The absolute state commands ( On/Off, Level, Colour: COALESCE_COMMANDS of the Transport, Toggle excluded ) given to
+the Transport with the same payload within FANOUT_WINDOW sec form a burst. When a command of a burst is queued, and
+all the members of a GroupsManagement group are in the burst, the queued commands of the members are replaced by a
+single group-cast, at the position of the last one. The members which already got their unicast get the same
+command again, which does not change their state.
+
+A set of at least FANOUT_SUGGEST_SIZE Ep commanded together FANOUT_SUGGEST_COUNT times, and which is not a group,
+is logged once as a candidate group for ZigateGroupsConfig.txt.
+"""
+
+import Domoticz
+
+from time import time
+
+from Modules.consts import ADDRESS_MODE
+from Classes.Transport import COALESCE_COMMANDS, COALESCE_NEVER
+
+FANOUT_WINDOW = 2               # sec, identical commands given within are a burst
+FANOUT_SUGGEST_SIZE = 3         # Min number of Ep of a set to suggest as a group
+FANOUT_SUGGEST_COUNT = 5        # Number of bursts of the same set before it is suggested
+FANOUT_MAX_SETS = 200           # Max number of sets tracked for the suggestions
+
+
+class FanOutOptimizer:
+
+    def __init__( self, pluginconf, groupmgt ):
+
+        self.pluginconf = pluginconf
+        self.groupmgt = groupmgt
+        self.Bursts = {}        # ( Command, Payload ) -> { 'Start', 'Targets': set of ( NwkId, Ep ) }
+        self.Sets = {}          # frozenset of ( NwkId, Ep ) -> number of bursts
+        self.Suggested = set()
+        self.groupCasts = 0
+        self.merged = 0
+
+    def _key( self, cmd, datas ):
+        ' return ( Command, Payload ) of a unicast absolute state command, None otherwise '
+
+        iCmd = int(cmd, 16)
+        if iCmd not in COALESCE_COMMANDS or len(datas) < 12 or datas[0:2] != "%02d" %ADDRESS_MODE['short']:
+            return None
+        if iCmd in COALESCE_NEVER and datas[10:12] in COALESCE_NEVER[iCmd]:
+            return None
+        return ( iCmd, datas[10:].lower() )
+
+    def _members( self, group ):
+
+        if group not in self.groupmgt.ListOfGroups:
+            return set()
+        return set( ( nwkid, ep ) for nwkid, ep in self.groupmgt.ListOfGroups[group]['Devices'] if nwkid != '0000' )
+
+    def _isGroup( self, targets ):
+
+        for group in self.groupmgt.ListOfGroups:
+            if self._members( group ) == targets:
+                return True
+        return False
+
+    def _closeBurst( self, burst ):
+        ' account the set of Ep of the burst for the group suggestions '
+
+        targets = frozenset( burst['Targets'] )
+        if len(targets) < FANOUT_SUGGEST_SIZE or targets in self.Suggested:
+            return
+        if len(self.Sets) >= FANOUT_MAX_SETS and targets not in self.Sets:
+            self.Sets = { other: count for other, count in self.Sets.items() if count > 1 }
+            if len(self.Sets) >= FANOUT_MAX_SETS:
+                return
+        self.Sets[ targets ] = self.Sets.get( targets, 0 ) + 1
+        if self.Sets[ targets ] >= FANOUT_SUGGEST_COUNT and not self._isGroup( targets ):
+            Domoticz.Status("FanOut - %s devices are often commanded together, a group would take 1 command instead of %s: %s" \
+                    %(len(targets), len(targets), ', '.join( sorted( "%s/%s" %target for target in targets ))))
+            self.Suggested.add( targets )
+            del self.Sets[ targets ]
+
+    def record( self, cmd, datas ):
+        ' a command is given to the Transport '
+
+        now = time()
+        for key in list( self.Bursts ):
+            if now > self.Bursts[key]['Start'] + FANOUT_WINDOW:
+                self._closeBurst( self.Bursts.pop( key ))
+        key = self._key( cmd, datas )
+        if key is None:
+            return
+        if key not in self.Bursts:
+            self.Bursts[ key ] = { 'Start': now, 'Targets': set() }
+        self.Bursts[ key ]['Targets'].add( ( datas[2:6], datas[8:10] ) )
+
+    def merge( self, queue, cmd, datas ):
+        ' the command has just been queued. Replace the queued commands to a group of the burst by a group-cast '
+
+        if not self.pluginconf.groupCastFanOut or self.groupmgt.StartupPhase != 'ready':
+            return False
+        key = self._key( cmd, datas )
+        if key is None or key not in self.Bursts:
+            return False
+        burst = self.Bursts[ key ]
+        groups = self.groupmgt.DeviceToGroups.get( ( datas[2:6], datas[8:10] ), () )
+        for group in sorted( groups, key=lambda group: -len( self._members( group ))):
+            members = self._members( group )
+            if len(members) < 2 or not members <= burst['Targets']:
+                continue
+            positions = [ idx for idx, ( qCmd, qDatas, qTimestamp, qReTx ) in enumerate( queue )
+                    if self._key( qCmd, qDatas ) == key and ( qDatas[2:6], qDatas[8:10] ) in members ]
+            if len(positions) < 2:
+                continue
+            qCmd, qDatas, qTimestamp, qReTx = queue[ positions[-1] ]
+            groupDatas = "%02d" %ADDRESS_MODE['group'] + group + qDatas[6:8] + "01" + qDatas[10:]
+            queue[ positions[-1] ] = ( qCmd, groupDatas, qTimestamp, qReTx )
+            for idx in reversed( positions[:-1] ):
+                del queue[ idx ]
+            Domoticz.Debug("FanOut - %s queued commands %s/%s replaced by a group-cast to %s" %(len(positions), cmd, key[1], group))
+            self.groupCasts += 1
+            self.merged += len(positions)
+            return True
+        return False
+
+    def printSummary( self ):
+
+        if self.groupCasts:
+            Domoticz.Status("FanOut - %s group-casts replaced %s queued commands" %(self.groupCasts, self.merged))
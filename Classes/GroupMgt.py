@@ -12,6 +12,20 @@ ListOfGroups[group id]['Tradfri Remote']- Manage the Tradfri Remote
 
 self.ListOfDevices[nwkid]['GroupMgt'][Ep][GroupID]['Phase'] = 'OK-Membership' / 'REQ-Membership' / 'DEL-Membership'
 self.ListOfDevices[nwkid]['GroupMgt'][Ep][GroupID]['Phase-Stamp'] = time()
+
+Once the startup is done ( 'ready' ), the group widgets are driven by the member reports:
+DeviceToGroups[(nwkid, ep)]  - set of Groups this member belongs to ( reverse index of ListOfGroups[group id]['Devices'] )
+MemberStates[(nwkid, ep)]    - ( On/Off, Level ) last known for this member
+GroupAggregates[group id]    - { 'OnCount', 'LevelSum', 'LevelCount' } maintained incrementally
+GroupsToRefresh              - Groups for which the widget must be pushed at next heartbeat
+
+Group membership discovery works on a flat work list of (nwkid, ep) to be requested ( DiscoveryWork ) and
+DiscoveryInFlight[(nwkid, ep)] = ( sent time, deadline ). Up to groupDiscoveryWindow 0x0062 are in flight, the
+next one is sent as soon as a 0x8062 is received, within the airtime admitted to 'Groups' ( AdmissionControl ).
+The 0x0062 can wait in the Transport queue ( in ZigBee zmode, each one waits for the 0x8062 of the previous one ),
+so the sent time and the deadline start when the Transport transmits it ( discoverySent ). The deadline is derived
+from the observed response time, bounded by groupDiscoveryTimeout ( as a device not member of any group might
+not respond at all ).
 """
 
 import Domoticz
@@ -28,9 +42,12 @@ from Classes.AdminWidgets import AdminWidgets
 
 
 GROUPS_CONFIG_FILENAME = "ZigateGroupsConfig"
-MAX_LOAD = 2
 TIMEOUT = 12
 MAX_CYCLE = 3
+DISCOVERY_MIN_TIMEOUT = 3       # Never expire a 0x0062 before that
+DISCOVERY_RTT_FACTOR = 4        # Deadline is that factor of the smoothed response time
+DISCOVERY_RTT_ALPHA = 0.25      # Smoothing of the response time
+DISCOVERY_QUEUED_TIMEOUT = 120  # Give up a 0x0062 never transmitted by the Transport
 
 class GroupsManagement(object):
 
@@ -44,6 +61,17 @@ class GroupsManagement(object):
         self.Cycle = 0              # Cycle count
         self.stillWIP = True
 
+        self.DeviceToGroups = {}    # Reverse index (nwkid, ep) -> set of groups
+        self.MemberStates = {}      # (nwkid, ep) -> ( OnOff, Level )
+        self.GroupAggregates = {}   # group -> { 'OnCount', 'LevelSum', 'LevelCount' }
+        self.GroupsToRefresh = set()
+        self.GroupUnits = {}        # group -> Domoticz Unit
+
+        self.DiscoveryWork = None   # List of (nwkid, ep) for which the Membership must be requested
+        self.DiscoveryInFlight = {} # (nwkid, ep) -> ( sent, deadline )
+        self.DiscoveryRtt = None    # Smoothed 0x0062 -> 0x8062 time
+        self.DiscoveryStats = {}
+
         self.ListOfDevices = ListOfDevices  # Point to the Global ListOfDevices
         self.IEEE2NWK = IEEE2NWK            # Point to the List of IEEE to NWKID
         self.Devices = Devices              # Point to the List of Domoticz Devices
@@ -52,6 +80,7 @@ class GroupsManagement(object):
         self.ScanGroupMembership = ScanGroupMembership
 
         self.ZigateComm = ZigateComm        # Point to the ZigateComm object
+        self.optimistic = None              # OptimisticUpdates, set by the plugin
 
         self.pluginconf = PluginConf
 
@@ -350,8 +379,11 @@ class GroupsManagement(object):
             Domoticz.Error('getGroupMembershipResponse - %s %s %s' %(MsgSourceAddress, MsgGroupCount, MsgListOfGroup))
             return
 
+        self._discoveryResponse( MsgSourceAddress, MsgEP )
+
         if 'GroupMgt' not in self.ListOfDevices[MsgSourceAddress]:
             self.ListOfDevices[MsgSourceAddress]['GroupMgt'] = {}
+        if MsgEP not in self.ListOfDevices[MsgSourceAddress]['GroupMgt']:
             self.ListOfDevices[MsgSourceAddress]['GroupMgt'][MsgEP] = {}
 
         idx =  0
@@ -378,13 +410,103 @@ class GroupsManagement(object):
             else:
                 if ( MsgSourceAddress,MsgEP) not in self.ListOfGroups[groupID]['Devices']:
                     self.ListOfGroups[groupID]['Devices'].append( (MsgSourceAddress, MsgEP) )
+            if self.StartupPhase == 'ready':
+                self._indexAddMember( groupID, MsgSourceAddress, MsgEP )
 
             Domoticz.Debug("getGroupMembershipResponse - ( %s,%s ) is part of Group %s"
                     %( MsgSourceAddress, MsgEP, groupID))
                 
             idx += 1
+
+        if self.StartupPhase == 'discovery':
+            self._discoveryPump()
         return
 
+    def _buildDiscoveryWork( self ):
+        ' List the (nwkid, ep) which are candidate for a Group Membership request '
+
+        work = []
+        for iterDev in list(self.ListOfDevices):
+            if 'PowerSource' in self.ListOfDevices[iterDev]:
+                if self.ListOfDevices[iterDev]['PowerSource'] != 'Main':
+                    continue
+            if 'Ep' not in self.ListOfDevices[iterDev]:
+                continue
+            for iterEp in self.ListOfDevices[iterDev]['Ep']:
+                if iterEp == 'ClusterType': continue
+                if  ( iterDev == '0000' or 'ClusterType' in self.ListOfDevices[iterDev] or 'ClusterType' in self.ListOfDevices[iterDev]['Ep'][iterEp] ) and \
+                      '0004' in self.ListOfDevices[iterDev]['Ep'][iterEp] and \
+                     ( '0006' in self.ListOfDevices[iterDev]['Ep'][iterEp] or '0008' in self.ListOfDevices[iterDev]['Ep'][iterEp] ):
+                    work.append( (iterDev, iterEp) )
+
+        self.DiscoveryWork = work
+        self.DiscoveryInFlight = {}
+        self.DiscoveryStats = { 'Start': time(), 'Total': len(work), 'Responses': 0, 'TimeOut': 0 }
+        Domoticz.Log("Group Management - Discovery of %s device/ep with a window of %s" 
+                %(len(work), self.pluginconf.groupDiscoveryWindow))
+
+    def _discoveryDeadline( self, now ):
+
+        timeout = self.pluginconf.groupDiscoveryTimeout
+        if self.DiscoveryRtt is not None:
+            timeout = min( timeout, max( DISCOVERY_MIN_TIMEOUT, DISCOVERY_RTT_FACTOR * self.DiscoveryRtt ))
+        return now + timeout
+
+    def _discoveryResponse( self, nwkid, ep ):
+        ' A 0x8062 has been received, release the slot and learn the response time '
+
+        key = ( nwkid, ep )
+        if key not in self.DiscoveryInFlight:
+            return
+        sent, deadline = self.DiscoveryInFlight[ key ]
+        del self.DiscoveryInFlight[ key ]
+        self.DiscoveryStats['Responses'] += 1
+        if sent is None:
+            return
+        rtt = time() - sent
+        if self.DiscoveryRtt is None:
+            self.DiscoveryRtt = rtt
+        else:
+            self.DiscoveryRtt = ( 1 - DISCOVERY_RTT_ALPHA ) * self.DiscoveryRtt + DISCOVERY_RTT_ALPHA * rtt
+
+    def discoverySent( self, nwkid, ep ):
+        ' The Transport transmits a 0x0062: start its response time and its deadline '
+
+        key = ( nwkid, ep )
+        if key not in self.DiscoveryInFlight:
+            return
+        now = time()
+        self.DiscoveryInFlight[ key ] = ( now, self._discoveryDeadline( now ) )
+
+    def _discoveryPump( self ):
+        """
+        Expire the requests which passed their deadline and fill the window.
+        Return True when the discovery is completed
+        """
+
+        now = time()
+        for key in list(self.DiscoveryInFlight):
+            if self.DiscoveryInFlight[ key ][1] > now:
+                continue
+            del self.DiscoveryInFlight[ key ]
+            self.DiscoveryStats['TimeOut'] += 1
+            Domoticz.Debug(" - No response receive for %s/%s - assuming no group membership" %key)
+
+        while self.DiscoveryWork and len(self.DiscoveryInFlight) < self.pluginconf.groupDiscoveryWindow:
+            iterDev, iterEp = self.DiscoveryWork[0]
+            if iterDev not in self.ListOfDevices:
+                self.DiscoveryWork.pop(0)
+                continue
+            if not self.ZigateComm.admission.admit( 'Groups' ):
+                break   # No airtime, will continue in the next cycle
+            self.DiscoveryWork.pop(0)
+            # Sent time and deadline are set when the Transport transmits it
+            self.DiscoveryInFlight[ (iterDev, iterEp) ] = ( None, now + DISCOVERY_QUEUED_TIMEOUT )
+            self._getGroupMembership(iterDev, iterEp)   # We request MemberShip List
+            Domoticz.Debug(" - request group membership for %s/%s" %(iterDev, iterEp))
+
+        return len(self.DiscoveryWork) == 0 and len(self.DiscoveryInFlight) == 0
+
     def _removeGroup(self,  device_addr, device_ep, goup_addr ):
 
         if goup_addr not in self.UpdatedGroups:
@@ -433,6 +555,7 @@ class GroupsManagement(object):
                     if (MsgSrcAddr, MsgEP) in self.ListOfGroups[MsgGroupID]['Devices']:
                         Domoticz.Debug("removeGroupResponse - removing %s from %s" %( str(( MsgSrcAddr, MsgEP)), str(self.ListOfGroups[MsgGroupID]['Devices'])))
                         self.ListOfGroups[MsgGroupID]['Devices'].remove( ( MsgSrcAddr, MsgEP) )
+                        self._indexRemoveMember( MsgGroupID, MsgSrcAddr, MsgEP )
             else: # < 3.0e should not happen
                 Domoticz.Log("Group Member removed from unknown device")
                 unique = 0
@@ -591,42 +714,129 @@ class GroupsManagement(object):
         Domoticz.Debug("_bestGroupWidget - Code: %s, Color_Widget: %s, widget: %s" %( code, color_widget, widget))
         return widget
 
+    def _memberState( self, dev_nwkid, dev_ep ):
+        ' Return ( OnOff, Level ) of a group member, None when unknown '
+
+        onoff = level = None
+        if dev_nwkid not in self.ListOfDevices or 'Ep' not in self.ListOfDevices[dev_nwkid]:
+            return ( onoff, level )
+        if dev_ep not in self.ListOfDevices[dev_nwkid]['Ep']:
+            return ( onoff, level )
+        epData = self.ListOfDevices[dev_nwkid]['Ep'][dev_ep]
+        if '0006' in epData and str(epData['0006']).isdigit():
+            onoff = int(epData['0006']) != 0
+        if '0008' in epData and epData['0008'] != '' and epData['0008'] != {}:
+            try:
+                level = int(epData['0008'],16)
+            except ValueError:
+                level = None
+        return ( onoff, level )
+
+    def _aggregateMember( self, group_nwkid, state, sign ):
+
+        onoff, level = state
+        aggregate = self.GroupAggregates[group_nwkid]
+        if onoff:
+            aggregate['OnCount'] += sign
+        if level is not None:
+            aggregate['LevelSum'] += sign * level
+            aggregate['LevelCount'] += sign
+
+    def _indexAddMember( self, group_nwkid, dev_nwkid, dev_ep ):
+
+        key = ( dev_nwkid, dev_ep )
+        if group_nwkid not in self.GroupAggregates:
+            self.GroupAggregates[group_nwkid] = { 'OnCount': 0, 'LevelSum': 0, 'LevelCount': 0 }
+        if key not in self.DeviceToGroups:
+            self.DeviceToGroups[key] = set()
+            self.MemberStates[key] = self._memberState( dev_nwkid, dev_ep )
+        if group_nwkid in self.DeviceToGroups[key]:
+            return
+        self.DeviceToGroups[key].add( group_nwkid )
+        self._aggregateMember( group_nwkid, self.MemberStates[key], 1 )
+        self.GroupsToRefresh.add( group_nwkid )
+
+    def _indexRemoveMember( self, group_nwkid, dev_nwkid, dev_ep ):
+
+        key = ( dev_nwkid, dev_ep )
+        if key not in self.DeviceToGroups or group_nwkid not in self.DeviceToGroups[key]:
+            return
+        self.DeviceToGroups[key].remove( group_nwkid )
+        if group_nwkid in self.GroupAggregates:
+            self._aggregateMember( group_nwkid, self.MemberStates[key], -1 )
+            self.GroupsToRefresh.add( group_nwkid )
+        if len(self.DeviceToGroups[key]) == 0:
+            del self.DeviceToGroups[key]
+            del self.MemberStates[key]
+
+    def _buildGroupIndex( self ):
+        ' (Re)build the reverse index and the aggregates from ListOfGroups '
+
+        self.DeviceToGroups = {}
+        self.MemberStates = {}
+        self.GroupAggregates = {}
+        self.GroupUnits = {}
+        for group_nwkid in self.ListOfGroups:
+            self.GroupAggregates[group_nwkid] = { 'OnCount': 0, 'LevelSum': 0, 'LevelCount': 0 }
+            for dev_nwkid, dev_ep in self.ListOfGroups[group_nwkid].get('Devices', []):
+                self._indexAddMember( group_nwkid, dev_nwkid, dev_ep )
+            self.GroupsToRefresh.add( group_nwkid )
+
+    def memberStateChanged( self, dev_nwkid, dev_ep ):
+        """
+        To be called when the On/Off or Level of a device has been updated in ListOfDevices.
+        Update the aggregates of the groups it belongs to, if and only if the value changed.
+        """
+
+        key = ( dev_nwkid, dev_ep )
+        if key not in self.DeviceToGroups:
+            return
+        newState = self._memberState( dev_nwkid, dev_ep )
+        if newState == self.MemberStates[key]:
+            return
+        for group_nwkid in self.DeviceToGroups[key]:
+            self._aggregateMember( group_nwkid, self.MemberStates[key], -1 )
+            self._aggregateMember( group_nwkid, newState, 1 )
+            self.GroupsToRefresh.add( group_nwkid )
+        self.MemberStates[key] = newState
+
+    def _groupUnit( self, group_nwkid ):
+        ' Return the Domoticz Unit of the group widget, or None '
+
+        unit = self.GroupUnits.get( group_nwkid )
+        if unit in self.Devices and self.Devices[unit].DeviceID == group_nwkid:
+            return unit
+        for unit in self.Devices:
+            if self.Devices[unit].DeviceID == group_nwkid:
+                self.GroupUnits[group_nwkid] = unit
+                return unit
+        return None
+
     def updateDomoGroupDevice( self, group_nwkid):
         """ 
-        Update the Group status On/Off and Level , based on the attached devices
+        Update the Group status On/Off and Level , based on the aggregates of the attached devices
         """
 
         if group_nwkid not in self.ListOfGroups:
             Domoticz.Error("updateDomoGroupDevice - unknown group: %s" %group_nwkid)
             return
-        if 'Devices' not in self.ListOfGroups[group_nwkid]:
+        if group_nwkid not in self.GroupAggregates:
             Domoticz.Debug("updateDomoGroupDevice - no Devices for that group: %s" %self.ListOfGroups[group_nwkid])
             return
 
-        unit = 0
-        for unit in self.Devices:
-            if self.Devices[unit].DeviceID == group_nwkid:
-                break
-        else:
+        unit = self._groupUnit( group_nwkid )
+        if unit is None:
             return
 
         # If one device is on, then the group is on. If all devices are off, then the group is off
+        aggregate = self.GroupAggregates[group_nwkid]
         nValue = 0
+        if aggregate['OnCount'] > 0:
+            nValue = 1
         level = None
-        for dev_nwkid, dev_ep in self.ListOfGroups[group_nwkid]['Devices']:
-            if dev_nwkid in self.ListOfDevices:
-                if 'Ep' in  self.ListOfDevices[dev_nwkid]:
-                    if dev_ep in self.ListOfDevices[dev_nwkid]['Ep']:
-                        if '0006' in self.ListOfDevices[dev_nwkid]['Ep'][dev_ep]:
-                            if str(self.ListOfDevices[dev_nwkid]['Ep'][dev_ep]['0006']).isdigit():
-                                if int(self.ListOfDevices[dev_nwkid]['Ep'][dev_ep]['0006']) != 0:
-                                    nValue = 1
-                        if '0008' in self.ListOfDevices[dev_nwkid]['Ep'][dev_ep]:
-                            if self.ListOfDevices[dev_nwkid]['Ep'][dev_ep]['0008'] != '' and self.ListOfDevices[dev_nwkid]['Ep'][dev_ep]['0008'] != {}:
-                                if level is None:
-                                    level = int(self.ListOfDevices[dev_nwkid]['Ep'][dev_ep]['0008'],16)
-                                else:
-                                    level = round(( level +  int(self.ListOfDevices[dev_nwkid]['Ep'][dev_ep]['0008'],16)) / 2)
+        if aggregate['LevelCount'] > 0:
+            level = round( aggregate['LevelSum'] / aggregate['LevelCount'] )
+
         if level:
             analogValue = level
             if analogValue >= 255:
@@ -695,6 +905,7 @@ class GroupsManagement(object):
             del self.ListOfDevices[removeDev]['GroupMgt'][removeEp][grpid]
 
         del self.ListOfGroups[grpid]
+        self._buildGroupIndex()
 
         return
 
@@ -734,6 +945,18 @@ class GroupsManagement(object):
         self.ZigateComm.sendData( zigate_cmd, datas)
 
 
+    def _updateGroupWidget( self, unit, nwkid, zigate_cmd, nValue, sValue, Color_='' ):
+        ' update the group widget once the Zigate has accepted the group-cast, or now '
+
+        if self.optimistic:
+            previous = ( self.Devices[unit].nValue, self.Devices[unit].sValue, self.Devices[unit].Color )
+            if self.optimistic.expect( nwkid, '01', zigate_cmd, unit, ( int(nValue), str(sValue), Color_ ), previous, group=True ):
+                return
+        if Color_:
+            self.Devices[unit].Update(nValue=int(nValue), sValue=str(sValue), Color=Color_)
+        else:
+            self.Devices[unit].Update(nValue=int(nValue), sValue=str(sValue))
+
     def processCommand( self, unit, nwkid, Command, Level, Color_ ) : 
 
         Domoticz.Debug("processCommand - unit: %s, nwkid: %s, cmd: %s, level: %s, color: %s" %(unit, nwkid, Command, Level, Color_))
@@ -755,7 +978,7 @@ class GroupsManagement(object):
             zigate_param = '00'
             nValue = 0
             sValue = 'Off'
-            self.Devices[unit].Update(nValue=int(nValue), sValue=str(sValue))
+            self._updateGroupWidget( unit, nwkid, zigate_cmd, nValue, sValue )
             #datas = "01" + nwkid + EPin + EPout + zigate_param
             datas = "%02d" %ADDRESS_MODE['group'] + nwkid + EPin + EPout + zigate_param
             Domoticz.Debug("Command: %s" %datas)
@@ -767,7 +990,7 @@ class GroupsManagement(object):
             zigate_param = '01'
             nValue = '1'
             sValue = 'On'
-            self.Devices[unit].Update(nValue=int(nValue), sValue=str(sValue))
+            self._updateGroupWidget( unit, nwkid, zigate_cmd, nValue, sValue )
             #datas = "01" + nwkid + EPin + EPout + zigate_param
             datas = "%02d" %ADDRESS_MODE['group'] + nwkid + EPin + EPout + zigate_param
             Domoticz.Debug("Command: %s" %datas)
@@ -781,7 +1004,7 @@ class GroupsManagement(object):
             zigate_param = OnOff + "%02x" %value + "0010"
             nValue = '1'
             sValue = str(Level)
-            self.Devices[unit].Update(nValue=int(nValue), sValue=str(sValue))
+            self._updateGroupWidget( unit, nwkid, zigate_cmd, nValue, sValue )
             #datas = "01" + nwkid + EPin + EPout + zigate_param
             datas = "%02d" %ADDRESS_MODE['group'] + nwkid + EPin + EPout + zigate_param
             Domoticz.Debug("Command: %s" %datas)
@@ -845,7 +1068,7 @@ class GroupsManagement(object):
                 #Update Device
                 nValue = 1
                 sValue = str(value)
-                self.Devices[unit].Update(nValue=int(nValue), sValue=str(sValue), Color=Color_) 
+                self._updateGroupWidget( unit, nwkid, zigate_cmd, nValue, sValue, Color_ )
                 return
 
     def manageIkeaTradfriRemoteLeftRight( self, addr, type_dir):
@@ -933,8 +1156,11 @@ class GroupsManagement(object):
             return os.path.getmtime( filename )
 
         if self.StartupPhase == 'ready':
-            for group_nwkid in self.ListOfGroups:
-                self.updateDomoGroupDevice( group_nwkid)
+            # Only the groups for which a member has changed
+            for group_nwkid in list(self.GroupsToRefresh):
+                if group_nwkid in self.ListOfGroups:
+                    self.updateDomoGroupDevice( group_nwkid)
+            self.GroupsToRefresh = set()
 
         elif self.StartupPhase == 'init':
 
@@ -977,96 +1203,25 @@ class GroupsManagement(object):
         elif self.StartupPhase == 'discovery':
             # We will send a Request for Group memebership to each active device
             # In case a device doesn't belo,ng to any group, no response is provided.
-            Domoticz.Log("Group Management - Discovery mode - Searching for Group Membership (or continue)")
             self.stillWIP = True
-            _workcompleted = True
-            listofdevices = list(self.ListOfDevices)
-            for iterDev in listofdevices:
-                if 'PowerSource' in self.ListOfDevices[iterDev]:
-                    if self.ListOfDevices[iterDev]['PowerSource'] != 'Main':
-                        continue
-                if 'Ep' in self.ListOfDevices[iterDev]:
-                    for iterEp in self.ListOfDevices[iterDev]['Ep']:
-                        if iterEp == 'ClusterType': continue
-                        if  ( iterDev == '0000' or 'ClusterType' in self.ListOfDevices[iterDev] or 'ClusterType' in self.ListOfDevices[iterDev]['Ep'][iterEp] ) and \
-                              '0004' in self.ListOfDevices[iterDev]['Ep'][iterEp] and \
-                             ( '0006' in self.ListOfDevices[iterDev]['Ep'][iterEp] or '0008' in self.ListOfDevices[iterDev]['Ep'][iterEp] ):
-                            # As we are looking for Group Membership, we don't know to which Group it could belongs.
-                            # XXXX is a special group in the code to be used in that case.
-                            if 'GroupMgt' not in  self.ListOfDevices[iterDev]:
-                                self.ListOfDevices[iterDev]['GroupMgt'] = {}
-                            if iterEp not in  self.ListOfDevices[iterDev]['GroupMgt']:
-                                self.ListOfDevices[iterDev]['GroupMgt'][iterEp] = {}
-
-                            if 'XXXX' not in self.ListOfDevices[iterDev]['GroupMgt'][iterEp]:
-                                self.ListOfDevices[iterDev]['GroupMgt'][iterEp]['XXXX'] = {}
-                                self.ListOfDevices[iterDev]['GroupMgt'][iterEp]['XXXX']['Phase'] = {}
-                                self.ListOfDevices[iterDev]['GroupMgt'][iterEp]['XXXX']['Phase-Stamp'] = {}
-
-                            if 'Phase' in self.ListOfDevices[iterDev]['GroupMgt'][iterEp]['XXXX']:
-                                if self.ListOfDevices[iterDev]['GroupMgt'][iterEp]['XXXX']['Phase'] == 'REQ-Membership':
-                                    continue
-
-                            if  len(self.ZigateComm._normalQueue) > MAX_LOAD:
-                                Domoticz.Debug("normalQueue: %s" %len(self.ZigateComm._normalQueue))
-                                Domoticz.Debug("normalQueue: %s" %(str(self.ZigateComm._normalQueue)))
-                                Domoticz.Debug("too busy, will try again ...%s" %len(self.ZigateComm._normalQueue))
-                                _workcompleted = False
-                                break # will continue in the next cycle
-
-                            self.ListOfDevices[iterDev]['GroupMgt'][iterEp]['XXXX']['Phase'] = 'REQ-Membership'
-                            self.ListOfDevices[iterDev]['GroupMgt'][iterEp]['XXXX']['Phase-Stamp'] = int(time())
-                            self._getGroupMembership(iterDev, iterEp)   # We request MemberShip List
-                            Domoticz.Debug(" - request group membership for %s/%s" %(iterDev, iterEp))
-            else:
-                if _workcompleted:
-                    Domoticz.Log("hearbeatGroupMgt - Finish Discovery Phase" )
-                    self.StartupPhase = 'finish discovery'
+            if self.DiscoveryWork is None:
+                Domoticz.Log("Group Management - Discovery mode - Searching for Group Membership")
+                self._buildDiscoveryWork()
 
-        elif self.StartupPhase in ( 'finish discovery', 'finish discovery continue') :
-            # Check for completness or Timeout
-            if self.StartupPhase ==  'finish discovery':
-                Domoticz.Log("Group Management - Membership gathering")
-            self.StartupPhase = 'finish discovery continue'
-            now = time()
-            self.stillWIP = True
-            _completed = True
-            for iterDev in self.ListOfDevices:
-                if 'GroupMgt' in self.ListOfDevices[iterDev]:       # We select only the Device for which we have requested Group membership
-                    for iterEp in self.ListOfDevices[iterDev]['GroupMgt']:
-                        for iterGrp in self.ListOfDevices[iterDev]['GroupMgt'][iterEp]:
-                            if iterGrp == 'XXXX': continue
-                            if 'Phase' not in self.ListOfDevices[iterDev]['GroupMgt'][iterEp][iterGrp]:
-                                continue
-
-                            Domoticz.Debug('Checking if process is done for %s/%s - %s -> %s' 
-                                    %(iterDev,iterEp,iterGrp,str(self.ListOfDevices[iterDev]['GroupMgt'][iterEp][iterGrp])))
-
-                            if self.ListOfDevices[iterDev]['GroupMgt'][iterEp][iterGrp]['Phase'] == 'OK-Membership':
-                                continue
-                            if self.ListOfDevices[iterDev]['GroupMgt'][iterEp][iterGrp]['Phase-Stamp'] + TIMEOUT > now:
-                                _completed = False
-                                break # Need to wait a couple of sec.
-
-                            self.ListOfDevices[iterDev]['GroupMgt'][iterEp][iterGrp]['Phase'] = 'TimeOut'
-                            Domoticz.Debug(" - No response receive for %s/%s - assuming no group membership for %s " %(iterDev,iterEp, iterGrp))
-                        else:
-                            if 'XXXX' in self.ListOfDevices[iterDev]['GroupMgt'][iterEp]:
-                                Domoticz.Debug('Checking if process is done for %s/%s - XXXX -> %s' 
-                                    %(iterDev,iterEp,str(self.ListOfDevices[iterDev]['GroupMgt'][iterEp]['XXXX'])))
-                                if self.ListOfDevices[iterDev]['GroupMgt'][iterEp]['XXXX']['Phase-Stamp'] + TIMEOUT > now:
-                                    _completed = False
-                                    break
-                                del  self.ListOfDevices[iterDev]['GroupMgt'][iterEp]['XXXX']
+            if not self._discoveryPump():
+                Domoticz.Debug("Group Management - Discovery: %s to be requested, %s in flight, %s responses, %s timeout" 
+                        %(len(self.DiscoveryWork), len(self.DiscoveryInFlight), self.DiscoveryStats['Responses'], self.DiscoveryStats['TimeOut']))
             else:
-                if _completed:
-                    for iterGrp in self.ListOfGroups:
-                        Domoticz.Log("Group: %s - %s" %(iterGrp, self.ListOfGroups[iterGrp]['Name']))
-                        Domoticz.Debug("Group: %s - %s" %(iterGrp, str(self.ListOfGroups[iterGrp]['Devices'])))
-                        for iterDev, iterEp in self.ListOfGroups[iterGrp]['Devices']:
-                            Domoticz.Log("  - device: %s/%s %s" %( iterDev, iterEp, self.ListOfDevices[iterDev]['IEEE']))
-                    Domoticz.Log("Group Management - Discovery Completed" )
-                    self.StartupPhase = 'load config'
+                for iterGrp in self.ListOfGroups:
+                    Domoticz.Log("Group: %s - %s" %(iterGrp, self.ListOfGroups[iterGrp]['Name']))
+                    Domoticz.Debug("Group: %s - %s" %(iterGrp, str(self.ListOfGroups[iterGrp]['Devices'])))
+                    for iterDev, iterEp in self.ListOfGroups[iterGrp]['Devices']:
+                        Domoticz.Log("  - device: %s/%s %s" %( iterDev, iterEp, self.ListOfDevices[iterDev]['IEEE']))
+                Domoticz.Log("Group Management - Discovery Completed in %s sec: %s device/ep, %s responses, %s timeout" 
+                        %(round(time() - self.DiscoveryStats['Start']), self.DiscoveryStats['Total'], 
+                        self.DiscoveryStats['Responses'], self.DiscoveryStats['TimeOut']))
+                self.DiscoveryWork = None
+                self.StartupPhase = 'load config'
 
         elif  self.StartupPhase == 'load config':
             self.load_ZigateGroupConfiguration()
@@ -1178,7 +1333,7 @@ class GroupsManagement(object):
             Domoticz.Log("hearbeatGroupMgt - Perform Zigate commands")
             Domoticz.Log(" - Removal to be performed: %s" %str(self.TobeRemoved))
             for iterDev, iterEp, iterGrp in list(self.TobeRemoved):
-                if  len(self.ZigateComm._normalQueue) > MAX_LOAD:
+                if not self.ZigateComm.admission.admit( 'Groups' ):
                     Domoticz.Debug("normalQueue: %s" %len(self.ZigateComm._normalQueue))
                     Domoticz.Debug("normalQueue: %s" %(str(self.ZigateComm._normalQueue)))
                     _completed = False
@@ -1191,7 +1346,7 @@ class GroupsManagement(object):
 
             Domoticz.Log(" - Add to be performed: %s" %str(self.TobeAdded))
             for iterIEEE, iterDev, iterEp, iterGrp in list(self.TobeAdded):
-                if  len(self.ZigateComm._normalQueue) > MAX_LOAD:
+                if not self.ZigateComm.admission.admit( 'Groups' ):
                     Domoticz.Debug("normalQueue: %s" %len(self.ZigateComm._normalQueue))
                     Domoticz.Debug("normalQueue: %s" %(str(self.ZigateComm._normalQueue)))
                     _completed = False
@@ -1319,6 +1474,7 @@ class GroupsManagement(object):
 
             Domoticz.Status("Group Management - startup done")
             self.adminWidgets.updateNotificationWidget( self.Devices, 'Groups management startup completed')
+            self._buildGroupIndex()
             self.StartupPhase = 'ready'
             self.stillWIP = False
         return
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+"""
+Class SleepyMailbox
+
+Description: Deferred delivery of the configuration commands to sleepy End Devices
+
+A battery device ( MacCapa 0x80 or PowerSource Battery ) has its receiver off most of the time. A command sent to it
+mostly times out, and still takes a slot in the Transport. So when such a device has not been heard since more than
+MAILBOX_AWAKE sec, the non urgent commands ( MAILBOX_COMMANDS: Read/Write Attributes, Bind/Unbind, Configure
+Reporting, IAS Enroll Response ) are held in its mailbox instead of being sent.
+
+The mailbox is flushed as a burst as soon as a frame is received from the device ( Report 0x8102, IAS 0x8401,
+Device Announce 0x004d, ... ), while it is awake. When the device implements Poll Control ( cluster 0x0020 ),
+its Check-in is answered with a request to stay in Fast Poll while its mailbox is flushed.
+
+The devices under discovery are never held, as they are awake. The held commands expire after MAILBOX_TTL.
+"""
+
+import Domoticz
+
+from time import time
+
+from Classes.CircuitBreaker import commandTarget
+
+MAILBOX_AWAKE = 5               # sec, the device is considered awake after a frame
+MAILBOX_TTL = 86400             # sec, a held command is dropped after
+MAILBOX_SIZE = 32               # Max commands held per device
+FAST_POLL_TIMEOUT = 40          # Quarter sec, Fast Poll requested on Check-in when commands are held ( 10 sec )
+
+# Commands which can wait until the device wakes up
+MAILBOX_COMMANDS = ( 0x0030, 0x0031,        # Bind, Unbind ( payload starts with the IEEE )
+                     0x0100,                # Read Attributes
+                     0x0110,                # Write Attributes
+                     0x0120,                # Configure Reporting
+                     0x0400 )               # IAS Zone Enroll Response
+
+
+class SleepyMailbox:
+
+    def __init__( self, pluginconf, ZigateComm, ListOfDevices, IEEE2NWK ):
+
+        self.pluginconf = pluginconf
+        self.ZigateComm = ZigateComm
+        self.ListOfDevices = ListOfDevices
+        self.IEEE2NWK = IEEE2NWK
+        self.Mailbox = {}           # NwkId -> [ ( cmd, datas, timestamp ) ]
+        self.LastHeard = {}         # NwkId -> time of the last frame received
+
+    def _isSleepy( self, nwkid ):
+
+        device = self.ListOfDevices.get( nwkid )
+        if device is None or device.get('Status') != 'inDB':
+            return False
+        if 'PowerSource' in device:
+            return device['PowerSource'] == 'Battery'
+        return device.get('MacCapa') == '80'
+
+    def _target( self, cmd, datas ):
+
+        if int(cmd, 16) in ( 0x0030, 0x0031 ):
+            return self.IEEE2NWK.get( datas[0:16] )
+        return commandTarget( cmd, datas )
+
+    def hold( self, cmd, datas ):
+        ' return True if the command is kept in the mailbox of its sleeping target, instead of being sent '
+
+        if not self.pluginconf.sleepyMailbox or int(cmd, 16) not in MAILBOX_COMMANDS:
+            return False
+        nwkid = self._target( cmd, datas )
+        if nwkid is None or not self._isSleepy( nwkid ):
+            return False
+        if time() < self.LastHeard.get( nwkid, 0 ) + MAILBOX_AWAKE:
+            return False
+
+        mailbox = self.Mailbox.setdefault( nwkid, [] )
+        if [ entry for entry in mailbox if entry[0] == cmd and entry[1] == datas ]:
+            return True     # Already waiting for delivery
+        if len(mailbox) >= MAILBOX_SIZE:
+            Domoticz.Log("SleepyMailbox - %s mailbox full, dropping %s/%s" %(nwkid, mailbox[0][0], mailbox[0][1]))
+            del mailbox[0]
+        mailbox.append( ( cmd, datas, time() ) )
+        self.ZigateComm.statistics._held += 1
+        Domoticz.Debug("SleepyMailbox - %s asleep, holding %s/%s ( %s held )" %(nwkid, cmd, datas, len(mailbox)))
+        return True
+
+    def heard( self, nwkid ):
+        ' a frame was received from the device, deliver its mailbox while it is awake '
+
+        self.LastHeard[ nwkid ] = time()
+        if nwkid not in self.Mailbox:
+            return
+        mailbox = self.Mailbox.pop( nwkid )
+        now = time()
+        delivered = [ entry for entry in mailbox if now < entry[2] + MAILBOX_TTL ]
+        if len(delivered) != len(mailbox):
+            Domoticz.Log("SleepyMailbox - %s %s commands expired" %(nwkid, len(mailbox) - len(delivered)))
+        if delivered:
+            Domoticz.Log("SleepyMailbox - %s awake, delivering %s commands" %(nwkid, len(delivered)))
+        for cmd, datas, timestamp in delivered:
+            self.ZigateComm.sendData( cmd, datas )
+
+    def checkIn( self, nwkid, ep, sqn ):
+        ' Poll Control Check-in: ask the device to stay awake if commands are waiting, then deliver them '
+
+        fastPoll = nwkid in self.Mailbox
+        # Raw APS ( 0x0530 ) Check-in Response: ZCL cluster specific client to server, Start Fast Polling, Fast Poll Timeout
+        zcl = "11" + sqn + "00" + ( "01" if fastPoll else "00" ) + "%02x%02x" %( FAST_POLL_TIMEOUT & 0xff, FAST_POLL_TIMEOUT >> 8 )
+        datas = "02" + nwkid + "01" + ep + "0020" + "0104" + "02" + "1e" + "%02x" %( len(zcl) // 2 ) + zcl
+        self.ZigateComm.sendData( "0530", datas )
+        self.heard( nwkid )
+
+    def pending( self, nwkid ):
+        return len( self.Mailbox.get( nwkid, [] ))
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+"""
+Class OptimisticUpdates
+
+Description: Widget updates of the user commands, on the Zigate acceptance, reconciled with the device state
+
+The widget of a device ( mgtCommand ) or of a group ( GroupsManagement.processCommand ) is updated to the commanded
+state as soon as the Zigate accepts the command ( 0x8000 Status 00 ), and an expected state is recorded for the
+NwkId/Ep/Cluster of the command ( COALESCE_COMMANDS of the Transport ). A group-cast accepts the records of the group
+and of its members ( the FanOutOptimizer can merge the commands of the members ).
+
+    - Status other than 00, or no Status within OPTIMISTIC_STATUS_TIMEOUT sec: the widget is left unchanged
+    - Attribute Report or Read Attribute response of the Cluster once accepted: the actual state is on the widget, done
+    - nothing from a device within OPTIMISTIC_REPORT_TIMEOUT sec: the Cluster is read, and without answer within
+      OPTIMISTIC_VERIFY_TIMEOUT sec, the widget is rolled back to its previous state
+A group widget is reconciled by the reports of its members ( updateDomoGroupDevice ), it is not verified.
+"""
+
+import Domoticz
+
+from time import time
+
+from Classes.Transport import COALESCE_COMMANDS
+
+OPTIMISTIC_STATUS_TIMEOUT = 30  # sec, the command can wait in the Transport queue
+OPTIMISTIC_REPORT_TIMEOUT = 15  # sec, after the acceptance
+OPTIMISTIC_VERIFY_TIMEOUT = 15  # sec, after the Read Attribute
+
+
+class OptimisticUpdates:
+
+    def __init__( self, pluginconf ):
+
+        self.pluginconf = pluginconf
+        self.groupmgt = None    # GroupsManagement, set by the plugin once the groups are managed
+        self.Expected = {}      # ( NwkId or Group, Ep, Cluster ) -> { 'Unit', 'State', 'Previous', 'Battery', 'Signal', 'Group', 'Phase', 'Deadline' }
+        self.Accepted = []      # ( key, record ) to be put on the widgets
+        self.Stats = { 'confirmed': 0, 'refused': 0, 'lost': 0, 'rolledback': 0 }
+
+    def expect( self, nwkid, ep, cmd, unit, state, previous, battery=255, signal=None, group=False ):
+        ' record the state expected from the command. Return False if the widget is to be updated now '
+
+        if not self.pluginconf.optimisticUpdates or int(cmd, 16) not in COALESCE_COMMANDS:
+            return False
+        key = ( nwkid, ep, COALESCE_COMMANDS[ int(cmd, 16) ] )
+        if key in self.Expected:
+            previous = self.Expected[key]['Previous']   # The last state known for sure
+        self.Expected[ key ] = { 'Unit': unit, 'State': state, 'Previous': previous, 'Battery': battery, 'Signal': signal,
+                'Group': group, 'Phase': 'Sent', 'Deadline': time() + OPTIMISTIC_STATUS_TIMEOUT }
+        return True
+
+    def _targets( self, datas ):
+        ' ( address, Ep ) the command is sent to, with the members of a group '
+
+        targets = [ ( datas[2:6], datas[8:10] ) ]
+        if datas[0:2] == '01' and self.groupmgt and datas[2:6] in self.groupmgt.ListOfGroups:
+            targets += self.groupmgt.ListOfGroups[ datas[2:6] ]['Devices']
+        return targets
+
+    def status( self, cmd, datas, Status ):
+        ' the Zigate answered the command '
+
+        if not self.Expected or int(cmd, 16) not in COALESCE_COMMANDS or len(datas) < 10:
+            return
+        cluster = COALESCE_COMMANDS[ int(cmd, 16) ]
+        for nwkid, ep in self._targets( datas ):
+            key = ( nwkid, ep, cluster )
+            record = self.Expected.get( key )
+            if record is None or record['Phase'] != 'Sent':
+                continue
+            if Status != '00':
+                Domoticz.Log("OptimisticUpdates - %s/%s command %s refused ( %s ), widget left unchanged" %(nwkid, ep, cmd, Status))
+                self.Stats['refused'] += 1
+                del self.Expected[key]
+                continue
+            record['Phase'] = 'Accepted'
+            record['Deadline'] = time() + OPTIMISTIC_REPORT_TIMEOUT
+            self.Accepted.append( ( key, record ) )
+
+    def accepted( self ):
+        ' return and forget the ( key, record ) whose state is to be put on the widget now '
+
+        accepted = self.Accepted
+        self.Accepted = []
+        return accepted
+
+    def reported( self, nwkid, ep, cluster ):
+        ' the device sent the state of the Cluster, which is now on the widget '
+
+        key = ( nwkid, ep, cluster.lower() )
+        if key not in self.Expected or self.Expected[key]['Phase'] == 'Sent':
+            # Still in the Transport queue, this is the state before the command
+            return
+        del self.Expected[key]
+        self.Stats['confirmed'] += 1
+
+    def due( self ):
+        ' return the keys to verify with a Read Attribute, and the ( key, record ) to roll back '
+
+        now = time()
+        verify = []
+        rollback = []
+        for key in list( self.Expected ):
+            record = self.Expected[key]
+            if now < record['Deadline']:
+                continue
+            if record['Phase'] == 'Sent':
+                Domoticz.Log("OptimisticUpdates - %s/%s no Status for the %s command, widget left unchanged" %key)
+                self.Stats['lost'] += 1
+                del self.Expected[key]
+            elif record['Phase'] == 'Accepted' and not record['Group']:
+                record['Phase'] = 'Verify'
+                record['Deadline'] = now + OPTIMISTIC_VERIFY_TIMEOUT
+                verify.append( key )
+            elif record['Phase'] == 'Verify':
+                Domoticz.Log("OptimisticUpdates - %s/%s no %s state from the device, widget rolled back" %key)
+                self.Stats['rolledback'] += 1
+                rollback.append( ( key, record ))
+                del self.Expected[key]
+            else:
+                del self.Expected[key]
+        return verify, rollback
+
+    def printSummary( self ):
+
+        if sum( self.Stats.values() ):
+            Domoticz.Status("Optimistic widget updates: %s confirmed, %s refused, %s without Status, %s rolled back" \
+                    %(self.Stats['confirmed'], self.Stats['refused'], self.Stats['lost'], self.Stats['rolledback']))
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+"""
+Class SendPacing
+
+Description: Congestion control of the commands sent to the Zigate ( AIMD, as TCP does )
+
+The pace is made of two values:
+    - window: number of commands sent and still waiting for their 0x8000 Status. It grows by one every 'window'
+      successful Status ( additive increase ), up to pacingMaxWindow, and is halved on congestion ( multiplicative
+      decrease ). A window of 1 is the historical one-command-at-a-time behaviour, and the default.
+    - delay: delay, in sec, given to Connection.Send(). It stays at sendDelay while the window can absorb the
+      congestion, doubles on congestion when the window is already at 1, and goes back down by one second every
+      PACING_RECOVERY successful Status.
+
+Congestion is detected when:
+    - the Zigate answers a Status telling it cannot take the command now ( BUSY_STATUS ). The command is then
+      requeued by the Transport instead of being dropped
+    - a Status doesn't come in time
+    - the ratio of 0x8702 APS failures over the commands sent goes above PACING_APS_RATIO
+
+Only one decrease is applied per PACING_HOLD sec for the timeouts and APS failures, as several of them usually come
+from the same congestion. Each busy Status is an explicit request from the Zigate, and always decreases the pace.
+"""
+
+import Domoticz
+
+from time import time
+
+# Status of 0x8000 which mean "not now", the command can be sent again later
+BUSY_STATUS = ( '04',       # Busy
+                'c2',       # Request cannot be processed
+                'cf',       # Route discovery failed due to lack of table space
+                'd2' )      # No room in the Broadcast Transaction Table
+
+PACING_MAX_DELAY = 8        # sec, max delay between 2 commands
+PACING_RECOVERY = 8         # Successful Status to reduce the delay by 1 sec
+PACING_HOLD = 1.0           # sec, min time between 2 decreases
+PACING_SAMPLE = 20          # Commands sent before evaluating the APS failure ratio
+PACING_APS_RATIO = 0.25     # APS failures / commands sent considered as congestion
+PACING_MAX_REQUEUE = 3      # Max number of times a command is requeued on busy Status
+
+
+class SendPacing:
+
+    def __init__( self, pluginconf, statistics ):
+
+        self.statistics = statistics
+        self.minDelay = pluginconf.sendDelay
+        self.maxWindow = pluginconf.pacingMaxWindow
+        self._window = 1.0
+        self._delay = self.minDelay
+        self._clean = 0             # Successful Status since the last delay change
+        self._lastDecrease = 0
+        self._sent = 0              # Commands sent in the current APS sample
+        self._apsFailures = 0       # 0x8702 received in the current APS sample
+
+    def updateTunables( self, pluginconf ):
+
+        self.minDelay = pluginconf.sendDelay
+        self.maxWindow = pluginconf.pacingMaxWindow
+        self._delay = max( self._delay, self.minDelay )
+        self._window = min( self._window, self.maxWindow )
+
+    def window( self ):
+        ' return the number of commands which can wait for a Status '
+        return int(self._window)
+
+    def delay( self ):
+        ' return the delay to apply on the next command sent '
+        return self._delay
+
+    def sent( self ):
+
+        self._sent += 1
+        if self._sent < PACING_SAMPLE:
+            return
+        if self._apsFailures / self._sent > PACING_APS_RATIO:
+            self._congestion( "%s APS failures for %s commands" %(self._apsFailures, self._sent) )
+        self._sent = self._apsFailures = 0
+
+    def apsFailure( self ):
+        self._apsFailures += 1
+
+    def timeout( self ):
+        self._congestion( "Status timeout" )
+
+    def status( self, Status ):
+        ' account a 0x8000 Status. return True if the command has to be sent again later '
+
+        if Status in BUSY_STATUS:
+            self.statistics.countBusy()
+            self._congestion( "Status %s" %Status, hold=False )
+            return True
+
+        if Status == '00':
+            self._window = min( self._window + 1 / self._window, self.maxWindow )
+            if self._delay > self.minDelay:
+                self._clean += 1
+                if self._clean >= PACING_RECOVERY:
+                    self._clean = 0
+                    self._delay -= 1
+                    Domoticz.Debug("SendPacing - delay reduced to %s sec" %self._delay)
+        return False
+
+    def _congestion( self, reason, hold=True ):
+
+        now = time()
+        if hold and now - self._lastDecrease < PACING_HOLD:
+            return
+        self._lastDecrease = now
+        self._clean = 0
+        if self._window >= 2:
+            self._window = max( 1.0, self._window / 2 )
+        else:
+            self._delay = min( max( 1, self._delay * 2 ), PACING_MAX_DELAY )
+        Domoticz.Log("SendPacing - congestion ( %s ), window: %s, delay: %s sec" %(reason, self.window(), self._delay))
@@ -9,77 +9,114 @@ Class PluginConf
 Description: Import the PluginConf.txt file and initialized each of the available parameters in this file
 Parameters not define in the PluginConf.txt file will be set to their default value.
 
+Each parameter is described in SETTINGS with its type, default value, validation and if it can be changed at runtime.
+The file is parsed with ast.literal_eval ( no eval ), and can be reloaded while the plugin is running. In that case
+the 'live' parameters are applied immediatly, the others will be taken into account at the next restart.
+
+Types:
+    int    : decimal integer, optionaly within [ min, max ]
+    str    : free string, or one of 'values'
+    choice : string converted with 'values' { 'string': value }, default if unknown
+    list   : comma separated list of strings
+    hex    : hexadecimal integer
+    path   : directory, default is relative to the plugin home directory
 """
 
 import Domoticz
+import ast
 import os.path
 
+SETTINGS = (
+    ( 'Device Management', (
+        { 'param': 'allowStoreDiscoveryFrames',     'type': 'int', 'default': 0, 'live': True },
+        { 'param': 'allowForceCreationDomoDevice',  'type': 'int', 'default': 0, 'live': True },
+        { 'param': 'allowReBindingClusters',        'type': 'int', 'default': 1, 'live': True },   # When receiving a Device Annouced, allow rebinding on clustered.
+        { 'param': 'resetConfigureReporting',       'type': 'int', 'default': 0, 'live': False },  # Allow to reset the Configure Reporting record
+        { 'param': 'warmupWindow',                  'type': 'int', 'default': 300, 'live': False, 'min': 0, 'max': 3600 },  # sec, start-up requests to the known devices are spread over
+        { 'param': 'reportingMonitor',              'type': 'int', 'default': 1, 'live': True },   # Bind and Configure Reporting again the Attributes which stopped reporting
+        { 'param': 'resetReadAttributes',           'type': 'int', 'default': 0, 'live': False },  # Allow to reset the ReadAttribute
+        { 'param': 'enableReadAttributes',          'type': 'int', 'default': 0, 'live': True },   # Enable the plugin to poll information from the devices.
+        { 'param': 'resetMotiondelay',              'type': 'int', 'default': 30, 'live': True },
+        { 'param': 'vibrationAqarasensitivity',     'type': 'str', 'default': 'medium', 'live': True, 'values': ( 'high', 'medium', 'low' ) },
+        { 'param': 'TradfriKelvinStep',             'type': 'int', 'default': 51, 'live': True, 'min': 0, 'max': 255 },
+        { 'param': 'downsampleMinInterval',         'type': 'int', 'default': 10, 'live': True, 'min': 0, 'max': 3600 },  # Min sec between 2 power widget updates ( 0: every report )
+        { 'param': 'downsampleDeadband',            'type': 'int', 'default': 5, 'live': True, 'min': 0, 'max': 100 },    # % of change needed to update the power widget
+        { 'param': 'downsampleAverage',             'type': 'int', 'default': 1, 'live': True },   # Publish the average of the reports held back, instead of the last one
+        { 'param': 'enableLearnedTemplates',        'type': 'int', 'default': 1, 'live': True },   # Learn the discovery of Models not in DeviceConf.txt and reuse it for the next ones
+        { 'param': 'optimisticUpdates',             'type': 'int', 'default': 1, 'live': True },   # Update the widget of a command once accepted by the Zigate, roll back if the device does not confirm
+        )),
+    ( 'Zigate Configuration', (
+        { 'param': 'channel',                       'type': 'list', 'default': 0, 'live': False },
+        { 'param': 'allowRemoveZigateDevice',       'type': 'int', 'default': 0, 'live': True },
+        { 'param': 'eraseZigatePDM',                'type': 'int', 'default': 0, 'live': False },
+        { 'param': 'blueLedOff',                    'type': 'int', 'default': 0, 'live': False },
+        { 'param': 'TXpower',                       'type': 'hex', 'default': None, 'live': False },
+        { 'param': 'Certification',                 'type': 'choice', 'default': 0, 'live': False, 'values': { 'CE': 0x01, 'FCC': 0x02 } },  # 1- CE; 2- FCC
+        { 'param': 'enableAPSFailureLoging',        'type': 'int', 'default': 0, 'live': True },
+        )),
+    ( 'Plugin Transport', (
+        { 'param': 'zmode',                         'type': 'str', 'default': 'ZigBee', 'live': True, 'values': ( 'ZigBee', 'Agressive' ) },  # Cmd -> Ack -> Data or Cmd -> Ack
+        { 'param': 'reTransmit',                    'type': 'int', 'default': 1, 'live': True, 'min': 0, 'max': 5 },   # Number of retransmit if Data not reach at TO
+        { 'param': 'zTimeOut',                      'type': 'int', 'default': 2, 'live': True, 'min': 1, 'max': 60 },  # Timeout to get Ack and Data
+        { 'param': 'CrcCheck',                      'type': 'int', 'default': 1, 'live': True },
+        { 'param': 'sendDelay',                     'type': 'int', 'default': 0, 'live': True, 'min': 0, 'max': 10 },   # Min delay between 2 commands, raised on congestion
+        { 'param': 'dropDuplicateFrames',           'type': 'int', 'default': 1, 'live': True },   # Drop the Attribute Reports received twice ( same SQN )
+        { 'param': 'sleepyMailbox',                 'type': 'int', 'default': 1, 'live': True },   # Hold the configuration commands to battery devices until they are heard
+        { 'param': 'breakerThreshold',              'type': 'int', 'default': 5, 'live': True, 'min': 0, 'max': 50 },   # Failures before suspending the background requests to a device ( 0: never )
+        { 'param': 'pacingMaxWindow',               'type': 'int', 'default': 1, 'live': True, 'min': 1, 'max': 8 },    # Max commands sent waiting for their Status ( 1: one at a time )
+        { 'param': 'Ping',                          'type': 'int', 'default': 1, 'live': True },
+        { 'param': 'airtimeRate',                   'type': 'int', 'default': 4, 'live': True, 'min': 0, 'max': 50 },   # Frames per second, shared by the background requests ( 0: no admission control )
+        { 'param': 'airtimeReserve',                'type': 'int', 'default': 30, 'live': True, 'min': 0, 'max': 90 },  # % of the airtime kept for the user commands
+        { 'param': 'routeWarmBudget',               'type': 'int', 'default': 6, 'live': True, 'min': 0, 'max': 60 },   # Max route warming requests per minute to the idle mains devices ( 0: none )
+        { 'param': 'coalesceCommands',              'type': 'int', 'default': 1, 'live': True },   # Replace a queued Level/Colour/OnOff command by the newer one to the same target
+        )),
+    ( 'Plugin Directories', (
+        { 'param': 'pluginData',                    'type': 'path', 'default': 'Data/', 'live': False },
+        { 'param': 'pluginZData',                   'type': 'path', 'default': 'Zdatas/', 'live': False },
+        { 'param': 'pluginConfig',                  'type': 'path', 'default': 'Conf/', 'live': False },
+        { 'param': 'pluginWWW',                     'type': 'path', 'default': 'www/', 'live': False },
+        { 'param': 'pluginReports',                 'type': 'path', 'default': 'www/zigate/reports/', 'live': False },
+        )),
+    ( 'Groups Management', (
+        { 'param': 'enablegroupmanagement',         'type': 'int', 'default': 0, 'live': False },
+        { 'param': 'discoverZigateGroups',          'type': 'int', 'default': 1, 'live': False },
+        { 'param': 'enableConfigGroups',            'type': 'int', 'default': 1, 'live': False },
+        { 'param': 'groupDiscoveryWindow',          'type': 'int', 'default': 4, 'live': True, 'min': 1, 'max': 16 },   # Max 0x0062 in flight during discovery
+        { 'param': 'groupDiscoveryTimeout',         'type': 'int', 'default': 12, 'live': True, 'min': 2, 'max': 60 },  # Max wait for a 0x8062
+        { 'param': 'groupCastFanOut',               'type': 'int', 'default': 1, 'live': True },   # Replace the queued identical commands to all the members of a group by a group-cast
+        )),
+    ( 'Reportings and Statistics', (
+        { 'param': 'logLQI',                        'type': 'int', 'default': 0, 'live': True },
+        { 'param': 'networkScan',                   'type': 'int', 'default': 0, 'live': True },
+        { 'param': 'reportDownsampleDays',          'type': 'int', 'default': 7, 'live': True, 'min': 1 },      # Raw reports are downsampled to hourly after
+        { 'param': 'reportRetentionDays',           'type': 'int', 'default': 365, 'live': True, 'min': 1 },    # Reports are removed after
+        )),
+    ( 'Debugging', (
+        { 'param': 'logFORMAT',                     'type': 'int', 'default': 0, 'live': True },
+        { 'param': 'debugReadCluster',              'type': 'int', 'default': 0, 'live': True },
+        )),
+    )
+
+# Parameters which have to be pushed to the Transport layer when changed
+TRANSPORT_SETTINGS = ( 'zmode', 'reTransmit', 'zTimeOut', 'sendDelay', 'coalesceCommands', 'pacingMaxWindow', 'breakerThreshold' )
+
+
 class PluginConf:
 
     def __init__(self, homedir, hardwareid):
-        def is_hex(s):
-            hex_digits = set("0123456789abcdef")
-            for char in s:
-                if not (char in hex_digits):
-                    return False
-            return True
-
-        self.logFORMAT = 0
-
-        # Device Management
-        self.allowStoreDiscoveryFrames = 0
-        self.allowForceCreationDomoDevice = 0
-        self.allowReBindingClusters = 1  # When receiving a Device Annouced, allow rebinding on clustered.
-        self.resetConfigureReporting = 0 # Allow to reset the Configure Reporting record
-        self.resetReadAttributes = 0 # Allow to reset the ReadAttribute
-        self.enableReadAttributes = 0 # Enable the plugin to poll information from the devices.
-        self.resetMotiondelay = 30
-        self.vibrationAqarasensitivity = 'medium' # Possible values are 'high', 'medium', 'low'
-        self.TradfriKelvinStep = 51
-
-        # Zigate Configuration
-        self.channel = 0
-        self.allowRemoveZigateDevice = 0
-        self.eraseZigatePDM = 0
-        self.blueLedOff = 0
-        self.TXpower = 0
-        self.TXpower_set = 0x80
-        self.Certification = 0  # 1- CE; 2- FCC
-        self.enableAPSFailureLoging = 0
-
-        # Plugin Transport
-        self.zmode = 'ZigBee'  # Default mode. Cmd -> Ack -> Data
-        self.reTransmit = 1  # Default mode, we do one retransmit if Data not reach at TO
-        self.zTimeOut = 2  # 2'' Tiemout to get Ack and Data
-        self.CrcCheck = 1
-        self.sendDelay = 0
-        self.Ping = 1
-
-        # Plugin Directories
+
         self.pluginHome = homedir
         self.homedirectory = homedir
-        self.pluginData = self.pluginHome + 'Data/'
-        self.pluginZData = self.pluginHome + 'Zdatas/'
-        self.pluginConfig = self.pluginHome + 'Conf/'
-        self.pluginWWW = self.pluginHome + 'www/'
-        #self.pluginReports = self.pluginWWW + 'zigate/reports/'
-        self.pluginReports = self.pluginHome + 'www/zigate/reports/'
-
+        self.hardwareid = hardwareid
         self.filename = None
+        self.mtime = None
+        self.PluginConf = {}        # Raw content of the PluginConf.txt file
+        self._loaded = {}           # Values as loaded from the file, to find what has changed at reload
 
-        # Groups Management
-        self.enablegroupmanagement = 0
-        self.discoverZigateGroups = 1
-        self.enableConfigGroups = 1
-
-        # Network Topoology
-        self.logLQI = 0
-        self.networkScan = 0
-
-        # Debugging
-        self.debugReadCluster = 0
-
-        # Zigate
+        # Set all defaults
+        for group, settings in SETTINGS:
+            for setting in settings:
+                setattr( self, setting['param'], self._default( setting ))
 
         # Import PluginConf.txt
         self.filename = self.pluginConfig + "PluginConf-%02d.txt" %hardwareid
@@ -89,221 +126,122 @@ class PluginConf:
                 self.filename = self.pluginConfig + "PluginConf.txt"
 
         Domoticz.Status("PluginConf: %s" %self.filename)
-        tmpPluginConf = ""
-        self.PluginConf = {}
-        if not os.path.isfile( self.filename ) :
-            return
+        if os.path.isfile( self.filename ) :
+            self.PluginConf = self._readFile()
+            self._loaded = self._parse( self.PluginConf )
+            for param in self._loaded:
+                setattr( self, param, self._loaded[param] )
+                Domoticz.Status(" -%s: %s" %(param, self._loaded[param]))
 
-        with open( self.filename, 'r') as myPluginConfFile:
-            tmpPluginConf += myPluginConfFile.read().replace('\n', '')
+        self._derived()
+        self._debugDump()
+        self._checkDirectories()
+
+    def _default( self, setting ):
+
+        if setting['type'] == 'path':
+            return self.pluginHome + setting['default']
+        return setting['default']
 
+    def _readFile( self ):
+        ' Return the content of PluginConf.txt as a dict, or an empty dict in case of error '
+
+        self.mtime = os.path.getmtime( self.filename )
+        with open( self.filename, 'r') as myPluginConfFile:
+            tmpPluginConf = myPluginConfFile.read()
         Domoticz.Debug("PluginConf.txt = " + str(tmpPluginConf))
 
         try:
-            self.PluginConf = eval(tmpPluginConf)
-
+            content = ast.literal_eval( tmpPluginConf )
         except SyntaxError:
             Domoticz.Error("Syntax Error in %s, all plugin parameters set to default" %self.filename)
-        except (NameError, TypeError, ZeroDivisionError):
+            return {}
+        except ValueError:
             Domoticz.Error("Error while importing %s, all plugin parameters set to default" %self.filename)
-            
+            return {}
+        if not isinstance( content, dict ):
+            Domoticz.Error("Error while importing %s, all plugin parameters set to default" %self.filename)
+            return {}
+        return content
+
+    def _convert( self, setting, value ):
+        ' Convert and validate a value from the file. Raise ValueError if not valid '
+
+        if setting['type'] == 'int':
+            if isinstance( value, int ):
+                result = value
+            elif isinstance( value, str ) and value.strip().isdigit():
+                result = int( value.strip(), 10 )
+            else:
+                raise ValueError("not a positive integer")
+            if 'min' in setting and result < setting['min']:
+                raise ValueError("lower than %s" %setting['min'])
+            if 'max' in setting and result > setting['max']:
+                raise ValueError("greater than %s" %setting['max'])
+            return result
+
+        if setting['type'] == 'hex':
+            if isinstance( value, int ):
+                return value
+            return int( str(value), 16 )
+
+        if setting['type'] == 'choice':
+            if value in setting['values']:
+                return setting['values'][ value ]
+            return setting['default']
+
+        if setting['type'] == 'list':
+            return [c.strip() for c in str(value).split(',')]
+
+        # str and path
+        value = str(value)
+        if 'values' in setting and value not in setting['values']:
+            raise ValueError("must be one of %s" %str(setting['values']))
+        return value
+
+    def _parse( self, content ):
+        ' Return a dict of the valid parameters found in content '
+
+        values = {}
+        for group, settings in SETTINGS:
+            for setting in settings:
+                param = setting['param']
+                if param not in content or content[ param ] == '':
+                    continue
+                try:
+                    values[ param ] = self._convert( setting, content[ param ] )
+                except ValueError as e:
+                    Domoticz.Error("PluginConf - %s: '%s' %s, using %s" %(param, content[ param ], e, getattr( self, param)))
+        for param in content:
+            if param not in [ setting['param'] for group, settings in SETTINGS for setting in settings ]:
+                Domoticz.Log("PluginConf - unknown parameter %s, ignored" %param)
+        return values
+
+    def _derived( self ):
+        ' Parameters computed from others '
+
+        # TXpower: not set -> default power, valid hex -> set it, invalid -> disabled
+        if 'TXpower' in self.PluginConf:
+            if isinstance( self.TXpower, int ):
+                self.TXpower_set = self.TXpower
+                self.TXpower = 1
+            else:
+                self.TXpower = self.TXpower_set = 0
         else:
-            if self.PluginConf.get('vibrationAqarasensitivity'):
-                self.vibrationAqarasensitivity = self.PluginConf['vibrationAqarasensitivity']
-                Domoticz.Status(" -vibrationAqarasensitivity: %s" %self.vibrationAqarasensitivity)
-
-            if self.PluginConf.get('TradfriKelvinStep') and \
-                    self.PluginConf.get('TradfriKelvinStep').isdigit():
-                self.TradfriKelvinStep = int(self.PluginConf['TradfriKelvinStep'], 10)
-                if self.TradfriKelvinStep < 0 or self.TradfriKelvinStep > 255:
-                    self.TradfriKelvinStep = 75
-
-            if self.PluginConf.get('pluginData'):
-                self.pluginData = self.PluginConf['pluginData']
-
-            if self.PluginConf.get('pluginZData'):
-                self.pluginZData = self.PluginConf['pluginZData']
-                Domoticz.Status(" -pluginData: %s" %self.pluginData)
-
-            if self.PluginConf.get('pluginReports'):
-                self.pluginReports = self.PluginConf['pluginReports']
-                Domoticz.Status(" -pluginReports: %s" %self.pluginReports)
-
-            if self.PluginConf.get('pluginConfig'):
-                self.pluginConfig = self.PluginConf['pluginConfig']
-                Domoticz.Status(" -pluginConfig: %s" %self.pluginConfig)
-
-            if self.PluginConf.get('pluginWWW'):
-                self.pluginWWW = self.PluginConf['pluginWWW']
-                Domoticz.Status(" -pluginWWW: %s" %self.pluginWWW)
-
-            if self.PluginConf.get('enablegroupmanagement') and \
-                    self.PluginConf.get('enablegroupmanagement').isdigit():
-                self.enablegroupmanagement = int(self.PluginConf['enablegroupmanagement'], 10)
-                Domoticz.Status(" -enablegroupmanagement: %s" %self.enablegroupmanagement)
-
-            if self.PluginConf.get('debugReadCluster') and \
-                    self.PluginConf.get('debugReadCluster').isdigit():
-                self.debugReadCluster = int(self.PluginConf['debugReadCluster'], 10)
-
-            if self.PluginConf.get('resetMotiondelay') and \
-                    self.PluginConf.get('resetMotiondelay').isdigit():
-                self.resetMotiondelay = int(self.PluginConf['resetMotiondelay'], 10)
-                Domoticz.Status(" -resetMotiondelay: %s" %self.resetMotiondelay)
-
-            if self.PluginConf.get('sendDelay') and \
-                    self.PluginConf.get('sendDelay').isdigit():
-                self.sendDelay = int(self.PluginConf['sendDelay'], 10)
-                Domoticz.Status(" -sendDelay: %s" %self.sendDelay)
-
-            if self.PluginConf.get('Ping') and \
-                    self.PluginConf.get('Ping').isdigit():
-                self.Ping = int(self.PluginConf['Ping'], 10)
-                Domoticz.Status(" -Ping: %s" %self.Ping)
-
-            if self.PluginConf.get('allowStoreDiscoveryFrames') and \
-                    self.PluginConf.get('allowStoreDiscoveryFrames').isdigit():
-                self.allowStoreDiscoveryFrames = int(self.PluginConf['allowStoreDiscoveryFrames'], 10)
-                Domoticz.Status(" -allowStoreDiscoveryFrames : %s" %self.allowStoreDiscoveryFrames)
-
-            if self.PluginConf.get('allowReBindingClusters') and \
-                    self.PluginConf.get('allowReBindingClusters').isdigit():
-                self.allowReBindingClusters = int(self.PluginConf['allowReBindingClusters'], 10)
-                Domoticz.Status(" -allowReBindingClusters: %s" %self.allowReBindingClusters)
-
-            if self.PluginConf.get('resetConfigureReporting') and \
-                    self.PluginConf.get('resetConfigureReporting').isdigit():
-                self.resetConfigureReporting = int(self.PluginConf['resetConfigureReporting'], 10)
-                Domoticz.Status(" -resetConfigureReporting: %s" %self.resetConfigureReporting)
-
-            if self.PluginConf.get('resetReadAttributes') and \
-                    self.PluginConf.get('resetReadAttributes').isdigit():
-                self.resetReadAttributes = int(self.PluginConf['resetReadAttributes'], 10)
-                Domoticz.Status(" -resetReadAttributes: %s" %self.resetReadAttributes)
-
-            if self.PluginConf.get('enableReadAttributes') and \
-                    self.PluginConf.get('enableReadAttributes').isdigit():
-                self.enableReadAttributes = int(self.PluginConf['enableReadAttributes'], 10)
-                Domoticz.Status(" -enableReadAttributes: %s" %self.enableReadAttributes)
-
-            if self.PluginConf.get('logFORMAT') and \
-                    self.PluginConf.get('logFORMAT').isdigit():
-                self.logFORMAT = int(self.PluginConf['logFORMAT'], 10)
-                Domoticz.Status(" -logFORMAT: %s" %self.logFORMAT)
-
-            if self.PluginConf.get('logLQI') and self.PluginConf.get('logLQI').isdigit():
-                self.logLQI = int(self.PluginConf['logLQI'], 10)
-                Domoticz.Status(" -logLQI: %s"% self.logLQI)
-
-            if self.PluginConf.get('allowRemoveZigateDevice') and \
-                    self.PluginConf.get('allowRemoveZigateDevice').isdigit():
-                self.allowRemoveZigateDevice = int(self.PluginConf['allowRemoveZigateDevice'], 10)
-                Domoticz.Status(" -allowRemoveZigateDevice: %s" %self.allowRemoveZigateDevice)
-
-            if self.PluginConf.get('allowForceCreationDomoDevice') and \
-                    self.PluginConf.get('allowForceCreationDomoDevice').isdigit():
-                self.allowForceCreationDomoDevice = int(self.PluginConf['allowForceCreationDomoDevice'], 10)
-                Domoticz.Status(" -allowForceCreationDomoDevice: %s" %self.allowForceCreationDomoDevice)
-
-            if self.PluginConf.get('networkScan') and \
-                    self.PluginConf.get('networkScan').isdigit():
-                self.networkScan = int(self.PluginConf['networkScan'], 10)
-                Domoticz.Status(" -networkScan: %s" %self.networkScan)
-
-            if self.PluginConf.get('channel'): 
-                self.channel = self.PluginConf.get('channel')
-                self.channel = [c.strip() for c in self.channel.split(',')]
-                Domoticz.Status(" -channel: %s" %self.channel)
-
-            if self.PluginConf.get('enableAPSFailureLoging') and \
-                    self.PluginConf.get('enableAPSFailureLoging').isdigit():
-                self.enableAPSFailureLoging = int(self.PluginConf.get('enableAPSFailureLoging'))
-                Domoticz.Status(" -enableAPSFailureLogin: %s" %self.enableAPSFailureLoging)
-
-            if self.PluginConf.get('blueLedOff') and \
-                    self.PluginConf.get('blueLedOff').isdigit():
-                self.blueLedOff = int(self.PluginConf.get('blueLedOff'))
-                Domoticz.Status(" -blueLedOff: %s" %self.blueLedOff)
-
-            if self.PluginConf.get('TXpower'):
-                self.TXpower_set = self.PluginConf.get('TXpower')
-                if is_hex(self.TXpower_set):
-                    self.TXpower = 1
-                    self.TXpower_set = int(self.PluginConf.get('TXpower'), 16)
-                else: 
-                    self.TXpower = self.TXpower_set = 0
-                Domoticz.Status(" -TXpower: %s" %self.TXpower_set)
-
-            if self.PluginConf.get('Certification'):
-                if self.PluginConf.get('Certification') == 'CE':
-                    self.Certification = 0x01
-                elif self.PluginConf.get('Certification') == 'FCC':
-                    self.Certification = 0x02
-                else:
-                    self.Certification = 0
-                Domoticz.Status(" -Certification: %s" %self.Certification)
-
-            if self.PluginConf.get('zmode'):
-                if self.PluginConf.get('zmode') == 'Agressive':
-                    self.zmode = 'Agressive'  # We are only waiting for Ack to send the next Command
-                Domoticz.Status(" -zmode: %s" %self.zmode)
-
-            if self.PluginConf.get('reTransmit') and \
-                    self.PluginConf.get('reTransmit').isdigit():
-                self.reTransmit = int(self.PluginConf.get('reTransmit'))
-                Domoticz.Status(" -reTransmit: %s" %self.reTransmit)
-
-            if self.PluginConf.get('zTimeOut') and \
-                    self.PluginConf.get('zTimeOut').isdigit():
-                self.zTimeOut = int(self.PluginConf.get('zTimeOut'))
-                Domoticz.Status(" -zTimeOut: %s" %self.zTimeOut)
-
-        Domoticz.Debug("Device Management:")
-        Domoticz.Debug(" -allowStoreDiscoveryFrames : %s" %self.allowStoreDiscoveryFrames)
-        Domoticz.Debug(" -allowForceCreationDomoDevice: %s" %self.allowForceCreationDomoDevice)
-        Domoticz.Debug(" -allowReBindingClusters: %s" %self.allowReBindingClusters)
-        Domoticz.Debug(" -resetConfigureReporting: %s" %self.resetConfigureReporting)
-        Domoticz.Debug(" -resetReadAttributes: %s" %self.resetReadAttributes)
-        Domoticz.Debug(" -enableReadAttributes: %s" %self.enableReadAttributes)
-        Domoticz.Debug(" -resetMotiondelay: %s" %self.resetMotiondelay)
-        Domoticz.Debug(" -vibrationAqarasensitivity: %s" %self.vibrationAqarasensitivity)
-
-        Domoticz.Debug("Zigate Configuration")
-        Domoticz.Debug(" -channel: %s" %self.channel)
-        Domoticz.Debug(" -allowRemoveZigateDevice: %s" %self.allowRemoveZigateDevice)
-        Domoticz.Debug(" -eraseZigatePDM: %s" %self.eraseZigatePDM)
-        Domoticz.Debug(" -blueLedOff: %s" %self.blueLedOff)
-        Domoticz.Debug(" -TXpower: %s" %self.TXpower_set)
-        Domoticz.Debug(" -Certification: %s" %self.Certification)
-
-        Domoticz.Debug("Plugin Transport")
-        Domoticz.Debug(" -zmode: %s" %self.zmode)
-        Domoticz.Debug(" -reTransmit: %s" %self.reTransmit)
-        Domoticz.Debug(" -zTimeOut: %s" %self.zTimeOut)
-        Domoticz.Debug(" -CrcCheck: %s" %self.CrcCheck)
-        Domoticz.Debug(" -sendDelay: %s" %self.sendDelay)
-        Domoticz.Debug(" -Ping: %s" %self.Ping)
-
-        Domoticz.Debug("Plugin Directories")
+            self.TXpower = 0
+            self.TXpower_set = 0x80
+
+    def _debugDump( self ):
+
+        for group, settings in SETTINGS:
+            Domoticz.Debug("%s:" %group)
+            for setting in settings:
+                Domoticz.Debug(" -%s: %s" %(setting['param'], getattr( self, setting['param'])))
         Domoticz.Debug(" -pluginHome: %s" %self.pluginHome)
-        Domoticz.Debug(" -pluginData: %s" %self.pluginData)
-        Domoticz.Debug(" -pluginZData: %s" %self.pluginZData)
-        Domoticz.Debug(" -pluginReports: %s" %self.pluginReports)
-        Domoticz.Debug(" -pluginConfig: %s" %self.pluginConfig)
-        Domoticz.Debug(" -pluginWWW: %s" %self.pluginWWW)
         Domoticz.Debug(" -homedirectory: %s" %self.homedirectory)
         Domoticz.Debug(" -filename: %s" %self.filename)
 
-        # Groups Management
-        Domoticz.Debug("Groups Management")
-        Domoticz.Debug(" -enablegroupmanagement: %s" %self.enablegroupmanagement)
-        Domoticz.Debug(" -discoverZigateGroups: %s" %self.discoverZigateGroups)
-        Domoticz.Debug(" -enableConfigGroups: %s" %self.enableConfigGroups)
-
-        # Network Topoology
-        Domoticz.Debug("Reportings and Statistics")
-        Domoticz.Debug(" -logLQI: %s"% self.logLQI)
-        Domoticz.Debug(" -networkScan: %s" %self.networkScan)
+    def _checkDirectories( self ):
 
         if not os.path.exists( self.pluginData ):
             Domoticz.Error( "Cannot access pluginData: %s" %self.pluginData)
@@ -315,3 +253,47 @@ class PluginConf:
             Domoticz.Error( "Cannot access pluginWWW: %s" %self.pluginWWW)
         if not os.path.exists( self.pluginReports ):
             Domoticz.Error( "Cannot access pluginReports: %s" %self.pluginReports)
+
+    def isModified( self ):
+
+        if self.filename is None or not os.path.isfile( self.filename ):
+            return False
+        return os.path.getmtime( self.filename ) != self.mtime
+
+    def reload( self ):
+        """
+        Reload PluginConf.txt and apply the 'live' parameters which have changed.
+        Return a tuple of 2 dict { param: ( old, new ) }: the applied ones and the ones requiring a restart
+        """
+
+        applied = {}
+        restart = {}
+        if not os.path.isfile( self.filename ):
+            return applied, restart
+
+        content = self._readFile()
+        if content == {} and self.PluginConf != {}:
+            # Most-likely an error while editing the file. Keep the current values
+            return applied, restart
+        newValues = self._parse( content )
+
+        for group, settings in SETTINGS:
+            for setting in settings:
+                param = setting['param']
+                old = self._loaded.get( param, self._default( setting ))
+                new = newValues.get( param, self._default( setting ))
+                if old == new:
+                    continue
+                if setting['live']:
+                    setattr( self, param, new )
+                    applied[ param ] = ( old, new )
+                    Domoticz.Status("PluginConf - %s changed from %s to %s" %(param, old, new))
+                else:
+                    restart[ param ] = ( old, new )
+                    Domoticz.Status("PluginConf - %s changed from %s to %s, will be applied at next restart" %(param, old, new))
+
+        # Only the live parameters are considered as loaded, so the others will still be reported as pending
+        for param in applied:
+            self._loaded[ param ] = applied[ param ][1]
+        self.PluginConf = content
+        return applied, restart
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+"""
+Class ReportManifest
+
+Description: Index of the reports made available to the Web UI ( www/zigate.html )
+
+Each LQI or Network scan is written in its own small file ( LQI-xx-<timestamp>.json, Network-xx-<timestamp>.json ) and
+referenced in the manifest Reports-xx.json:
+    { 'HardwareID', 'Updated', 'Devices': device index file, 'Summary': LQI summary file,
+      'Reports': { 'LQI': [ { 'TimeStamp', 'File', 'Offset', 'Length' } ], 'Network': [ ... ] },
+      'Legacy': { legacy file: { 'Size', 'MTime' } } }
+
+The reports appended in the past to LQI_reports-xx.txt.json and Network_scan-xx.json are indexed by their byte
+offsets, so the UI can fetch a single scan from them ( HTTP Range ). Those files are not appended anymore.
+
+Devices-xx.json is the list of the Domoticz Devices of this HardwareID, so the UI doesn't have to request all
+Devices from Domoticz and filter them.
+
+Snapshots older than reportRetentionDays are removed from the manifest, and their file deleted.
+"""
+
+import Domoticz
+import json
+import os
+import os.path
+
+from time import time
+
+MANIFEST_FILENAME = "Reports-%02d.json"
+DEVICE_INDEX_FILENAME = "Devices-%02d.json"
+SNAPSHOT_FILENAME = "%s-%02d-%s.json"
+SUMMARY_FILENAME = "LQI_summary-%02d.json"
+
+# Report type -> legacy file where the reports were appended
+LEGACY_FILES = {
+    'LQI': "LQI_reports-%02d.txt.json",
+    'Network': "Network_scan-%02d.json",
+    }
+
+
+class ReportManifest:
+
+    def __init__( self, PluginConf, HardwareID ):
+
+        self.pluginconf = PluginConf
+        self.HardwareID = HardwareID
+        self.reportsDir = self.pluginconf.pluginReports
+        self.manifestFilename = self.reportsDir + MANIFEST_FILENAME %HardwareID
+        self.deviceIndex = None      # Last device index written
+
+        self.Manifest = { 'HardwareID': HardwareID, 'Updated': 0,
+                'Devices': DEVICE_INDEX_FILENAME %HardwareID, 'Summary': SUMMARY_FILENAME %HardwareID,
+                'Reports': { reportType: [] for reportType in LEGACY_FILES }, 'Legacy': {} }
+
+        if not os.path.isdir( self.reportsDir ):
+            Domoticz.Error("Unable to get access to directory %s, please check PluginConf.txt" %(self.reportsDir))
+            self.reportsDir = None
+            return
+        self._loadManifest()
+        indexed = self._indexLegacy()
+        if self._applyRetention() or indexed:
+            self._writeManifest()
+
+    def _loadManifest( self ):
+
+        if not os.path.isfile( self.manifestFilename ):
+            return
+        try:
+            with open( self.manifestFilename, 'rt') as handle:
+                manifest = json.load( handle )
+        except (ValueError, OSError) as e:
+            Domoticz.Error("ReportManifest - Unable to load %s: %s, rebuilding" %(self.manifestFilename, e))
+            return
+        for reportType in self.Manifest['Reports']:
+            self.Manifest['Reports'][reportType] = manifest.get('Reports', {}).get( reportType, [] )
+        self.Manifest['Legacy'] = manifest.get('Legacy', {})
+
+    def _writeManifest( self ):
+
+        self.Manifest['Updated'] = int(time())
+        for reportType in self.Manifest['Reports']:
+            self.Manifest['Reports'][reportType].sort( key=lambda entry: entry['TimeStamp'] )
+        try:
+            with open( self.manifestFilename, 'wt') as handle:
+                json.dump( self.Manifest, handle, separators=(',', ':'))
+        except OSError as e:
+            Domoticz.Error("ReportManifest - Unable to write %s: %s" %(self.manifestFilename, e))
+
+    def _indexLegacy( self ):
+        ' Index by byte offset the reports appended to the legacy files. Return True if the manifest changed '
+
+        changed = False
+        for reportType in LEGACY_FILES:
+            legacy = LEGACY_FILES[reportType] %self.HardwareID
+            filename = self.reportsDir + legacy
+            if not os.path.isfile( filename ):
+                continue
+            size = os.path.getsize( filename )
+            mtime = os.path.getmtime( filename )
+            if legacy in self.Manifest['Legacy'] and self.Manifest['Legacy'][legacy] == { 'Size': size, 'MTime': mtime }:
+                continue
+
+            entries = [ entry for entry in self.Manifest['Reports'][reportType] if entry['File'] != legacy ]
+            offset = 0
+            with open( filename, 'rb') as handle:
+                for line in handle:
+                    length = len( line.rstrip( b'\r\n' ))
+                    if length > 0:
+                        try:
+                            report = json.loads( line.decode('utf-8') )
+                            for timestamp in report:
+                                entries.append( { 'TimeStamp': int(timestamp), 'File': legacy, 'Offset': offset, 'Length': length } )
+                        except ValueError:
+                            Domoticz.Log("ReportManifest - skipping a corrupted report in %s at %s" %(legacy, offset))
+                    offset += len( line )
+            self.Manifest['Reports'][reportType] = entries
+            self.Manifest['Legacy'][legacy] = { 'Size': size, 'MTime': mtime }
+            Domoticz.Status("ReportManifest - %s indexed" %legacy)
+            changed = True
+        return changed
+
+    def _applyRetention( self ):
+        ' Remove the reports older than the retention. Return True if the manifest changed '
+
+        limit = int(time()) - self.pluginconf.reportRetentionDays * 24 * 3600
+        changed = False
+        for reportType in self.Manifest['Reports']:
+            keep = []
+            for entry in self.Manifest['Reports'][reportType]:
+                if entry['TimeStamp'] >= limit:
+                    keep.append( entry )
+                    continue
+                changed = True
+                if entry['File'] not in self.Manifest['Legacy'] and os.path.isfile( self.reportsDir + entry['File'] ):
+                    os.remove( self.reportsDir + entry['File'] )
+            self.Manifest['Reports'][reportType] = keep
+
+        # Remove the legacy files which have no more report referenced
+        for legacy in list( self.Manifest['Legacy'] ):
+            if any( entry['File'] == legacy for reportType in self.Manifest['Reports'] for entry in self.Manifest['Reports'][reportType] ):
+                continue
+            if os.path.isfile( self.reportsDir + legacy ):
+                os.remove( self.reportsDir + legacy )
+            del self.Manifest['Legacy'][legacy]
+            changed = True
+        return changed
+
+    def addSnapshot( self, reportType, timestamp, report ):
+        ' Write the report in its own file and reference it in the manifest. Return True if done '
+
+        if self.reportsDir is None:
+            return False
+        snapshot = SNAPSHOT_FILENAME %( reportType, self.HardwareID, timestamp )
+        content = json.dumps( { str(timestamp): report }, separators=(',', ':') )
+        try:
+            with open( self.reportsDir + snapshot, 'wt') as handle:
+                handle.write( content )
+        except OSError as e:
+            Domoticz.Error("ReportManifest - Unable to write %s: %s" %(snapshot, e))
+            return False
+
+        self.Manifest['Reports'][reportType].append( { 'TimeStamp': int(timestamp), 'File': snapshot, 'Offset': 0, 'Length': len(content) } )
+        self._applyRetention()
+        self._writeManifest()
+        return True
+
+    def writeDeviceIndex( self, Devices, ListOfDevices ):
+        ' Write the list of Domoticz Devices of this HardwareID, with the plugin information, when it changed '
+
+        if self.reportsDir is None:
+            return
+        nwkids = {}
+        for nwkid in ListOfDevices:
+            if 'IEEE' in ListOfDevices[nwkid]:
+                nwkids[ ListOfDevices[nwkid]['IEEE'] ] = nwkid
+
+        index = []
+        for unit in Devices:
+            device = {}
+            device['idx'] = Devices[unit].ID
+            device['Unit'] = unit
+            device['Name'] = Devices[unit].Name
+            device['IEEE'] = Devices[unit].DeviceID
+            device['LastUpdate'] = Devices[unit].LastUpdate
+            device['NwkId'] = nwkids.get( Devices[unit].DeviceID, '' )
+            device['Model'] = ''
+            if device['NwkId'] != '' and isinstance( ListOfDevices[ device['NwkId'] ].get('Model'), str ):
+                device['Model'] = ListOfDevices[ device['NwkId'] ]['Model']
+            index.append( device )
+        index.sort( key=lambda device: device['Name'] )
+
+        if index == self.deviceIndex:
+            return
+        try:
+            with open( self.reportsDir + self.Manifest['Devices'], 'wt') as handle:
+                json.dump( index, handle, separators=(',', ':'))
+        except OSError as e:
+            Domoticz.Error("ReportManifest - Unable to write %s: %s" %(self.Manifest['Devices'], e))
+            return
+        self.deviceIndex = index
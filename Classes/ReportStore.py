@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+"""
+Class ReportStore
+
+Description: Time series store for the plugin reports ( SQLite in WAL mode, one database per HardwareID )
+
+Tables:
+    transport_stats - one row per snapshot of the Transport counters ( cumulative since 'start' )
+    channel_scan    - one row per channel for each Network Interference scan ( 0x804A )
+    lqi_snapshot    - one row per link ( source, neighbour ) for each LQI scan
+    frame_stats     - one row per device and period: Attribute Reports received, duplicates, SQN gaps
+    airtime_stats   - one row per subsystem and period: frames admitted and refused by the AdmissionControl
+
+Each row has a 'ts' ( epoch ) and a 'resolution' ( 0 for raw data, otherwise the size in sec of the bucket it
+summarizes ). Raw data older than reportDownsampleDays is downsampled to hourly buckets, and to daily buckets after
+4 times that period. Anything older than reportRetentionDays is removed.
+"""
+
+import Domoticz
+import sqlite3
+
+from time import time
+
+REPORT_STORE_FILENAME = "ReportStore-%02d.db"
+HOUR = 3600
+DAY = 24 * HOUR
+
+TRANSPORT_COLUMNS = ( 'sent', 'received', 'ack', 'ackKO', 'data', 'TOstatus', 'TOdata', 'crcErrors', 'frameErrors',
+                      'clusterOK', 'clusterKO', 'reTx', 'MaxLoad', 'start' )
+
+TABLES = {
+    'transport_stats': "CREATE TABLE IF NOT EXISTS transport_stats ( ts INTEGER NOT NULL, resolution INTEGER NOT NULL DEFAULT 0, "
+                        + ', '.join( "%s INTEGER" %column for column in TRANSPORT_COLUMNS ) + " )",
+    'channel_scan': "CREATE TABLE IF NOT EXISTS channel_scan ( ts INTEGER NOT NULL, resolution INTEGER NOT NULL DEFAULT 0, "
+                        "channel INTEGER NOT NULL, interference REAL, total_tx INTEGER, total_failures INTEGER )",
+    'lqi_snapshot': "CREATE TABLE IF NOT EXISTS lqi_snapshot ( ts INTEGER NOT NULL, resolution INTEGER NOT NULL DEFAULT 0, "
+                        "source TEXT NOT NULL, neighbour TEXT NOT NULL, lqi INTEGER, depth INTEGER, devicetype TEXT, relationship TEXT )",
+    'frame_stats': "CREATE TABLE IF NOT EXISTS frame_stats ( ts INTEGER NOT NULL, resolution INTEGER NOT NULL DEFAULT 0, "
+                        "nwkid TEXT NOT NULL, received INTEGER, duplicates INTEGER, lost INTEGER )",
+    'airtime_stats': "CREATE TABLE IF NOT EXISTS airtime_stats ( ts INTEGER NOT NULL, resolution INTEGER NOT NULL DEFAULT 0, "
+                        "subsystem TEXT NOT NULL, admitted INTEGER, denied INTEGER )",
+    }
+
+# Columns which can be used as a key ( GROUP BY ) when downsampling, the others are aggregated
+TABLE_KEYS = {
+    'transport_stats': ( 'start', ),   # Counters restart at each plugin start
+    'channel_scan': ( 'channel', ),
+    'lqi_snapshot': ( 'source', 'neighbour', 'devicetype', 'relationship' ),
+    'frame_stats': ( 'nwkid', ),
+    'airtime_stats': ( 'subsystem', ),
+    }
+
+# How each column is downsampled. Transport counters are cumulative, so the last value of the bucket is kept
+TABLE_DOWNSAMPLE = {
+    'transport_stats': { column: 'MAX' for column in TRANSPORT_COLUMNS if column != 'start' },
+    'channel_scan': { 'interference': 'AVG', 'total_tx': 'MAX', 'total_failures': 'MAX' },
+    'lqi_snapshot': { 'lqi': 'AVG', 'depth': 'MAX' },
+    'frame_stats': { 'received': 'SUM', 'duplicates': 'SUM', 'lost': 'SUM' },
+    'airtime_stats': { 'admitted': 'SUM', 'denied': 'SUM' },
+    }
+
+AGGREGATES = ( 'AVG', 'MIN', 'MAX', 'SUM', 'COUNT' )
+
+
+class ReportStore:
+
+    def __init__( self, PluginConf, HardwareID ):
+
+        self.pluginconf = PluginConf
+        self.filename = self.pluginconf.pluginData + REPORT_STORE_FILENAME %HardwareID
+        self.db = None
+        self.lastMaintenance = 0
+        self._open()
+
+    def _open( self ):
+
+        try:
+            self.db = sqlite3.connect( self.filename )
+            self.db.execute( "PRAGMA journal_mode=WAL" )
+            self.db.execute( "PRAGMA synchronous=NORMAL" )
+            for table in TABLES:
+                self.db.execute( TABLES[table] )
+                self.db.execute( "CREATE INDEX IF NOT EXISTS %s_ts ON %s ( ts )" %(table, table) )
+            self.db.commit()
+        except sqlite3.Error as e:
+            Domoticz.Error("ReportStore - Unable to open %s: %s" %(self.filename, e))
+            self.db = None
+
+    def close( self ):
+
+        if self.db:
+            self.db.close()
+            self.db = None
+
+    def _insert( self, table, columns, rows ):
+
+        if self.db is None or len(rows) == 0:
+            return False
+        statement = "INSERT INTO %s ( %s ) VALUES ( %s )" %(table, ', '.join( columns ), ', '.join( '?' * len(columns) ))
+        try:
+            with self.db:
+                self.db.executemany( statement, rows )
+        except sqlite3.Error as e:
+            Domoticz.Error("ReportStore - Unable to store in %s: %s" %(table, e))
+            return False
+        return True
+
+    def addTransportStats( self, stats, timestamp=None ):
+        ' stats is a dict of the TRANSPORT_COLUMNS counters '
+
+        if timestamp is None:
+            timestamp = int(time())
+        columns = ( 'ts', ) + TRANSPORT_COLUMNS
+        return self._insert( 'transport_stats', columns, [ ( timestamp, ) + tuple( stats.get( column, 0 ) for column in TRANSPORT_COLUMNS ) ] )
+
+    def addChannelScan( self, interferences, totalTx, totalFailures, timestamp=None ):
+        ' interferences is a dict channel -> interference level '
+
+        if timestamp is None:
+            timestamp = int(time())
+        rows = [ ( timestamp, int(channel), interferences[channel], totalTx, totalFailures ) for channel in sorted( interferences ) ]
+        return self._insert( 'channel_scan', ( 'ts', 'channel', 'interference', 'total_tx', 'total_failures' ), rows )
+
+    def addLQISnapshot( self, LQI, timestamp=None ):
+        ' LQI is the result of the LQI scan: LQI[source][neighbour] = { _lnkqty, _depth, _devicetype, _relationshp } '
+
+        if timestamp is None:
+            timestamp = int(time())
+
+        def _int( value ):
+            try:
+                return int( value, 16 )
+            except (TypeError, ValueError):
+                return None
+
+        rows = []
+        for source in LQI:
+            for neighbour in LQI[source]:
+                entry = LQI[source][neighbour]
+                rows.append( ( timestamp, source, neighbour, _int( entry.get('_lnkqty') ), _int( entry.get('_depth') ),
+                    entry.get('_devicetype'), entry.get('_relationshp') ))
+        return self._insert( 'lqi_snapshot', ( 'ts', 'source', 'neighbour', 'lqi', 'depth', 'devicetype', 'relationship' ), rows )
+
+    def addFrameStats( self, stats, timestamp=None ):
+        ' stats is a dict NwkId -> { received, duplicates, lost } counted since the previous call '
+
+        if timestamp is None:
+            timestamp = int(time())
+        rows = [ ( timestamp, nwkid, stats[nwkid]['received'], stats[nwkid]['duplicates'], stats[nwkid]['lost'] ) for nwkid in sorted( stats ) ]
+        return self._insert( 'frame_stats', ( 'ts', 'nwkid', 'received', 'duplicates', 'lost' ), rows )
+
+    def addAirtimeStats( self, stats, timestamp=None ):
+        ' stats is a dict Subsystem -> { admitted, denied } counted since the previous call '
+
+        if timestamp is None:
+            timestamp = int(time())
+        rows = [ ( timestamp, subsystem, stats[subsystem]['admitted'], stats[subsystem]['denied'] ) for subsystem in sorted( stats ) ]
+        return self._insert( 'airtime_stats', ( 'ts', 'subsystem', 'admitted', 'denied' ), rows )
+
+    @staticmethod
+    def _checkColumn( table, column ):
+
+        if table not in TABLES:
+            raise ValueError( "unknown table %s" %table )
+        if column not in ( 'ts', 'resolution' ) and column not in TABLE_KEYS[table] and column not in TABLE_DOWNSAMPLE[table]:
+            raise ValueError( "unknown column %s for %s" %(column, table) )
+
+    def query( self, table, start=None, end=None, columns=None, where=None ):
+        """
+        Return the rows ( as dict ) of table between start and end ( epoch, included ), ordered by time.
+        where is an optional dict column -> value
+        """
+
+        if self.db is None:
+            return []
+        if columns is None:
+            columns = ( 'ts', 'resolution' ) + TABLE_KEYS[table] + tuple( TABLE_DOWNSAMPLE[table] )
+        for column in columns:
+            self._checkColumn( table, column )
+
+        clauses, params = self._where( table, start, end, where )
+        statement = "SELECT %s FROM %s%s ORDER BY ts" %(', '.join( columns ), table, clauses)
+        try:
+            cursor = self.db.execute( statement, params )
+            return [ dict( zip( columns, row )) for row in cursor.fetchall() ]
+        except sqlite3.Error as e:
+            Domoticz.Error("ReportStore - query on %s failed: %s" %(table, e))
+            return []
+
+    def aggregate( self, table, column, function='AVG', start=None, end=None, bucket=None, groupBy=(), where=None ):
+        """
+        Return function( column ) between start and end, per bucket ( in sec ) if provided, and per groupBy columns.
+        Each row is a dict with 'bucket' ( start of the bucket, or None ), the groupBy columns and 'value'
+        """
+
+        if self.db is None:
+            return []
+        function = function.upper()
+        if function not in AGGREGATES:
+            raise ValueError( "unknown aggregate %s" %function )
+        self._checkColumn( table, column )
+        for key in groupBy:
+            self._checkColumn( table, key )
+
+        selectBucket = "NULL"
+        groups = list( groupBy )
+        if bucket:
+            selectBucket = "( ts / %d ) * %d" %( int(bucket), int(bucket) )
+            groups.insert( 0, selectBucket )
+        clauses, params = self._where( table, start, end, where )
+        statement = "SELECT %s, %s %s(%s) FROM %s%s" %( selectBucket, ''.join( key + ', ' for key in groupBy ), function, column, table, clauses )
+        if groups:
+            statement += " GROUP BY " + ', '.join( groups ) + " ORDER BY " + ', '.join( groups )
+        try:
+            result = []
+            for row in self.db.execute( statement, params ).fetchall():
+                item = { 'bucket': row[0], 'value': row[-1] }
+                for idx, key in enumerate( groupBy ):
+                    item[key] = row[ 1 + idx ]
+                result.append( item )
+            return result
+        except sqlite3.Error as e:
+            Domoticz.Error("ReportStore - aggregate on %s failed: %s" %(table, e))
+            return []
+
+    def _where( self, table, start, end, where ):
+
+        clauses = []
+        params = []
+        if start is not None:
+            clauses.append( "ts >= ?" )
+            params.append( int(start) )
+        if end is not None:
+            clauses.append( "ts <= ?" )
+            params.append( int(end) )
+        if where:
+            for column in sorted( where ):
+                self._checkColumn( table, column )
+                clauses.append( "%s = ?" %column )
+                params.append( where[column] )
+        if clauses:
+            return " WHERE " + " AND ".join( clauses ), params
+        return "", params
+
+    def _downsample( self, table, olderThan, fromResolution, toResolution ):
+        ' Replace the rows older than olderThan, with a resolution lower than toResolution, by one row per bucket '
+
+        keys = TABLE_KEYS[table]
+        values = TABLE_DOWNSAMPLE[table]
+        bucket = "( ts / %d ) * %d" %( toResolution, toResolution )
+        columns = ( 'ts', 'resolution' ) + keys + tuple( values )
+        select = "SELECT %s, %d%s, %s FROM %s WHERE ts < ? AND resolution <= ? AND resolution < ? GROUP BY %s" %(
+                bucket, toResolution, ''.join( ', ' + key for key in keys ),
+                ', '.join( "%s(%s)" %( values[column], column ) for column in values ),
+                table, ', '.join( ( bucket, ) + keys ))
+        # Only complete buckets are downsampled
+        limit = ( olderThan // toResolution ) * toResolution
+        with self.db:
+            self.db.execute( "INSERT INTO %s ( %s ) %s" %( table, ', '.join( columns ), select ), ( limit, fromResolution, toResolution ))
+            self.db.execute( "DELETE FROM %s WHERE ts < ? AND resolution <= ? AND resolution < ?" %table, ( limit, fromResolution, toResolution ))
+
+    def maintenance( self ):
+        ' Downsample old data and apply the retention. To be called on a regular basis ( once a day is enough ) '
+
+        if self.db is None:
+            return
+        now = int(time())
+        self.lastMaintenance = now
+        downsample = self.pluginconf.reportDownsampleDays * DAY
+        retention = self.pluginconf.reportRetentionDays * DAY
+        try:
+            for table in TABLES:
+                self._downsample( table, now - downsample, 0, HOUR )
+                self._downsample( table, now - 4 * downsample, HOUR, DAY )
+                with self.db:
+                    self.db.execute( "DELETE FROM %s WHERE ts < ?" %table, ( now - retention, ))
+            self.db.execute( "PRAGMA wal_checkpoint(TRUNCATE)" )
+        except sqlite3.Error as e:
+            Domoticz.Error("ReportStore - maintenance failed: %s" %e)
+            return
+        Domoticz.Log("ReportStore - maintenance done ( downsampling after %s days, retention %s days )"
+                %(self.pluginconf.reportDownsampleDays, self.pluginconf.reportRetentionDays))
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+"""
+Class ReportingMonitor
+
+Description: Liveness of the Configure Reporting ( 0x0120 ) done on the devices
+
+For each Attribute configured with a MaxInterval, the device must send a report at least every MaxInterval sec.
+A device which lost its reporting configuration ( power cycle, factory reset, rejoin ) silently stops reporting.
+
+An Attribute is overdue when no report has been received since REPORTING_GRACE x MaxInterval + REPORTING_MARGIN sec.
+The Bind and the Configure Reporting are then sent again, for the overdue Attributes only. A given
+NwkId/Ep/Cluster is reconfigured at most every REPORTING_RETRY_MIN sec, doubling up to REPORTING_RETRY_MAX while it
+stays silent, and no more than REPORTING_BURST of them are reconfigured per check.
+"""
+
+import Domoticz
+
+from time import time
+
+REPORTING_GRACE = 2             # Overdue after this number of MaxInterval
+REPORTING_MARGIN = 60           # sec, added to the grace period
+REPORTING_RETRY_MIN = 3600      # sec, min delay between 2 reconfigurations of a NwkId/Ep/Cluster
+REPORTING_RETRY_MAX = 86400     # sec
+REPORTING_BURST = 2             # Max reconfigurations per check
+REPORTING_MAX_INTERVAL = 0xFFFE # A larger MaxInterval ( or 0 ) means no periodic report
+
+
+class ReportingMonitor:
+
+    def __init__( self, pluginconf, ListOfDevices ):
+
+        self.pluginconf = pluginconf
+        self.ListOfDevices = ListOfDevices
+        self.Reporting = {}     # ( NwkId, Ep, Cluster ) -> { attribute: { 'Attribute', 'MaxInterval', 'Reported' } }
+        self.Retry = {}         # ( NwkId, Ep, Cluster ) -> { 'Next', 'Interval' }
+
+    def configured( self, nwkid, ep, cluster, maxIntervals, sent=False ):
+        ' track the { Attribute: MaxInterval } configured for the NwkId/Ep/Cluster. sent: a 0x0120 was just sent '
+
+        now = int(time())
+        attributes = self.Reporting.setdefault( ( nwkid, ep, cluster.lower() ), {} )
+        for attribute, maxInterval in maxIntervals.items():
+            if not 0 < maxInterval < REPORTING_MAX_INTERVAL:
+                continue
+            if attribute.lower() in attributes and not sent:
+                continue
+            attributes[ attribute.lower() ] = { 'Attribute': attribute, 'MaxInterval': maxInterval, 'Reported': now }
+
+    def reported( self, nwkid, ep, cluster, attribute ):
+
+        key = ( nwkid, ep, cluster.lower() )
+        if key not in self.Reporting or attribute.lower() not in self.Reporting[key]:
+            return
+        self.Reporting[key][attribute.lower()]['Reported'] = int(time())
+        if key in self.Retry:
+            Domoticz.Log("ReportingMonitor - %s/%s %s reporting again" %(nwkid, ep, cluster))
+            del self.Retry[key]
+
+    def _isConfigured( self, nwkid, ep, cluster ):
+        ' the device accepted the Configure Reporting ( 0x8120 Status 00 ) '
+
+        configureReporting = self.ListOfDevices[nwkid].get( 'ConfigureReporting', {} )
+        for iterCluster, status in configureReporting.get( 'Ep', {} ).get( ep, {} ).items():
+            if iterCluster.lower() == cluster:
+                return status == '00'
+        return False
+
+    def overdue( self, skip=(), admit=None ):
+        ' return the ( NwkId, Ep, Cluster, [ Attributes ] ) to reconfigure now, within the airtime admitted, and schedule their next retry '
+
+        if not self.pluginconf.reportingMonitor:
+            return []
+        now = int(time())
+        result = []
+        for key in list( self.Reporting ):
+            nwkid, ep, cluster = key
+            if nwkid not in self.ListOfDevices:
+                del self.Reporting[key]
+                self.Retry.pop( key, None )
+                continue
+            if len(result) >= REPORTING_BURST:
+                break
+            if nwkid in skip or now < self.Retry.get( key, {} ).get( 'Next', 0 ):
+                continue
+            if not self._isConfigured( nwkid, ep, cluster ):
+                continue
+
+            silent = [ entry['Attribute'] for entry in self.Reporting[key].values()
+                    if now > entry['Reported'] + REPORTING_GRACE * entry['MaxInterval'] + REPORTING_MARGIN ]
+            if not silent:
+                continue
+            if admit and not admit():
+                break
+            interval = REPORTING_RETRY_MIN
+            if key in self.Retry:
+                interval = min( self.Retry[key]['Interval'] * 2, REPORTING_RETRY_MAX )
+            self.Retry[key] = { 'Next': now + interval, 'Interval': interval }
+            Domoticz.Log("ReportingMonitor - %s/%s %s no report for %s, reconfiguring ( next check in %s sec )" \
+                    %(nwkid, ep, cluster, silent, interval))
+            result.append( ( nwkid, ep, cluster, silent ) )
+        return result
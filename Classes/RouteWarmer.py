@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+"""
+Class RouteWarmer
+
+Description: Keep the routes to the mains powered devices in the routing tables
+
+When no frame has gone to or come from a device for a while, the route to it has expired ( or was never
+discovered since the restart ). The next command then starts with a route discovery, and often times out.
+
+The devices which have not been heard since ROUTE_IDLE sec get a lightweight request ( Read Attribute of the ZCL
+Version, 0x0000/0x0000 ), which makes the route discovered again. The devices which announced themselves again
+( 0x004d, route change ) are warmed first, then the others in the order of the user commands they receive, so the
+lights used every day get a warm route. At most routeWarmBudget requests are sent per minute.
+
+The answer ( or the lack of answer ) feeds the CircuitBreaker through the Transport, as any other request.
+"""
+
+import Domoticz
+
+from time import time
+
+ROUTE_IDLE = 1800               # sec, a route not used since is considered as expired
+ROUTE_DECAY = 3600              # sec, the command counts are halved at this interval
+
+
+class RouteWarmer:
+
+    def __init__( self, pluginconf, ListOfDevices ):
+
+        self.pluginconf = pluginconf
+        self.ListOfDevices = ListOfDevices
+        self.Commands = {}      # NwkId -> number of user commands ( decayed )
+        self.LastHeard = {}     # NwkId -> time of the last frame received
+        self.Rejoined = []      # NwkId which announced again, to be warmed first
+        self.lastDecay = time()
+        self.sent = 0
+        self.answered = 0
+        self.Warming = {}       # NwkId -> time the request was sent
+
+    def commanded( self, nwkid ):
+        self.Commands[ nwkid ] = self.Commands.get( nwkid, 0 ) + 1
+
+    def heard( self, nwkid ):
+
+        self.LastHeard[ nwkid ] = time()
+        if self.Warming.pop( nwkid, None ) is not None:
+            self.answered += 1
+
+    def rejoined( self, nwkid ):
+
+        if nwkid not in self.Rejoined:
+            self.Rejoined.append( nwkid )
+
+    def _isMains( self, nwkid ):
+
+        device = self.ListOfDevices[nwkid]
+        if device.get('Status') != 'inDB':
+            return False
+        if 'PowerSource' in device:
+            return device['PowerSource'] == 'Main'
+        return device.get('MacCapa') == '8e'
+
+    def candidates( self, skip=(), admit=None ):
+        ' return the NwkId to send a route warming request to now, within the budget and the airtime admitted '
+
+        budget = self.pluginconf.routeWarmBudget
+        if not budget:
+            return []
+        now = time()
+        if now > self.lastDecay + ROUTE_DECAY:
+            self.lastDecay = now
+            self.Commands = { nwkid: count // 2 for nwkid, count in self.Commands.items() if count > 1 }
+
+        for nwkid in list( self.Warming ):
+            if now > self.Warming[nwkid] + ROUTE_IDLE:
+                del self.Warming[nwkid]     # No answer, the Transport has reported it to the CircuitBreaker
+
+        idle = [ nwkid for nwkid in self.ListOfDevices if nwkid not in ( '0000', 'ffff' ) and nwkid not in self.Rejoined
+                and now > self.LastHeard.get( nwkid, 0 ) + ROUTE_IDLE ]
+        idle.sort( key=lambda nwkid: -self.Commands.get( nwkid, 0 ) )
+        result = []
+        for nwkid in self.Rejoined + idle:
+            if len(result) >= budget:
+                break
+            if nwkid not in self.ListOfDevices or nwkid in skip or nwkid in self.Warming or not self._isMains( nwkid ):
+                continue
+            if admit and not admit():
+                break
+            result.append( nwkid )
+        for nwkid in result:
+            self.Warming[ nwkid ] = now
+            if nwkid in self.Rejoined:
+                self.Rejoined.remove( nwkid )
+        self.Rejoined = [ nwkid for nwkid in self.Rejoined if nwkid in self.ListOfDevices ]
+        self.sent += len(result)
+        if result:
+            Domoticz.Debug("RouteWarmer - warming %s ( %s sent, %s answered )" %(result, self.sent, self.answered))
+        return result
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+"""
+Class SceneManagement
+
+Description: ZCL Scenes stored in the devices of a Zigate group, recalled with a single group-cast
+
+The scenes are defined in ZigateScenesConfig-XX.txt ( or ZigateScenesConfig.txt ), one per line:
+    <group id>,<scene id>,<scene name>[,<transition time in sec>]
+The group must be one of the GroupsManagement groups. Each scene gets a Domoticz Selector widget ( Off/Recall/Store )
+which can be used in the Domoticz scenes, groups and timers like any other switch:
+    - Store  : the current state of the group members is stored in them as the scene. Add Scene ( 0x00A1, name and
+               transition time ) then Store Scene ( 0x00A4 ), both group-cast: 2 frames whatever the number of members
+    - Recall : Recall Scene ( 0x00A5 ) group-cast, 1 frame instead of one command per member
+
+A device does not answer a group-cast, so the membership of each member is checked with a unicast Scene Membership
+request ( 0x00A6 ) after a Store, and at start-up for the members not known yet. It is tracked in
+    self.ListOfDevices[nwkid]['Scenes'][Ep][GroupID] = [ scene ids ]
+Members missing the scene are logged when it is recalled.
+
+The configuration file is reloaded when modified. A scene no more in the file, or whose group has been removed, is
+removed from the devices ( 0x00A2 group-cast ) and its widget deleted. When the widget is deleted by the user, the
+scene is removed from the devices and will be created again only when the file is modified.
+"""
+
+import Domoticz
+import os.path
+
+from time import time
+
+from Modules.consts import ADDRESS_MODE
+
+SCENES_CONFIG_FILENAME = "ZigateScenesConfig"
+SCENE_DEVICEID = "Scene-%s-%s"          # Group id, Scene id
+SCENE_LEVEL_RECALL = 10
+SCENE_LEVEL_STORE = 20
+SCENE_VERIFY_DELAY = 10                 # sec after a Store, before checking the membership of the members
+SCENE_MEMBERSHIP_TIMEOUT = 30           # sec to get the 0x80A6
+SCENE_MEMBERSHIP_RETRY = 3600           # sec before asking again a member which did not answer
+
+
+class SceneManagement:
+
+    def __init__( self, pluginconf, adminWidgets, ZigateComm, hardwareID, Devices, ListOfDevices, groupmgt ):
+
+        self.pluginconf = pluginconf
+        self.adminWidgets = adminWidgets
+        self.ZigateComm = ZigateComm
+        self.Devices = Devices
+        self.ListOfDevices = ListOfDevices
+        self.groupmgt = groupmgt
+
+        self.Scenes = {}        # DeviceID -> { 'Name', 'Group', 'Scene', 'Transition' }
+        self.Units = {}         # DeviceID -> Domoticz Unit
+        self.Checks = {}        # ( NwkId, Ep, Group ) -> time the Scene Membership request is due
+        self.InFlight = {}      # ( NwkId, Ep, Group ) -> deadline of the Scene Membership response
+        self.configMTime = None
+
+        self.scenesConfigFilename = self.pluginconf.pluginConfig + SCENES_CONFIG_FILENAME + "-%02d" %hardwareID + ".txt"
+        if not os.path.isfile( self.scenesConfigFilename ):
+            self.scenesConfigFilename = self.pluginconf.pluginConfig + SCENES_CONFIG_FILENAME + ".txt"
+
+    # Configuration
+    def _loadConfiguration( self ):
+        ' return the scenes defined in the configuration file '
+
+        scenes = {}
+        with open( self.scenesConfigFilename, 'r') as myfile:
+            for line in myfile:
+                line = line.strip()
+                if line == '' or line[0] == '#':
+                    continue
+                tokens = [ token.strip() for token in line.split(',') ]
+                if len(tokens) not in ( 3, 4 ):
+                    Domoticz.Error("SceneManagement - Error in %s: %s" %(self.scenesConfigFilename, line))
+                    continue
+                try:
+                    group = '%04x' %int( tokens[0], 16 )
+                    scene = '%02x' %int( tokens[1], 16 )
+                    transition = int( tokens[3] ) if len(tokens) == 4 else 0
+                except ValueError:
+                    Domoticz.Error("SceneManagement - Error in %s: %s" %(self.scenesConfigFilename, line))
+                    continue
+                scenes[ SCENE_DEVICEID %( group, scene ) ] = { 'Name': tokens[2], 'Group': group, 'Scene': scene,
+                        'Transition': transition }
+        return scenes
+
+    def _reloadConfiguration( self ):
+        ' reload the configuration file if modified. Return True if it has been reloaded '
+
+        mtime = None
+        if os.path.isfile( self.scenesConfigFilename ):
+            mtime = os.path.getmtime( self.scenesConfigFilename )
+        if mtime == self.configMTime:
+            return False
+        self.configMTime = mtime
+        scenes = {}
+        if mtime is not None:
+            scenes = self._loadConfiguration()
+
+        for deviceId in list( self.Scenes ):
+            if deviceId not in scenes:
+                Domoticz.Log("SceneManagement - Scene %s no more defined" %self.Scenes[deviceId]['Name'])
+                self._removeScene( deviceId )
+        for deviceId, scene in scenes.items():
+            if deviceId in self.Scenes:
+                self.Scenes[deviceId]['Name'] = scene['Name']
+                self.Scenes[deviceId]['Transition'] = scene['Transition']
+                continue
+            self.Scenes[deviceId] = scene
+            Domoticz.Status("SceneManagement - Scene %s ( %s ) in group %s" %(scene['Name'], scene['Scene'], scene['Group']))
+        return True
+
+    # Membership
+    def _members( self, group ):
+
+        if group not in self.groupmgt.ListOfGroups:
+            return []
+        return [ ( nwkid, ep ) for nwkid, ep in self.groupmgt.ListOfGroups[group]['Devices'] if nwkid in self.ListOfDevices ]
+
+    def _memberScenes( self, nwkid, ep, group ):
+        ' return the list of scenes of the group stored in the member, None if unknown '
+
+        return self.ListOfDevices[nwkid].get( 'Scenes', {} ).get( ep, {} ).get( group )
+
+    def _setMemberScenes( self, nwkid, ep, group, scenes ):
+
+        self.ListOfDevices[nwkid].setdefault( 'Scenes', {} ).setdefault( ep, {} )[ group ] = scenes
+
+    def _missing( self, deviceId ):
+        ' return the members which do not have the scene, or not known to have it '
+
+        scene = self.Scenes[deviceId]
+        return [ ( nwkid, ep ) for nwkid, ep in self._members( scene['Group'] )
+                if scene['Scene'] not in ( self._memberScenes( nwkid, ep, scene['Group'] ) or [] ) ]
+
+    def _scheduleChecks( self, group, delay=0, unknownOnly=False ):
+
+        due = time() + delay
+        for nwkid, ep in self._members( group ):
+            if unknownOnly and self._memberScenes( nwkid, ep, group ) is not None:
+                continue
+            key = ( nwkid, ep, group )
+            if key not in self.InFlight:
+                self.Checks[ key ] = min( due, self.Checks.get( key, due ))
+
+    def _processChecks( self ):
+        ' send the Scene Membership requests which are due, within the airtime admitted '
+
+        now = time()
+        for key in list( self.InFlight ):
+            if now > self.InFlight[key]:
+                Domoticz.Debug("SceneManagement - no Scene Membership from %s/%s for group %s" %key)
+                del self.InFlight[key]
+                self.Checks[key] = now + SCENE_MEMBERSHIP_RETRY
+
+        skip = self.ZigateComm.breaker.openCircuits()
+        for key in sorted( self.Checks, key=lambda key: self.Checks[key] ):
+            if now < self.Checks[key]:
+                break
+            nwkid, ep, group = key
+            if nwkid not in self.ListOfDevices:
+                del self.Checks[key]
+                continue
+            if nwkid in skip:
+                continue
+            if not self.ZigateComm.admission.admit( 'Scenes' ):
+                break
+            del self.Checks[key]
+            self.InFlight[key] = now + SCENE_MEMBERSHIP_TIMEOUT
+            datas = "%02d" %ADDRESS_MODE['short'] + nwkid + "01" + ep + group
+            self.ZigateComm.sendData( "00A6", datas )
+
+    # Zigate commands
+    def _groupCast( self, cmd, deviceId, param='' ):
+
+        scene = self.Scenes[deviceId]
+        datas = "%02d" %ADDRESS_MODE['group'] + scene['Group'] + "01" + "01" + scene['Group'] + param
+        Domoticz.Debug("SceneManagement - Command: %s - data: %s" %(cmd, datas))
+        self.ZigateComm.sendData( cmd, datas )
+
+    def recall( self, deviceId ):
+
+        scene = self.Scenes[deviceId]
+        self._groupCast( "00A5", deviceId, scene['Scene'] )
+        missing = self._missing( deviceId )
+        if missing:
+            Domoticz.Log("SceneManagement - Scene %s recalled, %s member(s) without the scene: %s" \
+                    %(scene['Name'], len(missing), missing))
+
+    def store( self, deviceId ):
+
+        scene = self.Scenes[deviceId]
+        name = scene['Name'].encode( 'utf-8' )[:16]
+        self._groupCast( "00A1", deviceId, scene['Scene'] + "%04x" %scene['Transition'] + "%02x" %len(name) + "%02x" %16 + name.hex() )
+        self._groupCast( "00A4", deviceId, scene['Scene'] )
+        self._scheduleChecks( scene['Group'], delay=SCENE_VERIFY_DELAY )
+        Domoticz.Log("SceneManagement - Scene %s stored in group %s ( %s members )" \
+                %(scene['Name'], scene['Group'], len(self._members( scene['Group'] ))))
+
+    def _removeScene( self, deviceId ):
+        ' remove the scene from the devices, and its widget '
+
+        scene = self.Scenes[deviceId]
+        if scene['Group'] in self.groupmgt.ListOfGroups:
+            self._groupCast( "00A2", deviceId, scene['Scene'] )
+        for nwkid, ep in self._members( scene['Group'] ):
+            scenes = self._memberScenes( nwkid, ep, scene['Group'] )
+            if scenes and scene['Scene'] in scenes:
+                scenes.remove( scene['Scene'] )
+        unit = self._unit( deviceId )
+        if unit is not None:
+            self.Devices[unit].Delete()
+        del self.Scenes[deviceId]
+
+    # Responses
+    def addSceneResponse( self, MsgData ):
+        ' 0x80A1, 0x80A4: SQN, Ep, Cluster, Status, Group, Scene [, Source Address ] '
+
+        self._sceneResponse( MsgData, True )
+
+    def removeSceneResponse( self, MsgData ):
+        ' 0x80A2 '
+
+        self._sceneResponse( MsgData, False )
+
+    def _sceneResponse( self, MsgData, added ):
+
+        if len(MsgData) < 20:
+            return
+        MsgEP = MsgData[2:4]
+        MsgStatus = MsgData[8:10]
+        MsgGroupID = MsgData[10:14]
+        MsgSceneID = MsgData[14:16]
+        MsgSrcAddr = MsgData[len(MsgData)-4:]
+        if MsgStatus != '00' or MsgSrcAddr not in self.ListOfDevices:
+            return
+        scenes = self._memberScenes( MsgSrcAddr, MsgEP, MsgGroupID ) or []
+        if added and MsgSceneID not in scenes:
+            scenes.append( MsgSceneID )
+        elif not added and MsgSceneID in scenes:
+            scenes.remove( MsgSceneID )
+        self._setMemberScenes( MsgSrcAddr, MsgEP, MsgGroupID, scenes )
+
+    def sceneMembershipResponse( self, MsgData ):
+        ' 0x80A6: SQN, Ep, Cluster, Status, Capacity, Group, Scene count, Scene list, Source Address '
+
+        if len(MsgData) < 22:
+            return
+        MsgEP = MsgData[2:4]
+        MsgStatus = MsgData[8:10]
+        MsgGroupID = MsgData[12:16]
+        MsgSrcAddr = MsgData[len(MsgData)-4:]
+        if MsgSrcAddr not in self.ListOfDevices:
+            return
+        self.InFlight.pop( ( MsgSrcAddr, MsgEP, MsgGroupID ), None )
+        if MsgStatus != '00':
+            # Not member of the group ( 0x85 Invalid Field ), so no scene for it
+            self._setMemberScenes( MsgSrcAddr, MsgEP, MsgGroupID, [] )
+            return
+        count = int( MsgData[16:18], 16 )
+        scenes = [ MsgData[18 + 2 * idx:20 + 2 * idx] for idx in range( count ) ]
+        self._setMemberScenes( MsgSrcAddr, MsgEP, MsgGroupID, scenes )
+        Domoticz.Debug("SceneManagement - %s/%s group %s scenes: %s" %(MsgSrcAddr, MsgEP, MsgGroupID, scenes))
+
+    # Domoticz
+    def isScene( self, deviceId ):
+        return deviceId in self.Scenes
+
+    def _unit( self, deviceId ):
+        ' Return the Domoticz Unit of the scene widget, or None '
+
+        unit = self.Units.get( deviceId )
+        if unit in self.Devices and self.Devices[unit].DeviceID == deviceId:
+            return unit
+        for unit in self.Devices:
+            if self.Devices[unit].DeviceID == deviceId:
+                self.Units[deviceId] = unit
+                return unit
+        return None
+
+    def _createWidget( self, deviceId ):
+
+        scene = self.Scenes[deviceId]
+        Options = {"LevelActions": "||", "LevelNames": "Off|Recall|Store", "LevelOffHidden": "true", "SelectorStyle": "0"}
+        unit = self.groupmgt.FreeUnit( self.Devices )
+        myDev = Domoticz.Device(DeviceID=deviceId, Name=scene['Name'], Unit=unit, Type=244, Subtype=62, Switchtype=18, Options=Options)
+        myDev.Create()
+        if myDev.ID == -1:
+            Domoticz.Error("SceneManagement - failed to create the widget of scene %s" %scene['Name'])
+        else:
+            self.adminWidgets.updateNotificationWidget( self.Devices, 'Scene %s created' %scene['Name'])
+
+    def processCommand( self, unit, deviceId, Command, Level ):
+
+        if deviceId not in self.Scenes:
+            return
+        if Command != 'Set Level' or Level not in ( SCENE_LEVEL_RECALL, SCENE_LEVEL_STORE ):
+            Domoticz.Debug("SceneManagement - nothing to do for %s/%s on %s" %(Command, Level, deviceId))
+            return
+        if Level == SCENE_LEVEL_RECALL:
+            self.recall( deviceId )
+        else:
+            self.store( deviceId )
+        self.Devices[unit].Update( nValue=1, sValue=str(Level) )
+
+    def widgetRemoved( self, deviceId ):
+        ' the user deleted the widget of the scene '
+
+        if deviceId not in self.Scenes:
+            return
+        Domoticz.Log("SceneManagement - Scene %s removed, it will be created again when %s is modified" \
+                %(self.Scenes[deviceId]['Name'], self.scenesConfigFilename))
+        if self.Scenes[deviceId]['Group'] in self.groupmgt.ListOfGroups:
+            self._groupCast( "00A2", deviceId, self.Scenes[deviceId]['Scene'] )
+        del self.Scenes[deviceId]
+
+    def heartbeat( self ):
+        ' called at each heartbeat, once the group management is ready '
+
+        if self.groupmgt.StartupPhase != 'ready':
+            return
+        if self._reloadConfiguration():
+            for deviceId in list( self.Scenes ):
+                self._scheduleChecks( self.Scenes[deviceId]['Group'], unknownOnly=True )
+
+        for deviceId in list( self.Scenes ):
+            if self.Scenes[deviceId]['Group'] not in self.groupmgt.ListOfGroups:
+                Domoticz.Log("SceneManagement - Group %s of scene %s removed" %(self.Scenes[deviceId]['Group'], self.Scenes[deviceId]['Name']))
+                self._removeScene( deviceId )
+                continue
+            if self._unit( deviceId ) is None:
+                self._createWidget( deviceId )
+
+        self._processChecks()
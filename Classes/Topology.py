@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+"""
+Class NetworkTopology
+
+Description: Analysis of an LQI scan ( see Modules/LQI.py )
+
+From the Neighbour tables collected during the LQI scan, build a link table and compute:
+    - the weakest links
+    - the load of each Router ( number of Child )
+    - for each node, the best path to the Coordinator ( path maximizing the weakest link quality ) and its hop count
+    - the changes since the previous scan ( new/lost nodes, new/lost links, link quality changes )
+
+The result is written as a compact summary ( LQI_summary-xx.json in the reports directory ) which can be loaded
+as is by the Web UI, instead of rebuilding everything in the browser from the full LQI report history.
+"""
+
+import Domoticz
+import json
+import os.path
+
+from time import time
+
+TOPOLOGY_SUMMARY_FILENAME = "LQI_summary-%02d.json"
+WEAKEST_LINKS = 10          # Number of weakest links reported
+LQI_DELTA_THRESHOLD = 30    # Link quality change to be reported between 2 scans
+WEAK_LINK = 50              # Below that, a link is considered weak
+
+
+class NetworkTopology:
+
+    def __init__( self, PluginConf, HardwareID ):
+
+        self.pluginconf = PluginConf
+        self.summaryFilename = self.pluginconf.pluginReports + TOPOLOGY_SUMMARY_FILENAME %HardwareID
+        self.Nodes = {}         # nwkid -> { 'IEEE', 'Type' }
+        self.Links = {}         # ( nwkid, nwkid ) sorted -> link quality ( best of both directions )
+        self.Children = {}      # Router -> set of Child
+        self.Summary = None
+
+    @staticmethod
+    def _linkKey( node1, node2 ):
+
+        if node1 < node2:
+            return ( node1, node2 )
+        return ( node2, node1 )
+
+    @staticmethod
+    def _lqi( value ):
+
+        try:
+            return int( value, 16 )
+        except (TypeError, ValueError):
+            return None
+
+    def _build( self, LQI ):
+
+        self.Nodes = { '0000': { 'IEEE': '', 'Type': 'Coordinator' } }
+        self.Links = {}
+        self.Children = {}
+
+        for src in LQI:
+            if src not in self.Nodes:
+                self.Nodes[src] = { 'IEEE': '', 'Type': 'Router' }
+            for child in LQI[src]:
+                entry = LQI[src][child]
+                if child not in self.Nodes or self.Nodes[child]['IEEE'] == '':
+                    self.Nodes[child] = { 'IEEE': entry.get('_ieee', ''), 'Type': entry.get('_devicetype', '??') }
+                if child == src:
+                    continue
+                if entry.get('_relationshp') == 'Child':
+                    self.Children.setdefault( src, set() ).add( child )
+                elif entry.get('_relationshp') == 'Parent':
+                    self.Children.setdefault( child, set() ).add( src )
+                lqi = self._lqi( entry.get('_lnkqty') )
+                if lqi is None:
+                    continue
+                key = self._linkKey( src, child )
+                if key not in self.Links or self.Links[ key ] < lqi:
+                    self.Links[ key ] = lqi
+
+    def _bestPaths( self ):
+        """
+        Widest path from the Coordinator: for each node, the path with the best weakest link.
+        End Devices do not route, so they are only leaves.
+        """
+
+        neighbours = {}
+        for ( node1, node2 ), lqi in self.Links.items():
+            neighbours.setdefault( node1, [] ).append( ( node2, lqi ))
+            neighbours.setdefault( node2, [] ).append( ( node1, lqi ))
+
+        best = { '0000': ( 255, 0, None ) }     # nwkid -> ( bottleneck, hops, via )
+        visited = set()
+        while True:
+            current = None
+            for node in best:
+                if node in visited:
+                    continue
+                if current is None or ( best[node][0], -best[node][1] ) > ( best[current][0], -best[current][1] ):
+                    current = node
+            if current is None:
+                break
+            visited.add( current )
+            if current != '0000' and self.Nodes.get( current, {} ).get('Type') == 'End Device':
+                continue
+            bottleneck, hops, via = best[ current ]
+            for neighbour, lqi in neighbours.get( current, [] ):
+                if neighbour in visited:
+                    continue
+                candidate = ( min( bottleneck, lqi ), hops + 1, current )
+                if neighbour not in best or ( candidate[0], -candidate[1] ) > ( best[neighbour][0], -best[neighbour][1] ):
+                    best[ neighbour ] = candidate
+        return best
+
+    def _delta( self, previous ):
+
+        delta = { 'NewNodes': [], 'LostNodes': [], 'NewLinks': [], 'LostLinks': [], 'Changed': [] }
+        if previous is None:
+            return delta
+
+        previousNodes = set( previous.get('Nodes', {}) )
+        delta['NewNodes'] = sorted( set(self.Nodes) - previousNodes )
+        delta['LostNodes'] = sorted( previousNodes - set(self.Nodes) )
+
+        previousLinks = {}
+        for node1, node2, lqi in previous.get('Links', []):
+            previousLinks[ ( node1, node2 ) ] = lqi
+        for key in sorted( self.Links ):
+            if key not in previousLinks:
+                delta['NewLinks'].append( [ key[0], key[1], self.Links[key] ] )
+            elif abs( self.Links[key] - previousLinks[key] ) >= LQI_DELTA_THRESHOLD:
+                delta['Changed'].append( [ key[0], key[1], previousLinks[key], self.Links[key] ] )
+        for key in sorted( previousLinks ):
+            if key not in self.Links:
+                delta['LostLinks'].append( [ key[0], key[1], previousLinks[key] ] )
+        return delta
+
+    def _loadPrevious( self ):
+
+        if not os.path.isfile( self.summaryFilename ):
+            return None
+        try:
+            with open( self.summaryFilename, 'rt') as handle:
+                return json.load( handle )
+        except (ValueError, OSError) as e:
+            Domoticz.Error("NetworkTopology - Unable to load %s: %s" %(self.summaryFilename, e))
+            return None
+
+    def analyze( self, LQI, timestamp=None ):
+        ' Analyze the LQI scan result and return the summary '
+
+        if timestamp is None:
+            timestamp = int(time())
+        self._build( LQI )
+        paths = self._bestPaths()
+
+        summary = {}
+        summary['TimeStamp'] = timestamp
+        summary['Nodes'] = {}
+        for nwkid in sorted( self.Nodes ):
+            node = {}
+            node['IEEE'] = self.Nodes[nwkid]['IEEE']
+            node['Type'] = self.Nodes[nwkid]['Type']
+            if nwkid in paths:
+                node['PathLQI'], node['Hops'], node['Via'] = paths[nwkid]
+            else:
+                node['PathLQI'] = node['Hops'] = node['Via'] = None
+            summary['Nodes'][nwkid] = node
+
+        summary['Links'] = [ [ key[0], key[1], self.Links[key] ] for key in sorted( self.Links ) ]
+        summary['WeakestLinks'] = sorted( summary['Links'], key=lambda link: link[2] )[:WEAKEST_LINKS]
+        summary['RouterLoad'] = { router: len(self.Children[router]) for router in sorted( self.Children ) }
+        summary['Unreachable'] = sorted( nwkid for nwkid in self.Nodes if nwkid not in paths )
+        summary['WeakPaths'] = sorted( nwkid for nwkid in paths if paths[nwkid][0] < WEAK_LINK )
+        summary['Delta'] = self._delta( self._loadPrevious() )
+
+        self.Summary = summary
+        Domoticz.Log("NetworkTopology - %s nodes, %s links, %s unreachable, %s with a weak path to the Coordinator"
+                %(len(self.Nodes), len(self.Links), len(summary['Unreachable']), len(summary['WeakPaths'])))
+        return summary
+
+    def writeSummary( self ):
+
+        if self.Summary is None:
+            return
+        if not os.path.isdir( self.pluginconf.pluginReports ):
+            Domoticz.Error("Unable to get access to directory %s, please check PluginConf.txt" %(self.pluginconf.pluginReports))
+            return
+        with open( self.summaryFilename, 'wt') as handle:
+            json.dump( self.Summary, handle, separators=(',', ':'))
@@ -9,6 +9,10 @@ import binascii
 import struct
 import time
 
+from Classes.Pacing import SendPacing, PACING_MAX_REQUEUE
+from Classes.CircuitBreaker import CircuitBreaker, commandTarget
+from Classes.Admission import AdmissionControl
+
 # Standalone message. They are receive and do not belongs to a command
 STANDALONE_MESSAGE = (0x8101, 0x8102, 0x8003, 0x804, 0x8005, 0x8006, 0x8701, 0x8702, 0x004D)
 
@@ -61,6 +65,27 @@ CMD_DATA = {0x0009: 0x8009, 0x0010: 0x8010, 0x0014: 0x8014, 0x0015: 0x8015,
             0x0110: 0x8110, 0x0120: 0x8120
             }
 
+# Groups and Scenes commands answered with Data when unicast only: a device does not answer a group-cast
+GROUPCAST_NO_DATA = (0x0060, 0x0061, 0x0062, 0x0063,
+                     0x00A0, 0x00A1, 0x00A2, 0x00A3, 0x00A4, 0x00A5, 0x00A6)
+
+# Outbound coalescing. Commands setting an absolute state, so only the last one queued for a target matters.
+# Command -> Cluster. A command still in _normalQueue is replaced in place by a newer command of the same Cluster
+# to the same address mode, address and destination endpoint ( payload: mode 2, addr 4, EPin 2, EPout 2, ... )
+# Commands not listed are never merged: relative moves and steps, Scenes, Groups membership, Attributes, ZDP.
+COALESCE_COMMANDS = {0x0081: '0008',                                    # Move to Level with On/Off
+                     0x0092: '0006',                                    # On/Off ( not Toggle, see below )
+                     0x00B6: '0300', 0x00B7: '0300', 0x00C0: '0300',    # Move to Hue/Saturation, Colour xy, Colour Temperature
+                     0x00FA: '0102'                                     # Window Covering Up/Down/Stop/Go to Lift
+                     }
+
+# Command -> sub-commands ( payload byte after EPout ) which must never be merged, as each one changes the state
+COALESCE_NEVER = {0x0092: ('02',)}                                      # Toggle
+
+# Clusters whose commands can be reordered. A queued command is not merged over any other command queued later for the
+# same target, except those of an independent Cluster ( Set Color sends a Level and a Colour command each time )
+COALESCE_INDEPENDENT = (('0008', '0300'), ('0300', '0008'))
+
 
 class ZigateTransport(object):
     """
@@ -83,6 +108,7 @@ class ZigateTransport(object):
         self._normalQueue = []  # list of normal priority commands
         self._waitForStatus = []  # list of command sent and waiting for status 0x8000
         self._waitForData = []  # list of command sent for which status received and waiting for data
+        self._requeues = {}  # (cmd, data) -> number of busy requeues, apart from the reTx retransmits
 
         self.statistics = statistics
 
@@ -90,6 +116,15 @@ class ZigateTransport(object):
         self.zmode = pluginconf.zmode
         self.sendDelay = pluginconf.sendDelay
         self.zTimeOut = pluginconf.zTimeOut
+        self.coalesceCommands = pluginconf.coalesceCommands
+        self.pacing = SendPacing(pluginconf, statistics)
+        self.breaker = CircuitBreaker(pluginconf)
+        self.admission = AdmissionControl(pluginconf)
+        self.mailbox = None  # SleepyMailbox, set by the plugin once the devices are loaded
+        self.routeWarmer = None  # RouteWarmer, set by the plugin once the devices are loaded
+        self.fanout = None  # FanOutOptimizer, set by the plugin once the groups are managed
+        self.optimistic = None  # OptimisticUpdates, set by the plugin
+        self.groupmgt = None  # GroupsManagement, set by the plugin once the groups are managed
 
         if str(transport) == "USB":
             self._transp = "USB"
@@ -111,6 +146,21 @@ class ZigateTransport(object):
             Domoticz.Status("Connection Name: Zigate, Transport: TCP/IP, Address: %s:%s" %( self._wifiAddress, self._wifiPort ))
 
 
+    def updateTunables(self, pluginconf):
+        ' Apply the Transport parameters after a PluginConf reload '
+
+        Domoticz.Status("Transport - zmode: %s -> %s, reTransmit: %s -> %s, sendDelay: %s -> %s, zTimeOut: %s -> %s, coalesceCommands: %s -> %s" \
+                %(self.zmode, pluginconf.zmode, self.reTransmit, pluginconf.reTransmit, \
+                self.sendDelay, pluginconf.sendDelay, self.zTimeOut, pluginconf.zTimeOut, \
+                self.coalesceCommands, pluginconf.coalesceCommands))
+        self.reTransmit = pluginconf.reTransmit
+        self.zmode = pluginconf.zmode
+        self.sendDelay = pluginconf.sendDelay
+        self.zTimeOut = pluginconf.zTimeOut
+        self.coalesceCommands = pluginconf.coalesceCommands
+        self.pacing.updateTunables(pluginconf)
+        self.breaker.updateTunables(pluginconf)
+
     # Transport / Opening / Closing Communication
     def openConn(self):
         self._connection.Connect()
@@ -252,23 +302,58 @@ class ZigateTransport(object):
                 cnt += 1
         Domoticz.Log("--")
 
+    def _coalesceKey(self, cmd, data):
+        ' return the target of an idempotent command ( Cluster, address mode, address, EPout ), None if it cannot be merged '
+
+        iCmd = int(cmd, 16)
+        if iCmd not in COALESCE_COMMANDS or len(data) < 10:
+            return None
+        if iCmd in COALESCE_NEVER and data[10:12] in COALESCE_NEVER[iCmd]:
+            return None
+        return (COALESCE_COMMANDS[iCmd], data[0:2], data[2:6], data[8:10])
+
+    def _coalesceCmd(self, cmd, data, reTransmit):
+        ' replace in place the last queued command with the same target. return True if done '
+
+        key = self._coalesceKey(cmd, data)
+        if key is None:
+            return False
+        for idx in range(len(self._normalQueue) - 1, -1, -1):
+            qCmd, qData, qTimestamp, qReTx = self._normalQueue[idx]
+            if (qData[0:2], qData[2:6], qData[8:10]) != key[1:]:
+                continue
+            qKey = self._coalesceKey(qCmd, qData)
+            if qKey == key:
+                # The queued command keeps its position in the FIFO
+                Domoticz.Debug("addCmdToSend - coalesce %s/%s into queued %s/%s" %(cmd, data, qCmd, qData))
+                self._normalQueue[idx] = (cmd, data, qTimestamp, reTransmit)
+                self.statistics._coalesced += 1
+                return True
+            if qKey is None or (qKey[0], key[0]) not in COALESCE_INDEPENDENT:
+                return False
+        return False
+
     def addCmdToSend(self, cmd, data, reTransmit=0):
         """add a command to the waiting list"""
-        timestamp = int(time.time())
+        timestamp = time.time()
         ##DEBUG Domoticz.Debug("addCmdToSend: cmd: %s data: %s reTransmit: %s" %(cmd, data, reTransmit))
+        if self.coalesceCommands and self._coalesceCmd(cmd, data, reTransmit):
+            return
         self._normalQueue.append((cmd, data, timestamp, reTransmit))
+        if self.fanout:
+            self.fanout.merge(self._normalQueue, cmd, data)
         if len(self._normalQueue) > self.statistics._MaxLoad:
             self.statistics._MaxLoad = len(self._normalQueue)
         #self._printSendQueue()
 
-    def addCmdToWait(self, cmd, data, reTransmit=0):
+    def addCmdToWait(self, cmd, data, reTransmit=0, delay=0):
         'add a command to the waiting list'
-        timestamp = int(time.time())
+        timestamp = time.time() + delay
         self._waitForStatus.append((cmd, data, timestamp, reTransmit))
 
-    def addDataToWait(self, expResponse, cmd, data, reTransmit=0):
+    def addDataToWait(self, expResponse, cmd, data, reTransmit=0, delay=0):
         'add a command to the waiting list'
-        timestamp = int(time.time())
+        timestamp = time.time() + delay
         self._waitForData.append((expResponse, cmd, data, timestamp, reTransmit))
 
     def loadTransmit(self):
@@ -311,22 +396,56 @@ class ZigateTransport(object):
         if len(self._waitForData) != 0:
             Domoticz.Debug("sendData - waitD: %04.X" % (int(self._waitForData[0][0])))
 
-        # We can enable an aggressive version , where we queue ONLY for Status, but we consider that the data will come and so we don't wait for data.
-        # If no wait on Status nor on Data, gooooooo
-        if self.zmode == 'Agressive':
-            waitIsRequired = len(self._waitForStatus) == 0
-        else:
-            waitIsRequired = len(self._waitForStatus) == 0 and len(self._waitForData) == 0
-
-        if waitIsRequired:
-            self.addCmdToWait(cmd, datas)
-            if self.zmode == 'ZigBee' and int(cmd,
-                                              16) in CMD_DATA:  # We do wait only if required and if not in AGGRESSIVE mode
-                self.addDataToWait(CMD_DATA[int(cmd, 16)], cmd, datas)
-            self._sendData(cmd, datas, self.sendDelay)
+        if self.mailbox and self.mailbox.hold(cmd, datas):
+            return  # The target is asleep, the command will be sent when it wakes up
+        self.admission.sent()
+        if self.fanout:
+            self.fanout.record(cmd, datas)
+
+        if len(self._normalQueue) == 0 and self._canSend():
+            self._transmit(cmd, datas)
         else:
             # Put in FIFO
             self.addCmdToSend(cmd, datas)
+            self._drainQueue()
+
+    def _canSend(self):
+        ' return True if a new command can be sent, according to the pacing window '
+
+        # We can enable an aggressive version , where we queue ONLY for Status, but we consider that the data will come and so we don't wait for data.
+        # If the pacing window is not full and there is no wait on Data, gooooooo
+        if self.zmode == 'Agressive':
+            return len(self._waitForStatus) < self.pacing.window()
+        return len(self._waitForStatus) < self.pacing.window() and len(self._waitForData) == 0
+
+    def _transmit(self, cmd, datas, reTx=0):
+        ' send the command and wait for its Status, and its Data if required '
+
+        delay = self.pacing.delay()
+        self.addCmdToWait(cmd, datas, reTransmit=reTx, delay=delay)
+        if self.zmode == 'ZigBee' and int(cmd, 16) in CMD_DATA:  # We do wait only if required and if not in AGGRESSIVE mode
+            if not ( int(cmd, 16) in GROUPCAST_NO_DATA and datas[0:2] == '01' ):
+                self.addDataToWait(CMD_DATA[int(cmd, 16)], cmd, datas, reTransmit=reTx, delay=delay)
+        self._sendData(cmd, datas, delay)
+        self.pacing.sent()
+        if self.groupmgt and int(cmd, 16) == 0x0062:
+            self.groupmgt.discoverySent(datas[2:6], datas[8:10])
+
+    def _drainQueue(self):
+        ' send the queued commands as long as the pacing window allows it '
+
+        while len(self._normalQueue) != 0 and self._canSend():
+            cmd, datas, timestamps, reTx = self.nextCmdtoSend()
+            self._transmit(cmd, datas, reTx)
+
+    def deviceHeard(self, nwkid):
+        ' a frame was received from the device: close its circuit, deliver its mailbox, its route is up '
+
+        self.breaker.heard(nwkid)
+        if self.mailbox:
+            self.mailbox.heard(nwkid)
+        if self.routeWarmer:
+            self.routeWarmer.heard(nwkid)
 
     def processFrame(self, frame):
         ''' 
@@ -364,6 +483,8 @@ class ZigateTransport(object):
             return
 
         elif int(MsgType, 16) in STANDALONE_MESSAGE:  # We receive an async message, just forward it to plugin
+            if MsgType == "8702":  # APS failure, feeds the congestion control
+                self.pacing.apsFailure()
             self.F_out(frame)  # for processing
         else:
             self.receiveDataCmd(MsgType)  #
@@ -382,11 +503,8 @@ class ZigateTransport(object):
 
         expResponse, cmd, datas, pTime, reTx = self.nextDataInWait()
 
-        # If we have Still commands in the queue and the WaitforStatus+Data are free
-        if len(self._normalQueue) != 0 \
-                and len(self._waitForStatus) == 0 and len(self._waitForData) == 0:
-            cmd, datas, timestamps, reTx = self.nextCmdtoSend()
-            self.sendData(cmd, datas)
+        # If we have Still commands in the queue and the pacing window allows it
+        self._drainQueue()
         return
 
     def receiveStatusCmd(self, Status, PacketType, frame):
@@ -394,9 +512,10 @@ class ZigateTransport(object):
         if Status != '00':
             self.statistics._ackKO += 1
             # In that case we need to unblock data, as we will never get it !
-            if len(self._waitForData) > 0:
+            if len(self._waitForData) > 0 and (PacketType == '' or int(self._waitForData[0][1], 16) == int(PacketType, 16)):
                 expResponse, pCmd, pData, pTime, reTx =  self.nextDataInWait()
                 Domoticz.Debug("waitForData - unlock waitForData due to command %s failed, remove %s/%s" %(PacketType, expResponse, pCmd))
+        requeue = self.pacing.status(Status)
 
         if PacketType == '':
             Domoticz.Debug("receiveStatusCmd - Empty PacketType: %s" % frame)
@@ -408,12 +527,27 @@ class ZigateTransport(object):
                 if int(expectedCommand[0], 16) != int(PacketType, 16):
                     Domoticz.Debug("receiveData - sync error : Expecting %s and Received: %s" \
                             % (expectedCommand[0], PacketType))
+                elif requeue:
+                    # The Zigate cannot take it now, send it again first when the pace allows it
+                    pCmd, pData, pTime, reTx = expectedCommand
+                    requeues = self._requeues.get((pCmd, pData), 0)
+                    if requeues < PACING_MAX_REQUEUE:
+                        self.statistics.countRequeued()
+                        self._requeues[(pCmd, pData)] = requeues + 1
+                        self._normalQueue.insert(0, (pCmd, pData, time.time(), reTx))
+                    else:
+                        del self._requeues[(pCmd, pData)]
+                        Domoticz.Log("receiveStatusCmd - Command %s/%s dropped, Zigate busy (%s)" %(pCmd, pData, Status))
+                        if self.optimistic:
+                            self.optimistic.status(pCmd, pData, Status)
+                else:
+                    self._requeues.pop((expectedCommand[0], expectedCommand[1]), None)
+                    if Status != '00':
+                        self.breaker.failure(commandTarget(expectedCommand[0], expectedCommand[1]), "Status %s on %s" %(Status, PacketType))
+                    if self.optimistic:
+                        self.optimistic.status(expectedCommand[0], expectedCommand[1], Status)
 
-        if len(self._normalQueue) != 0 \
-                and len(self._waitForStatus) == 0 and len(self._waitForData) == 0:
-            cmd, datas, timestamps, reTx = self.nextCmdtoSend()
-            self.sendData(cmd, datas)
-
+        self._drainQueue()
         return
 
     def checkTOwaitFor(self):
@@ -427,24 +561,27 @@ class ZigateTransport(object):
         ##DEBUG  Domoticz.Debug("checkTOwaitFor   - Cmd: %04.X waitQ: %s dataQ: %s normalQ: %s" \ % (0x0000, len(self._waitForStatus), len(self._waitForData), len(self._normalQueue)))
         # Check waitForStatus
         if len(self._waitForStatus) > 0:
-            now = int(time.time())
+            now = time.time()
             pCmd, pDatas, pTime, reTx = self._waitForStatus[0]
             ## DEBUG Domoticz.Debug("checkTOwaitForStatus - %04.x enter at: %s delta: %s" % (int(pCmd, 16), pTime, now - pTime))
             if (now - pTime) > self.zTimeOut:
                 self.statistics._TOstatus += 1
+                self.pacing.timeout()
                 entry = self.nextStatusInWait()
                 if entry:
-                    Domoticz.Debug("waitForStatus - Timeout %s on %04.x " % (now - pTime, int(entry[0], 16)))
+                    self._requeues.pop((entry[0], entry[1]), None)
+                    Domoticz.Debug("waitForStatus - Timeout %.3f on %04.x " % (now - pTime, int(entry[0], 16)))
 
         # Check waitForData
         if len(self._waitForData) > 0:
-            now = int(time.time())
+            now = time.time()
             expResponse, pCmd, pData, pTime, reTx = self._waitForData[0]
             ## DEBUG Domoticz.Debug("checkTOwaitForStatus - %04.xs enter at: %s delta: %s" % (expResponse, pTime, now - pTime))
             if (now - pTime) > self.zTimeOut:
                 self.statistics._TOdata += 1
                 expResponse, pCmd, pData, pTime, reTx =  self.nextDataInWait()
-                Domoticz.Debug("waitForData - Timeout %s on %04.x Command waiting for %04.x " % (now - pTime, expResponse, int(pCmd,16)))
+                Domoticz.Debug("waitForData - Timeout %.3f on %04.x Command waiting for %04.x " % (now - pTime, expResponse, int(pCmd,16)))
+                self.breaker.failure(commandTarget(pCmd, pData), "no %04.x" %expResponse)
                 # If we allow reTransmit, let's resend the command
                 if self.reTransmit:
                     if int(pCmd, 16) in RETRANSMIT_COMMAND and reTx <= self.reTransmit:
@@ -452,18 +589,13 @@ class ZigateTransport(object):
                         Domoticz.Log("checkTOwaitForStatus - Request a reTransmit of Command : %s/%s (%s) " % (
                             pCmd, pData, reTx))
                         # waitForData should be 0 as well as waitForCmd
-                        if  len(self._waitForData) == len(self._waitForStatus) == 0 :
+                        if self._canSend():
                             reTx += 1
-                            self.addCmdToWait(pCmd, pData, reTransmit=reTx)
-                            self.addDataToWait(CMD_DATA[int(pCmd, 16)],pCmd, pData, reTransmit=reTx)
-                            self._sendData( pCmd, pData , self.sendDelay)
+                            self._transmit(pCmd, pData, reTx)
                         else:
                             Domoticz.Log("Unable to retransmit message %s/%s Queue was not free anymore !" %(pCmd, pData))
 
-        if len(self._normalQueue) != 0 \
-                and len(self._waitForStatus) == 0 and len(self._waitForData) == 0:
-            cmd, datas, timestamps, reTx = self.nextCmdtoSend()
-            self.sendData(cmd, datas)
+        self._drainQueue()
 
         # self._printSendQueue()
         self._checkTO_flag = False
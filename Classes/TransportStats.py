@@ -5,7 +5,6 @@
 #
 
 import Domoticz
-import json
 from time import time
 
 
@@ -25,10 +24,22 @@ class TransportStatistics:
         self._clusterKO = 0
         self._reTx = 0
         self._MaxLoad = 0
+        self._coalesced = 0  # count of queued commands replaced by a newer one
+        self._busy = 0  # count of Status telling the Zigate cannot take the command now
+        self._requeued = 0  # count of commands sent again after a busy Status
+        self._held = 0  # count of commands held for a sleeping device
         self._start = int(time())
         self.pluginconf = pluginconf
 
     # Statistics methods 
+    def countBusy(self):
+        ' a Status told the Zigate cannot take the command now '
+        self._busy += 1
+
+    def countRequeued(self):
+        ' a command is sent again after a busy Status '
+        self._requeued += 1
+
     def starttime(self):
         return self._start
 
@@ -80,6 +91,9 @@ class TransportStatistics:
         Domoticz.Status("Sent:")
         Domoticz.Status("   TX commands      : %s" % (self.sent()))
         Domoticz.Status("   Max Load (Queue) : %s " % (self._MaxLoad))
+        Domoticz.Status("   TX coalesced     : %s" % (self._coalesced))
+        Domoticz.Status("   TX busy          : %s (requeued: %s)" % (self._busy, self._requeued))
+        Domoticz.Status("   TX held (sleepy) : %s" % (self._held))
         Domoticz.Status("   TX failed        : %s (%s" % (self.ackKOReceived(), round((self.ackKOReceived()/self.sent())*10,2)) + '%)')
         Domoticz.Status("   TX timeout       : %s (%s" % (self.TOstatus(), round((self.TOstatus()/self.sent())*100,2)) + '%)')
         Domoticz.Status("   TX data timeout  : %s (%s" % (self.TOdata(), round((self.TOdata()/self.sent())*100,2)) + '%)')
@@ -104,28 +118,26 @@ class TransportStatistics:
         _sec =  _duration % 60
         Domoticz.Status("Operating time      : %s Hours %s Mins %s Secs" % (_hours, _min, _sec))
 
-    def writeReport(self):
+    def snapshot(self):
+        ' return the counters as a dict '
 
-        timing = int(time())
         stats = {}
-        stats[timing] = {}
-        stats[timing]['crcErrors'] = self._crcErrors
-        stats[timing]['frameErrors'] = self._frameErrors
-        stats[timing]['sent'] = self._sent
-        stats[timing]['received'] = self._received
-        stats[timing]['ack'] = self._ack
-        stats[timing]['ackKO'] = self._ackKO
-        stats[timing]['data'] = self._data
-        stats[timing]['TOstatus'] = self._TOstatus
-        stats[timing]['TOdata'] = self._TOdata
-        stats[timing]['clusterOK'] = self._clusterOK
-        stats[timing]['clusterKO'] = self._clusterKO
-        stats[timing]['reTx'] = self._reTx
-        stats[timing]['MaxLoad'] = self._MaxLoad
-        stats[timing]['start'] = self._start
-        stats[timing]['stop'] = timing
-
-        json_filename = self.pluginconf.pluginReports + 'Transport-stats.json'
-        with open( json_filename, 'at') as json_file:
-            json_file.write('\n')
-            json.dump( stats, json_file)
+        stats['crcErrors'] = self._crcErrors
+        stats['frameErrors'] = self._frameErrors
+        stats['sent'] = self._sent
+        stats['received'] = self._received
+        stats['ack'] = self._ack
+        stats['ackKO'] = self._ackKO
+        stats['data'] = self._data
+        stats['TOstatus'] = self._TOstatus
+        stats['TOdata'] = self._TOdata
+        stats['clusterOK'] = self._clusterOK
+        stats['clusterKO'] = self._clusterKO
+        stats['reTx'] = self._reTx
+        stats['MaxLoad'] = self._MaxLoad
+        stats['start'] = self._start
+        return stats
+
+    def writeReport(self, reportStore):
+
+        reportStore.addTransportStats( self.snapshot() )
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+"""
+Class WarmUpPlanner
+
+Description: Spread over time the requests sent to the known devices after a plugin restart
+
+Each known device gets a start slot within the first warmupWindow sec after the start. The routers ( mains
+powered devices ) come first, as they carry the traffic of the others, then the End Devices. Each slot gets a
+random jitter, so two restarts do not hit the devices in the same pattern.
+
+Until its slot, a device gets no background request ( ReadAttribute polls, Configure Reporting ). At its slot, the
+start-up requests which are not fresh anymore in ListOfDevices ( saved by the previous run ) are sent:
+    - Node Descriptor, if the PowerSource is unknown
+    - Attribute Discovery, for a mains device without 'Attributes List'
+    - Basic cluster Read Attribute, if not read since WARMUP_BASIC_FRESH sec
+Each frame is admitted by the AdmissionControl, the frames not admitted are sent at the next heartbeats.
+"""
+
+import Domoticz
+
+import random
+from time import time
+
+WARMUP_START_DELAY = 30         # sec, let the Zigate complete its start-up before the first slot
+WARMUP_BASIC_FRESH = 86400      # sec, the Basic cluster read at start-up is skipped when more recent
+
+
+class WarmUpPlanner:
+
+    def __init__( self, pluginconf, ListOfDevices ):
+
+        self.pluginconf = pluginconf
+        self.ListOfDevices = ListOfDevices
+        self.Slots = {}         # NwkId -> time of the device slot
+        self.Pending = set()    # NwkId whose start-up requests are still to be sent
+        self.Requests = {}      # NwkId -> start-up requests not sent yet ( function, args, frames ), filled at the device slot
+        self.end = 0
+
+    def _isRouter( self, nwkid ):
+
+        device = self.ListOfDevices[nwkid]
+        if 'PowerSource' in device:
+            return device['PowerSource'] == 'Main'
+        return device.get('MacCapa') == '8e'
+
+    def plan( self ):
+        ' compute the slot of each known device. Called once the ListOfDevices is loaded '
+
+        start = time() + WARMUP_START_DELAY
+        window = self.pluginconf.warmupWindow
+        devices = [ nwkid for nwkid in self.ListOfDevices
+                if nwkid not in ( '0000', 'ffff' ) and self.ListOfDevices[nwkid].get('Status') == 'inDB' ]
+        devices.sort( key=lambda nwkid: not self._isRouter( nwkid ) )
+        if not devices:
+            return
+        step = window / len(devices)
+        for rank, nwkid in enumerate( devices ):
+            self.Slots[ nwkid ] = start + rank * step + random.uniform( 0, step )
+        self.Pending = set( devices )
+        self.end = start + window
+        Domoticz.Status("WarmUpPlanner - %s devices ( %s routers ) warmed up within %s sec" \
+                %(len(devices), len([ nwkid for nwkid in devices if self._isRouter( nwkid ) ]), window))
+
+    def ready( self, nwkid ):
+        ' return True if background requests can be sent to the device. Devices joining after the start are ready '
+
+        return time() >= self.Slots.get( nwkid, 0 )
+
+    def over( self ):
+        return time() >= self.end
+
+    def due( self, nwkid ):
+        ' return True when the start-up requests of the device are to be sent '
+
+        return nwkid in self.Pending and self.ready( nwkid )
+
+    def done( self, nwkid ):
+        self.Pending.discard( nwkid )
+        self.Requests.pop( nwkid, None )
+
+    def basicIsFresh( self, nwkid ):
+        ' return True if the Basic cluster was read recently, by this run or the previous one '
+
+        timeStamps = self.ListOfDevices[nwkid].get( 'ReadAttributes', {} ).get( 'TimeStamps', {} )
+        for idx, timeStamp in timeStamps.items():
+            if idx.endswith( '-0000' ) and isinstance( timeStamp, int ) and time() < timeStamp + WARMUP_BASIC_FRESH:
+                return True
+        return False
@@ -8,139 +8,193 @@
 
     Description: Manage LQI
 
+    The scan starts on the Coordinator ( 0x0000 ) and the Main powered devices. Each Router or Coordinator found in a
+    Neighbour table is added to the scan. A node is scanned page by page ( Start Index ) until all its
+    Neighbour Table Entries have been received.
+
+    self.LQIScan['Queue']      - list of ( nwkid, start index, retry ) to be requested
+    self.LQIScan['InFlight']   - nwkid -> { 'Index', 'Sent', 'SQN', 'Retry' } requested and waiting for a 0x804E
+    self.LQIScan['WaitStatus'] - nwkids waiting for the 0x8000, in sent order, to learn the SQN of the request
+    self.LQIScan['Known']      - nwkids already queued ( never scanned twice )
+    self.LQIScan['Done']       - nwkids for which the scan is completed ( or failed )
+
+    0x804E are matched to the request by the source address when provided by the firmware, otherwise by SQN.
 """
 
 
-import queue
-import datetime
 import time
-import os.path
-import json
 
 import Domoticz
 from Modules.output import sendZigateCmd
 
 from Classes.AdminWidgets import AdminWidgets
+from Classes.Topology import NetworkTopology
+from Classes.Pacing import BUSY_STATUS
+
+LQI_MAX_INFLIGHT = 3        # Number of nodes scanned in parallel
+LQI_TIMEOUT = 15            # Max time to get a 0x804E
+LQI_MAX_RETRY = 2
+LQI_ENTRY_SIZE = 42         # Size of a Neighbour Table entry in the 0x804E
 
 def LQIdiscovery(self):
     """
     This is call at Startupup for now ... But final version would be based on a PluginConf parameter which will tell when it should start.
     At start , we will initiate the first LQIRequest on the 0x0000 network address. Then when receiving/decoding an 0x804E message, after populating
-    the information in the LQI dictionary, will will trigger one new request on an non-scanned Network address
+    the information in the LQI dictionary, will will trigger new requests on non-scanned Routers
     """
 
-    self.LQISource = queue.Queue()
     self.LQI = {}
-    mgtLQIreq(self)    # We start and by default, it will be on 0x0000 , Index 0
+    self.LQIScan = { 'Queue': [], 'InFlight': {}, 'WaitStatus': [], 'Known': set(), 'Done': set(), 'Start': int(time.time()) }
 
-def LQIcontinueScan(self, Devices):
+    _LQIenqueue( self, '0000' )
+    for key in self.ListOfDevices:
+        if key == '0000' or 'Status' not in self.ListOfDevices[key] or self.ListOfDevices[key]['Status'] != 'inDB':
+            continue
+        if self.ListOfDevices[key].get('PowerSource') == 'Main' or self.ListOfDevices[key].get('MacCapa') == '8e':
+            _LQIenqueue( self, key )
 
-    LQIfound = False
-    LODfound = False
+def _LQIenqueue( self, nwkid ):
 
-    scn = 0
-    trt = 0
-    for src in self.LQI:
-        for child in self.LQI[src]:
-            trt += 1
-            if self.LQI[src][child]['Scanned']: scn += 1
-            Domoticz.Debug(" Source: %4s Child: %4s Relation: %7s Type: %11s Deepth: %2s Scanner: %s" \
-                    %(src, child, self.LQI[src][child]['_relationshp'], self.LQI[src][child]['_devicetype'], self.LQI[src][child]['_depth'], self.LQI[src][child]['Scanned']))
-    if scn > 0:
-        Domoticz.Log("LQIcontinueScan - Nodes = {:2n}".format(trt) + " True " +str(scn) + " {:2n}% completed ".format(round((scn/trt)*100)))
-    else:
-        Domoticz.Log("LQIcontinueScan - Nodes = {:2n}".format(trt) + " True " +str(scn) + " {:2n}% completed ".format(0))
-        
-    Domoticz.Debug("LQIcontinueScan - Scanning LOD ")
-    for key in self.ListOfDevices:
-        Domoticz.Debug("LQIcontinueScan - checking eligibility of " +str(key))
-        if str(key) not in self.LQI:
-            Domoticz.Debug("LQIcontinueScan - eligeable " +str(key))
-            LODfound = True
-            if not self.LQI.get(str(key)):
-                Domoticz.Debug("LQIcontinueScan - LOD set self.LQI["+str(key)+"] to {}")
-                self.LQI[str(key)] = {}
-            mgtLQIreq(self, key)
-            break                                        # We do only one !
-        else:
-            Domoticz.Debug("LQIcontinueScan - not eligeable already in LQI " +str(self.LQI[key]))
-        if LODfound:
-            break                                        # We do only one !
-
-    if not LODfound:
-        for src in self.LQI:
-            for key in self.LQI[src]:
-                if str(src) == str(key):
-                    self.LQI[src][key]['Scanned'] = True
-                    continue                # This doesn't make sense to scan itself
-                # The destination node of this request must be a Router or the Co- ordinator.
-                Domoticz.Debug("LQIcontinueScan - Eligible ? " +str(src) + " / " +str(key) + " Scanned ? " +str(self.LQI[src][key]['Scanned']))
-                if (not self.LQI[src][key]['Scanned']) and \
-                    (self.LQI[src][key]['_devicetype'] == 'Router' or self.LQI[src][key]['_devicetype'] == 'Coordinator'):
-                    LQIfound = True
-                    self.LQI[src][key]['Scanned'] = True
-                    if not self.LQI.get(str(key)):
-                        Domoticz.Debug("LQIcontinueScan - set self.LQI["+str(key)+"] to {}")
-                        self.LQI[str(key)] = {}
-                    mgtLQIreq(self, key)
-                    break                                    # We do only one !
-                else:
-                    self.LQI[src][key]['Scanned'] = True                    # Most likely we will set to True End Node 
-            if LQIfound:
-                break                                    # We do only one !
-
-    if not LQIfound and not LODfound:                    # We didn't find any more Network address. Game is over
-        Domoticz.Log("LQI Scan is over ....")
-        Domoticz.Log("LQI Results:")
-        for src in self.LQI:
-            for child in self.LQI[src]:
-                try:
-                    Domoticz.Log(" Node %4s child %4s relation %7s type %11s deepth %2d linkQty %3d Rx-Idl %6s" \
-                        %(src, child, self.LQI[src][child]['_relationshp'], self.LQI[src][child]['_devicetype'], int(self.LQI[src][child]['_depth'], 16), int(self.LQI[src][child]['_lnkqty'], 16), self.LQI[src][child]['_rxonwhenidl']))
-                except:
-                    Domoticz.Log(" linkQty: " +str(self.LQI[src][child]['_lnkqty']))
-                    Domoticz.Log(" Node %4s child %4s relation %7s type %11s deepth %2s linkQty     Rx-Idl %6s" \
-                            %(src, child, self.LQI[src][child]['_relationshp'], self.LQI[src][child]['_devicetype'], self.LQI[src][child]['_depth'], self.LQI[src][child]['_rxonwhenidl']))
-
-        # Write the report onto file
-        _filename = self.pluginconf.pluginReports + 'LQI_reports-' + '%02d' %self.HardwareID + '.txt'
-        storeLQI = {}
-        storeLQI[int(time.time())] = self.LQI
-
-        self.pluginconf.logLQI = 0
-        if os.path.isdir( self.pluginconf.pluginReports ):
-            #Domoticz.Status("LQI report save on " +str(_filename))
-            #with open(_filename , 'at') as file:
-            #    for key in storeLQI:
-            #        file.write(str(key) + ": " + str(storeLQI[key]) + "\n")
-            #self.pluginconf.logLQI = 0
-
-            json_filename = _filename + ".json"
-            with open( json_filename, 'at') as json_file:
-                json_file.write('\n')
-                json.dump( storeLQI, json_file)
-            self.adminWidgets.updateNotificationWidget( Devices, 'A new LQI report is available')
+    if nwkid in self.LQIScan['Known']:
+        return
+    self.LQIScan['Known'].add( nwkid )
+    self.LQIScan['Queue'].append( ( nwkid, 0, 0 ) )
+
+def _LQIscanDone( self, nwkid ):
+
+    if nwkid in self.LQIScan['InFlight']:
+        del self.LQIScan['InFlight'][nwkid]
+    if nwkid in self.LQIScan['WaitStatus']:
+        self.LQIScan['WaitStatus'].remove( nwkid )
+    self.LQIScan['Done'].add( nwkid )
+
+def _LQIpump( self ):
+    ' Send requests as long as the window is not full '
+
+    while self.LQIScan['Queue'] and len(self.LQIScan['InFlight']) < LQI_MAX_INFLIGHT and \
+            self.ZigateComm.admission.admit( 'LQI' ):
+        nwkid, index, retry = self.LQIScan['Queue'].pop(0)
+        mgtLQIreq( self, nwkid, index, retry )
+
+def LQIcontinueScan(self, Devices):
+    """
+    Call at each Heartbeat. Expire the requests without answer, fill the window, and produce the report
+    when all Routers have been scanned.
+    """
+
+    if self.LQIScan is None:
+        LQIdiscovery( self )
+
+    now = int(time.time())
+    for nwkid in list(self.LQIScan['InFlight']):
+        request = self.LQIScan['InFlight'][nwkid]
+        if request['Sent'] + LQI_TIMEOUT > now:
+            continue
+        if request['Retry'] < LQI_MAX_RETRY:
+            Domoticz.Debug("LQIcontinueScan - no response from %s index %s, retry" %(nwkid, request['Index']))
+            mgtLQIreq( self, nwkid, request['Index'], request['Retry'] + 1 )
         else:
-            Domoticz.Error("Unable to get access to directory %s, please check PluginConf.txt" %(self.pluginconf.pluginReports))
+            Domoticz.Log("LQIcontinueScan - no response from %s index %s, giving up" %(nwkid, request['Index']))
+            _LQIscanDone( self, nwkid )
+
+    _LQIpump( self )
 
+    if self.LQIScan['Queue'] or self.LQIScan['InFlight']:
+        Domoticz.Log("LQIcontinueScan - Routers = %2s Scanned %2s In progress %s - %2s%% completed" \
+                %(len(self.LQIScan['Known']), len(self.LQIScan['Done']), len(self.LQIScan['InFlight']),
+                round(( len(self.LQIScan['Done']) * 100 ) / len(self.LQIScan['Known']))))
+        return
 
-def mgtLQIreq(self, nwkid='0000', index=0):
+    # We didn't find any more Network address. Game is over
+    Domoticz.Log("LQI Scan is over .... %s Routers scanned in %s sec" %(len(self.LQIScan['Done']), now - self.LQIScan['Start']))
+    Domoticz.Log("LQI Results:")
+    for src in self.LQI:
+        for child in self.LQI[src]:
+            self.LQI[src][child]['Scanned'] = child in self.LQIScan['Done'] or self.LQI[src][child]['_devicetype'] == 'End Device'
+            try:
+                Domoticz.Log(" Node %4s child %4s relation %7s type %11s deepth %2d linkQty %3d Rx-Idl %6s" \
+                    %(src, child, self.LQI[src][child]['_relationshp'], self.LQI[src][child]['_devicetype'], int(self.LQI[src][child]['_depth'], 16), int(self.LQI[src][child]['_lnkqty'], 16), self.LQI[src][child]['_rxonwhenidl']))
+            except:
+                Domoticz.Log(" linkQty: " +str(self.LQI[src][child]['_lnkqty']))
+                Domoticz.Log(" Node %4s child %4s relation %7s type %11s deepth %2s linkQty     Rx-Idl %6s" \
+                        %(src, child, self.LQI[src][child]['_relationshp'], self.LQI[src][child]['_devicetype'], self.LQI[src][child]['_depth'], self.LQI[src][child]['_rxonwhenidl']))
+
+    # Write the report onto file
+    timestamp = int(time.time())
+
+    self.pluginconf.logLQI = 0
+    self.LQIScan = None
+    self.reportStore.addLQISnapshot( self.LQI, timestamp )
+    if self.reportManifest.addSnapshot( 'LQI', timestamp, self.LQI ):
+        topology = NetworkTopology( self.pluginconf, self.HardwareID )
+        topology.analyze( self.LQI, timestamp )
+        topology.writeSummary()
+        self.adminWidgets.updateNotificationWidget( Devices, 'A new LQI report is available')
+
+
+def mgtLQIreq(self, nwkid='0000', index=0, retry=0):
     """
-    Send a Management LQI request 
-    This function requests a remote node to provide a list of neighbouring nodes, from its Neighbour table, 
-    including LQI (link quality) values for radio transmissions from each of these nodes. 
+    Send a Management LQI request
+    This function requests a remote node to provide a list of neighbouring nodes, from its Neighbour table,
+    including LQI (link quality) values for radio transmissions from each of these nodes.
     The destination node of this request must be a Router or the Co- ordinator.
      <Target Address: uint16_t>
      <Start Index: uint8_t>
     """
 
-    self.LQISource.put(str(nwkid))
-    datas = str(nwkid) + "{:02n}".format(index)
+    nwkid = str(nwkid)
+    if nwkid in self.LQIScan['WaitStatus']:
+        self.LQIScan['WaitStatus'].remove( nwkid )
+    self.LQIScan['InFlight'][nwkid] = { 'Index': index, 'Sent': int(time.time()), 'SQN': None, 'Retry': retry }
+    self.LQIScan['WaitStatus'].append( nwkid )
+
+    datas = nwkid + "%02x" %index
     Domoticz.Debug("mgtLQIreq: from Nwkid: " +str(nwkid) + " index: "+str(index))
-    sendZigateCmd(self, "004E",datas)    
+    sendZigateCmd(self, "004E",datas)
 
     return
 
+def mgtLQIstatus( self, SQN, Status ):
+    ' 0x8000 for a 0x004E: learn the SQN of the oldest request waiting for its status '
+
+    if self.LQIScan is None or len(self.LQIScan['WaitStatus']) == 0:
+        return
+    nwkid = self.LQIScan['WaitStatus'].pop(0)
+    if nwkid not in self.LQIScan['InFlight']:
+        return
+    request = self.LQIScan['InFlight'][nwkid]
+    if Status in BUSY_STATUS:
+        # The Transport sends the same frame again, wait for its Status
+        self.LQIScan['WaitStatus'].append( nwkid )
+        request['Sent'] = int(time.time())
+        return
+    if Status != '00':
+        Domoticz.Debug("mgtLQIstatus - request to %s index %s rejected with status %s" %(nwkid, request['Index'], Status))
+        if request['Retry'] < LQI_MAX_RETRY:
+            # Release the slot and request it again later
+            del self.LQIScan['InFlight'][nwkid]
+            self.LQIScan['Queue'].append( ( nwkid, request['Index'], request['Retry'] + 1 ) )
+        else:
+            _LQIscanDone( self, nwkid )
+        return
+    request['SQN'] = SQN
+    request['Sent'] = int(time.time())      # Deadline starts when Zigate has really sent it
+
+def _LQIsource( self, SQN, MsgData, NeighbourTableListCount ):
+    ' Find which node this 0x804E is coming from '
+
+    if len(MsgData) == 10 + NeighbourTableListCount * LQI_ENTRY_SIZE + 4:
+        # Firmware providing the Source Address at the end of the message
+        return MsgData[len(MsgData)-4:len(MsgData)]
+
+    for nwkid in self.LQIScan['InFlight']:
+        if self.LQIScan['InFlight'][nwkid]['SQN'] == SQN:
+            return nwkid
+
+    if len(self.LQIScan['InFlight']) == 1:
+        return list(self.LQIScan['InFlight'])[0]
+    return None
+
 
 def mgtLQIresp(self, MsgData):
     """
@@ -150,18 +204,19 @@ def mgtLQIresp(self, MsgData):
     <Neighbour Table Entries: uint8_t>         4:6
     <Neighbour Table List Count: uint8_t>         6:8
     <Start Index: uint8_t>                     8:10
-    <List of Entries elements described below:>    
-        Note: If Neighbour Table list count is 0, there are no elements in the list.     
+    <List of Entries elements described below:>
+        Note: If Neighbour Table list count is 0, there are no elements in the list.
         NWK Address: uint16_t                             n:n+4
         Extended PAN ID: uint64_t                         n+4:n+20
         IEEE Address: uint64_t                         n+20:n+36
         Depth: uint_t                                     n+36:n+38
         Link Quality: uint8_t                             n+38:n+40
         Bit map of attributes Described below: uint8_t     n+40:n+42
-                bit 0-1 Device Type         (0-Coordinator 1-Router 2-End Device)     
-                bit 2-3 Permit Join status     (1- On 0-Off)     
-                bit 4-5 Relationship         (0-Parent 1-Child 2-Sibling)     
+                bit 0-1 Device Type         (0-Coordinator 1-Router 2-End Device)
+                bit 2-3 Permit Join status     (1- On 0-Off)
+                bit 4-5 Relationship         (0-Parent 1-Child 2-Sibling)
                 bit 6-7 Rx On When Idle status             (1-On 0-Off)
+    <Source Address: uint16_t> ( depending on firmware )
     """
 
     Domoticz.Debug("mgtLQIresp - MsgData = " +str(MsgData))
@@ -171,8 +226,7 @@ def mgtLQIresp(self, MsgData):
     NeighbourTableEntries = int(MsgData[4:6], 16)
     NeighbourTableListCount = int(MsgData[6:8], 16)
     StartIndex = int(MsgData[8:10], 16)
-    ListOfEntries = MsgData[10:len(MsgData)]
-
+    ListOfEntries = MsgData[10:10 + NeighbourTableListCount * LQI_ENTRY_SIZE]
 
     Domoticz.Debug("mgtLQIresp - SQN = " +str(SQN))
     Domoticz.Debug("mgtLQIresp - status = " +str(Status))
@@ -180,20 +234,26 @@ def mgtLQIresp(self, MsgData):
     Domoticz.Debug("mgtLQIresp - NeighbourTableListCount = " +str(NeighbourTableListCount))
     Domoticz.Debug("mgtLQIresp - StartIndex = " +str(StartIndex))
 
-    if NeighbourTableListCount == 0:
-        # No element in that list
-        Domoticz.Debug("mgtLQIresp -  No element in that list ")
+    if self.LQIScan is None:
+        Domoticz.Debug("mgtLQIresp - no LQI scan in progress")
         return
 
-    NwkIdSource = self.LQISource.get()
-    # Let's not overwrite
-    if NwkIdSource in self.LQI:                 # Source record exists
-        Domoticz.Debug("mgtLQIresp - " +str(NwkIdSource) + " found LQI["+str(NwkIdSource)+"] " + str(self.LQI[NwkIdSource]))
-    else:
+    NwkIdSource = _LQIsource( self, SQN, MsgData, NeighbourTableListCount )
+    if NwkIdSource is None or NwkIdSource not in self.LQIScan['InFlight']:
+        Domoticz.Log("mgtLQIresp - unexpected response SQN: %s from %s" %(SQN, NwkIdSource))
+        return
+
+    if Status != '00':
+        Domoticz.Log("mgtLQIresp - %s responded with status %s" %(NwkIdSource, Status))
+        _LQIscanDone( self, NwkIdSource )
+        _LQIpump( self )
+        return
+
+    if NwkIdSource not in self.LQI:
         self.LQI[NwkIdSource] = {}
 
     n = 0
-    while n < ((NeighbourTableListCount * 42)):
+    while n < ((NeighbourTableListCount * LQI_ENTRY_SIZE)):
         _nwkid    = ListOfEntries[n:n+4]
         _extPANID = ListOfEntries[n+4:n+20]
         _ieee     = ListOfEntries[n+20:n+36]
@@ -228,18 +288,10 @@ def mgtLQIresp(self, MsgData):
         if _rxonwhenidl   == 0x00: _rxonwhenidl = 'Rx-Off'
         elif _rxonwhenidl == 0x01: _rxonwhenidl = 'Rx-On'
         elif _rxonwhenidl == 0x02: _rxonwhenidl = '??'
-        n = n + 42
+        n = n + LQI_ENTRY_SIZE
         Domoticz.Debug("mgtLQIresp - Table["+str(NeighbourTableEntries) + "] - " + " _nwkid = " +str(_nwkid) + " _extPANID = " +str(_extPANID) + \
                     " _ieee = " +str(_ieee) + " _depth = " +str(_depth) + " _lnkqty = " +str(_lnkqty) + " _devicetype = " +str(_devicetype) + \
                     " _permitjnt = " +str(_permitjnt) + " _relationshp = " +str(_relationshp) + " _rxonwhenidl = " +str(_rxonwhenidl))
-    
-
-        if str(_nwkid) in self.LQI[NwkIdSource]:    # Is the node also existing
-            Domoticz.Debug("mgtLQIresp - " +str(NwkIdSource) + "/" +str(_nwkid) + " found in LQI ")
-            if self.LQI[NwkIdSource][str(_nwkid)]['Scanned']:
-                Domoticz.Debug("mgtLQIresp - already processed")
-                return
-
 
         self.LQI[NwkIdSource][str(_nwkid)] = {}
         self.LQI[NwkIdSource][str(_nwkid)]['_extPANID'] = _extPANID
@@ -252,6 +304,18 @@ def mgtLQIresp(self, MsgData):
         self.LQI[NwkIdSource][str(_nwkid)]['_rxonwhenidl'] = _rxonwhenidl
         self.LQI[NwkIdSource][str(_nwkid)]['Scanned'] = False
 
+        # The destination node of a request must be a Router or the Co- ordinator.
+        if _devicetype in ( 'Router', 'Coordinator' ):
+            _LQIenqueue( self, str(_nwkid) )
+
         Domoticz.Debug("mgtLQIresp - from " +str(NwkIdSource) + " a new node captured: " +str(_nwkid))
 
+    nextIndex = StartIndex + NeighbourTableListCount
+    if NeighbourTableListCount > 0 and nextIndex < NeighbourTableEntries:
+        # Next page of the Neighbour table, keep the slot
+        mgtLQIreq( self, NwkIdSource, nextIndex )
+    else:
+        _LQIscanDone( self, NwkIdSource )
+        _LQIpump( self )
+
     return
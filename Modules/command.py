@@ -17,9 +17,46 @@ import struct
 import json
 
 from Modules.tools import Hex_Format, rgb_to_xy, rgb_to_hsl
-from Modules.output import sendZigateCmd, thermostat_Setpoint
+from Modules.output import sendZigateCmd, thermostat_Setpoint, \
+        ReadAttributeRequest_0006, ReadAttributeRequest_0008, ReadAttributeRequest_0102, ReadAttributeRequest_0300
 from Modules.domoticz import UpdateDevice_v2
 
+# Cluster -> Read Attribute, to verify the state of a widget updated optimistically
+OPTIMISTIC_READ = {
+    '0006': ReadAttributeRequest_0006,
+    '0008': ReadAttributeRequest_0008,
+    '0102': ReadAttributeRequest_0102,
+    '0300': ReadAttributeRequest_0300,
+    }
+
+
+def updateWidget( self, Devices, Unit, NWKID, EPout, cmd, nValue, sValue, BatteryLevel, SignalLevel, Color_='' ):
+    ' update the widget of the command, once the Zigate has accepted it ( OptimisticUpdates ) or now '
+
+    previous = ( Devices[Unit].nValue, Devices[Unit].sValue, Devices[Unit].Color )
+    if not cmd or not self.optimistic.expect( NWKID, EPout, cmd, Unit, ( nValue, sValue, Color_ ), previous, BatteryLevel, SignalLevel ):
+        UpdateDevice_v2(self, Devices, Unit, nValue, sValue, BatteryLevel, SignalLevel, Color_)
+
+
+def processOptimisticUpdates( self, Devices ):
+    ' put on the widgets the state of the commands just accepted by the Zigate '
+
+    for key, record in self.optimistic.accepted():
+        nValue, sValue, Color_ = record['State']
+        UpdateDevice_v2(self, Devices, record['Unit'], nValue, sValue, record['Battery'], record['Signal'], Color_)
+
+
+def processOptimisticTimeouts( self, Devices ):
+    ' read the state of the devices which did not report after a command, roll back the widgets still unconfirmed '
+
+    verify, rollback = self.optimistic.due()
+    for NWKID, EPout, cluster in verify:
+        if NWKID in self.ListOfDevices and cluster in OPTIMISTIC_READ:
+            OPTIMISTIC_READ[cluster]( self, NWKID )
+    for key, record in rollback:
+        nValue, sValue, Color_ = record['Previous']
+        UpdateDevice_v2(self, Devices, record['Unit'], nValue, sValue, record['Battery'], record['Signal'], Color_)
+
 
 def mgtCommand( self, Devices, Unit, Command, Level, Color ) :
     Domoticz.Debug("onCommand called for Devices[%s].Name: %s SwitchType: %s Command: %s Level: %s Color: %s" %(Unit , Devices[Unit].Name, Devices[Unit].SwitchType, Command, Level, Color ))
@@ -27,6 +64,7 @@ def mgtCommand( self, Devices, Unit, Command, Level, Color ) :
     # As we can have a new Short address, we need to retreive it from self.ListOfDevices
     if Devices[Unit].DeviceID in self.IEEE2NWK:
         NWKID = self.IEEE2NWK[Devices[Unit].DeviceID]
+        self.routeWarmer.commanded( NWKID )
     else :
         Domoticz.Error("mgtCommand - something strange the Device " +str(Devices[Unit].Name) + " DeviceID : " +str(Devices[Unit].DeviceID) + " is unknown from the Plugin")
         return
@@ -119,14 +157,16 @@ def mgtCommand( self, Devices, Unit, Command, Level, Color ) :
 
         if DeviceType == "WindowCovering":
             # https://github.com/fairecasoimeme/ZiGate/issues/125#issuecomment-456085847
+            zigate_cmd = "00FA"
             sendZigateCmd(self, "00FA","02" + NWKID + "01" + EPout + "01")
         else:
+            zigate_cmd = "0092"
             sendZigateCmd(self, "0092","02" + NWKID + "01" + EPout + "00")
 
         if Devices[Unit].SwitchType == 16 :
-            UpdateDevice_v2(self, Devices, Unit, 0, "0",BatteryLevel, SignalLevel)
+            updateWidget(self, Devices, Unit, NWKID, EPout, zigate_cmd, 0, "0",BatteryLevel, SignalLevel)
         else :
-            UpdateDevice_v2(self, Devices, Unit, 0, "Off",BatteryLevel, SignalLevel)
+            updateWidget(self, Devices, Unit, NWKID, EPout, zigate_cmd, 0, "Off",BatteryLevel, SignalLevel)
 
     if Command == "On" :
         self.ListOfDevices[NWKID]['Heartbeat'] = 0  # Let's force a refresh of Attribute in the next Hearbeat
@@ -139,19 +179,22 @@ def mgtCommand( self, Devices, Unit, Command, Level, Color ) :
 
         if DeviceType == "WindowCovering":
             # https://github.com/fairecasoimeme/ZiGate/issues/125#issuecomment-456085847
+            zigate_cmd = "00FA"
             sendZigateCmd(self, "00FA","02" + NWKID + "01" + EPout + "00")
         else:
+            zigate_cmd = "0092"
             sendZigateCmd(self, "0092","02" + NWKID + "01" + EPout + "01")
         if Devices[Unit].SwitchType == 16 :
-            UpdateDevice_v2(self, Devices, Unit, 1, "100",BatteryLevel, SignalLevel)
+            updateWidget(self, Devices, Unit, NWKID, EPout, zigate_cmd, 1, "100",BatteryLevel, SignalLevel)
         else:
-            UpdateDevice_v2(self, Devices, Unit, 1, "On",BatteryLevel, SignalLevel)
+            updateWidget(self, Devices, Unit, NWKID, EPout, zigate_cmd, 1, "On",BatteryLevel, SignalLevel)
 
     if Command == "Set Level" :
         #Level is normally an integer but may be a floating point number if the Unit is linked to a thermostat device
         #There is too, move max level, mode = 00/01 for 0%/100%
         
         self.ListOfDevices[NWKID]['Heartbeat'] = 0  # Let's force a refresh of Attribute in the next Hearbeat
+        zigate_cmd = None
         if DeviceType == 'ThermoSetpoint':
             value = int(float(Level)*100)
             Domoticz.Log("Calling thermostat_Setpoint( %s, %s) " %(NWKID, value))
@@ -176,6 +219,7 @@ def mgtCommand( self, Devices, Unit, Command, Level, Color ) :
             # https://github.com/fairecasoimeme/ZiGate/issues/125#issuecomment-456085847
             value = '%02x' %Level
             Domoticz.Log("WindowCovering - Go To Lift Percentage Command - %s/%s Level: 0x%s" %(NWKID, EPout, value))
+            zigate_cmd = "00FA"
             sendZigateCmd(self, "00FA","02" + NWKID + "01" + EPout + "05" + value)
 
         else:
@@ -190,13 +234,14 @@ def mgtCommand( self, Devices, Unit, Command, Level, Color ) :
                     value = 1
 
             value=Hex_Format(2, value)
+            zigate_cmd = "0081"
             sendZigateCmd(self, "0081","02" + NWKID + EPin + EPout + OnOff + value + "0010")
 
         if Devices[Unit].SwitchType == 16 :
-            UpdateDevice_v2(self, Devices, Unit, 2, str(Level) ,BatteryLevel, SignalLevel) 
+            updateWidget(self, Devices, Unit, NWKID, EPout, zigate_cmd, 2, str(Level) ,BatteryLevel, SignalLevel) 
         else:
             # A bit hugly, but '1' instead of '2' is needed for the ColorSwitch dimmer to behave correctky
-            UpdateDevice_v2(self, Devices, Unit, 1, str(Level) ,BatteryLevel, SignalLevel) 
+            updateWidget(self, Devices, Unit, NWKID, EPout, zigate_cmd, 1, str(Level) ,BatteryLevel, SignalLevel) 
 
     if Command == "Set Color" :
         Domoticz.Debug("onCommand - Set Color - Level = " + str(Level) + " Color = " + str(Color) )
@@ -262,8 +307,8 @@ def mgtCommand( self, Devices, Unit, Command, Level, Color ) :
             sendZigateCmd(self, "00B6","02" + NWKID + EPin + EPout + Hex_Format(2,hue) + Hex_Format(2,saturation) + "0000")
             sendZigateCmd(self, "0081","02" + NWKID + EPin + EPout + OnOff + Hex_Format(2,value) + "0010")
 
-        #Update Device
-        UpdateDevice_v2(self, Devices, Unit, 1, str(value) ,BatteryLevel, SignalLevel, str(Color))
+        #Update Device, once the Level command is accepted
+        updateWidget(self, Devices, Unit, NWKID, EPout, "0081", 1, str(value) ,BatteryLevel, SignalLevel, str(Color))
 
 
 def livolo_OnOff( self, nwkid , EPout, devunit, onoff):
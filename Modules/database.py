@@ -17,6 +17,8 @@ import json
 
 from Modules.tools import CheckDeviceList
 
+from Classes.DeviceConf import DeviceConfIndex
+
 def _copyfile( source, dest ):
     copy_buffer =''
     with open(source, 'r') as src, open(dest, 'wt') as dst:
@@ -116,26 +118,12 @@ def WriteDeviceList(self, count):
         self.HBcount=self.HBcount+1
 
 def importDeviceConf( self ) :
-    #Import DeviceConf.txt
-    tmpread=""
-    self.DeviceConf = {}
-    with open( self.pluginconf.pluginConfig  + "DeviceConf.txt", 'r') as myfile:
-        tmpread+=myfile.read().replace('\n', '')
-        try:
-            self.DeviceConf=eval(tmpread)
-        except (SyntaxError, NameError, TypeError, ZeroDivisionError):
-            Domoticz.Error("Error while loading %s in line : %s" %(self.pluginconf.pluginConfig, tmpread))
-            return
-
-    # Remove comments
-    for iterDevType in list(self.DeviceConf):
-        if iterDevType == '':
-            del self.DeviceConf[iterDevType]
-            
-    #for iterDevType in list(self.DeviceConf):
-    #    Domoticz.Log("%s - %s" %(iterDevType, self.DeviceConf[iterDevType]))
-
-    Domoticz.Status("DeviceConf loaded")
+    #Import DeviceConf.txt, and compile it. Called at startup and each time the file is modified
+    if self.DeviceConfIndex is None:
+        self.DeviceConfIndex = DeviceConfIndex( self.pluginconf )
+
+    if self.DeviceConfIndex.load():
+        self.DeviceConf = self.DeviceConfIndex.DeviceConf
 
 def checkListOfDevice2Devices( self, Devices ) :
 
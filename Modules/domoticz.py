@@ -14,6 +14,8 @@ import time
 import struct
 import json
 
+from Classes.DeviceConf import PROFILE_ZDEVICE_QUIRKS
+
 def CreateDomoDevice(self, Devices, NWKID):
     """
     CreateDomoDevice
@@ -133,7 +135,7 @@ def CreateDomoDevice(self, Devices, NWKID):
                 self.ListOfDevices[NWKID]['Ep'][Ep]['ClusterType'][str(ID)] = t
 
         if self.ListOfDevices[NWKID]['Model'] == {} or \
-                self.ListOfDevices[NWKID][ 'Model'] not in self.DeviceConf:    # If Model is known, then Type must be set correctly
+                not self.DeviceConfIndex.isKnown( self.ListOfDevices[NWKID]['Model'] ):    # If Model is known, then Type must be set correctly
             if ("Switch" in Type) and ("LvlControl" in Type) and ("ColorControl" in Type):
                 Type = ['ColorControl']
             elif ("Switch" in Type) and ("LvlControl" in Type):
@@ -1363,35 +1365,22 @@ def GetType(self, Addr, Ep):
     Domoticz.Log("GetType - Model " + str(self.ListOfDevices[Addr]['Model']) + " Profile ID : " + str(
         self.ListOfDevices[Addr]['ProfileID']) + " ZDeviceID : " + str(self.ListOfDevices[Addr]['ZDeviceID']))
 
-    if self.ListOfDevices[Addr]['Model'] != {} and self.ListOfDevices[Addr][ 'Model'] in self.DeviceConf:
+    confType = self.DeviceConfIndex.getType( self.ListOfDevices[Addr]['Model'], Ep )
+    if confType is not None:
         # verifie si le model a ete detecte et est connu dans le fichier DeviceConf.txt
-        if Ep in self.DeviceConf[self.ListOfDevices[Addr]['Model']]['Ep']:
-            if 'Type' in self.DeviceConf[self.ListOfDevices[Addr]['Model']]['Ep'][Ep]:
-                if self.DeviceConf[self.ListOfDevices[Addr]['Model']]['Ep'][Ep]['Type'] != "":
-                    Domoticz.Debug("GetType - Found Type in DeviceConf : " + str(
-                        self.DeviceConf[self.ListOfDevices[Addr]['Model']]['Ep'][Ep]['Type']))
-                    Type = self.DeviceConf[self.ListOfDevices[Addr]['Model']]['Ep'][Ep]['Type']
-                    Type = str(Type)
-        else:
-            Domoticz.Debug("GetType - Found Type in DeviceConf : " + str(
-                self.DeviceConf[self.ListOfDevices[Addr]['Model']]['Type']))
-            Type = self.DeviceConf[self.ListOfDevices[Addr]['Model']]['Type']
+        Domoticz.Debug("GetType - Found Type in DeviceConf : " + str(confType))
+        Type = confType
     else:
         Domoticz.Log("GetType - Model %s not found with Ep: %s in DeviceConf. Continue with ClusterSearch" %( self.ListOfDevices[Addr]['Model'], Ep)) 
         Type = ""
 
-        # Check ProfileID/ZDeviceD
+        # Check Manufacturer/ProfileID/ZDeviceD quirks
         if 'Manufacturer' in self.ListOfDevices[Addr]:
-            if self.ListOfDevices[Addr]['Manufacturer'] == '117c': # Ikea
-                if ( self.ListOfDevices[Addr]['ProfileID'] == 'c05e' and self.ListOfDevices[Addr]['ZDeviceID'] == '0830') :
-                    return "Ikea_Round_5b"
-                elif self.ListOfDevices[Addr]['ProfileID'] == 'c05e' and self.ListOfDevices[Addr]['ZDeviceID'] == '0820':
-                    return "Ikea_Round_OnOff"
-            elif self.ListOfDevices[Addr]['Manufacturer'] == '100b': # Philipps Hue
-                pass
-            elif str(self.ListOfDevices[Addr]['Manufacturer']).find('LIVOLO') != -1:
-                Domoticz.Log("GetType - Found Livolo based on Manufacturer")
-                return 'LivoloSWL/LivoloSWR'
+            quirkType = self.DeviceConfIndex.quirkType( self.ListOfDevices[Addr]['Manufacturer'], \
+                    self.ListOfDevices[Addr]['ProfileID'], self.ListOfDevices[Addr]['ZDeviceID'] )
+            if quirkType is not None:
+                Domoticz.Log("GetType - Found %s based on Manufacturer/ProfileID/ZDeviceID" %quirkType)
+                return quirkType
 
         # Finaly Chec on Cluster
         for cluster in self.ListOfDevices[Addr]['Ep'][Ep]:
@@ -1425,10 +1414,8 @@ def TypeFromCluster(cluster, create_=False, ProfileID_='', ZDeviceID_=''):
     Domoticz.Debug("ClusterSearch - Cluster: %s, ProfileID: %s, ZDeviceID: %s, create: %s" %(cluster, ProfileID_, ZDeviceID_, create_))
 
     TypeFromCluster = ''
-    if ProfileID_ == 'c05e' and ZDeviceID_ == '0830':
-        TypeFromCluster = 'Ikea_Round_5b'
-    elif ProfileID_ == 'c05e' and ZDeviceID_ == '0820':
-        TypeFromCluster = 'Ikea_Round_OnOff'
+    if ( ProfileID_, ZDeviceID_ ) in PROFILE_ZDEVICE_QUIRKS:
+        TypeFromCluster = PROFILE_ZDEVICE_QUIRKS[ ( ProfileID_, ZDeviceID_ ) ]
     elif cluster == "0001": TypeFromCluster = "Voltage"
     elif cluster == "0006": TypeFromCluster = "Switch"
     elif cluster == "0008": TypeFromCluster = "LvlControl"
@@ -19,7 +19,7 @@ import json
 import queue
 
 from Modules.output import  sendZigateCmd,  \
-        processConfigureReporting, identifyEffect, setXiaomiVibrationSensitivity, NwkMgtUpdReq, \
+        processConfigureReporting, processSilentReporting, routeKeepAlive, identifyEffect, setXiaomiVibrationSensitivity, NwkMgtUpdReq, \
         bindDevice, rebind_Clusters, getListofAttribute, \
         ReadAttributeRequest_Ack,  \
         ReadAttributeRequest_0000, ReadAttributeRequest_0001, ReadAttributeRequest_0006, ReadAttributeRequest_0008, \
@@ -28,7 +28,7 @@ from Modules.output import  sendZigateCmd,  \
         ReadAttributeRequest_0406, ReadAttributeRequest_0702
 
 from Modules.tools import removeNwkInList
-from Modules.domoticz import CreateDomoDevice
+from Modules.domoticz import CreateDomoDevice, GetType
 from Modules.LQI import LQIcontinueScan
 from Modules.consts import HEARTBEAT
 
@@ -81,70 +81,88 @@ def processKnownDevices( self, Devices, NWKID ):
         return
 
     intHB = int( self.ListOfDevices[NWKID]['Heartbeat'])
+    unreachable = self.ZigateComm.breaker.isOpen( NWKID )   # Skip the background requests, except the probes
 
-    # Check if Node Descriptor was run ( this could not be the case on early version)
+    if not unreachable and self.warmup.due( NWKID ):
+        warmUpDevice( self, NWKID )
 
-    if  self.HeartbeatCount == ( 28 // HEARTBEAT):
-        if 'PowerSource' not in self.ListOfDevices[NWKID]:  # Looks like PowerSource is not 
-                                                            # available, let's request a Node Descriptor
-            sendZigateCmd(self,"0042", str(NWKID) )         # Request a Node Descriptor
-
-    if  self.HeartbeatCount == ( 56 // HEARTBEAT):
-        if 'PowerSource' in self.ListOfDevices[NWKID]:
-            if (self.ListOfDevices[NWKID]['PowerSource']) == 'Main':
-                if 'Attributes List' not in  self.ListOfDevices[NWKID]:
-                    for iterEp in self.ListOfDevices[NWKID]['Ep']:
-                        for iterCluster in self.ListOfDevices[NWKID]['Ep'][iterEp]:
-                            if iterCluster in ( 'Type', 'ClusterType', 'ColorMode' ): continue
-                            getListofAttribute( self, NWKID, iterEp, iterCluster)
-
-    # Ping each device, even the battery one. It will make at least the route up-to-date
-    #if ( intHB % ( 3000 // HEARTBEAT)) == 0:
-    #    ReadAttributeRequest_Ack(self, NWKID)
+    if not self.warmup.ready( NWKID ):
+        return  # Background requests wait for the device warm-up slot
+
+    # The routes to the mains powered devices are kept up-to-date by processRouteWarming()
     if ( self.pluginconf.enableReadAttributes or  self.pluginconf.resetReadAttributes ) and ( intHB % (30 // HEARTBEAT)) == 0 :
+        if not self.ZigateComm.breaker.allow( NWKID ):
+            return
         now = int(time.time())   # Will be used to trigger ReadAttributes
         for tmpEp in self.ListOfDevices[NWKID]['Ep']:    
             if tmpEp == 'ClusterType': continue
             for Cluster in READ_ATTRIBUTES_REQUEST:
                 if Cluster not in self.ListOfDevices[NWKID]['Ep'][tmpEp]:
                     continue
-                if Cluster in ( '0000' ) and (intHB != ( 120 // HEARTBEAT)):
-                    continue    # Just does it at plugin start
+                if Cluster == '0000':
+                    continue    # Just does it at the device warm-up
                 if 'PowerSource' in self.ListOfDevices[NWKID]:
                     if (self.ListOfDevices[NWKID]['PowerSource']) != 'Main':
                         continue
                 if 'MacCapa' in self.ListOfDevices[NWKID]:
                     if self.ListOfDevices[NWKID]['MacCapa'] != '8e': # Not a Main Powered 
                         continue
-                if self.busy  or len(self.ZigateComm._normalQueue) > 2:
-                    Domoticz.Debug('processKnownDevices - skip ReadAttribute for now ... system too busy (%s/%s) for %s' 
-                            %(self.busy, len(self.ZigateComm._normalQueue), NWKID))
-                    break # Will do at the next round
 
                 func = READ_ATTRIBUTES_REQUEST[Cluster][0]
-                timing = READ_ATTRIBUTES_REQUEST[Cluster][1]
-                if 'ReadAttributes' not in self.ListOfDevices[NWKID]:
-                    self.ListOfDevices[NWKID]['ReadAttributes'] = {}
-                    self.ListOfDevices[NWKID]['ReadAttributes']['Ep'] = {}
-                if 'TimeStamps' in self.ListOfDevices[NWKID]['ReadAttributes'] :
-                    _idx = tmpEp + '-' + str(Cluster)
-                    if _idx in self.ListOfDevices[NWKID]['ReadAttributes']['TimeStamps']:
-                        Domoticz.Debug("processKnownDevices - processing %s with cluster %s TimeStamps: %s, Timing: %s , Now: %s "
-                                %(NWKID, Cluster, self.ListOfDevices[NWKID]['ReadAttributes']['TimeStamps'][_idx], timing, now))
-                        if self.ListOfDevices[NWKID]['ReadAttributes']['TimeStamps'][_idx] != {}:
-                            if now > (self.ListOfDevices[NWKID]['ReadAttributes']['TimeStamps'][_idx] + timing):
-                                Domoticz.Debug("%s/%s It's time to Request ReadAttribute for %s" %( NWKID, tmpEp, Cluster ))
-                                func(self, NWKID )
-                        else:
-                            Domoticz.Debug("processKnownDevices - 1: %s Request ReadAttribute for %s/%s" %( NWKID, tmpEp, Cluster ))
-                            func(self, NWKID )
-                    else:
-                        Domoticz.Debug("processKnownDevices - 2: %s Request ReadAttribute for %s/%s" %( NWKID, tmpEp, Cluster ))
-                        func(self, NWKID )
+                timing = self.polling.interval( NWKID, tmpEp, Cluster, READ_ATTRIBUTES_REQUEST[Cluster][1] )
+                timeStamp = self.polling.timeStamp( NWKID, tmpEp, Cluster )
+                if timeStamp is not None and now <= timeStamp + timing:
+                    continue
+
+                if self.busy or not self.ZigateComm.admission.admit( 'ReadAttributes' ):
+                    Domoticz.Debug('processKnownDevices - skip ReadAttribute for now ... system too busy (%s) or no airtime for %s' 
+                            %(self.busy, NWKID))
+                    break # Will do at the next round
+
+                if timeStamp is None:
+                    Domoticz.Debug("processKnownDevices - %s Request ReadAttribute for %s/%s" %( NWKID, tmpEp, Cluster ))
+                    func(self, NWKID )
                 else:
-                    Domoticz.Debug("processKnownDevices - 3: %s Request ReadAttribute for %s/%s" %( NWKID, tmpEp, Cluster ))
+                    Domoticz.Debug("%s/%s It's time to Request ReadAttribute for %s ( last poll or report: %s, interval: %s )"
+                            %( NWKID, tmpEp, Cluster, timeStamp, timing ))
                     func(self, NWKID )
+                    self.polling.polled( NWKID, tmpEp, Cluster )
     
+def warmUpRequests( self, NWKID ):
+    ' Start-up requests to a known device, when they are not fresh from the previous run: list of ( function, args, frames ) '
+
+    requests = []
+    # Check if Node Descriptor was run ( this could not be the case on early version)
+    if 'PowerSource' not in self.ListOfDevices[NWKID]:     # Looks like PowerSource is not 
+                                                            # available, let's request a Node Descriptor
+        requests.append( ( sendZigateCmd, ( "0042", str(NWKID) ), 1 ))     # Request a Node Descriptor
+
+    elif self.ListOfDevices[NWKID]['PowerSource'] == 'Main':
+        if 'Attributes List' not in  self.ListOfDevices[NWKID]:
+            for iterEp in self.ListOfDevices[NWKID]['Ep']:
+                for iterCluster in self.ListOfDevices[NWKID]['Ep'][iterEp]:
+                    if iterCluster in ( 'Type', 'ClusterType', 'ColorMode' ): continue
+                    requests.append( ( getListofAttribute, ( NWKID, iterEp, iterCluster ), 1 ))
+
+        if ( self.pluginconf.enableReadAttributes or self.pluginconf.resetReadAttributes ) and not self.warmup.basicIsFresh( NWKID ):
+            for iterEp in self.ListOfDevices[NWKID]['Ep']:
+                if '0000' in self.ListOfDevices[NWKID]['Ep'][iterEp]:
+                    requests.append( ( ReadAttributeRequest_0000, ( NWKID, ), 2 ))   # Full scope, in 2 Read Attribute
+                    break
+    return requests
+
+def warmUpDevice( self, NWKID ):
+    ' Send the start-up requests of the device, as far as the airtime admits them. The others wait for the next heartbeat '
+
+    if NWKID not in self.warmup.Requests:
+        self.warmup.Requests[ NWKID ] = warmUpRequests( self, NWKID )
+    requests = self.warmup.Requests[ NWKID ]
+    while requests and self.ZigateComm.admission.admit( 'WarmUp', requests[0][2] ):
+        request, args, frames = requests.pop(0)
+        request( self, *args )
+    if not requests:
+        self.warmup.done( NWKID )
+
 def processNotinDBDevices( self, Devices, NWKID , status , RIA ):
 
     # Starting V 4.1.x
@@ -164,7 +182,8 @@ def processNotinDBDevices( self, Devices, NWKID , status , RIA ):
             Domoticz.Status("[%s] NEW OBJECT: %s Model Name: %s" %(RIA, NWKID, self.ListOfDevices[NWKID]['Model']))
             # Let's check if this Model is known
             if 'Model' in self.ListOfDevices[NWKID]:
-                if self.ListOfDevices[NWKID]['Model'] in self.DeviceConf:
+                if self.DeviceConfIndex.isKnown( self.ListOfDevices[NWKID]['Model'] ) or \
+                        self.ListOfDevices[NWKID].get('ConfigSource') == 'Template':
                     if not self.pluginconf.allowStoreDiscoveryFrames:
                         status = 'createDB' # Fast track
     else:
@@ -184,7 +203,8 @@ def processNotinDBDevices( self, Devices, NWKID , status , RIA ):
             else: 
                 Domoticz.Status("[%s] NEW OBJECT: %s Model Name: %s" %(RIA, NWKID, self.ListOfDevices[NWKID]['Model']))
                 # Let's check if this Model is known
-                if self.ListOfDevices[NWKID]['Model'] in self.DeviceConf:
+                if self.DeviceConfIndex.isKnown( self.ListOfDevices[NWKID]['Model'] ) or \
+                        self.ListOfDevices[NWKID].get('ConfigSource') == 'Template':
                     status = 'createDB' # Fast track
 
         if 'Manufacturer' in self.ListOfDevices[NWKID]:
@@ -289,6 +309,16 @@ def processNotinDBDevices( self, Devices, NWKID , status , RIA ):
             Domoticz.Debug("processNotinDBDevices - ready for creation: %s" %self.ListOfDevices[NWKID])
             CreateDomoDevice(self, Devices, NWKID)
 
+            # Learn this interview, so the next device of that Model will be fast tracked
+            if self.ListOfDevices[NWKID]['Status'] == 'inDB' and not self.DeviceConfIndex.isKnown( self.ListOfDevices[NWKID]['Model'] ):
+                epTypes = {}
+                for iterEp in self.ListOfDevices[NWKID]['Ep']:
+                    if 'Type' in self.ListOfDevices[NWKID]['Ep'][iterEp]:
+                        epTypes[iterEp] = self.ListOfDevices[NWKID]['Ep'][iterEp]['Type']
+                    else:
+                        epTypes[iterEp] = GetType(self, NWKID, iterEp)
+                self.deviceTemplates.learnTemplate( NWKID, epTypes )
+
             # Post creation widget
             Domoticz.Debug("Device: %s - Config Source: %s Ep Details: %s" %(NWKID,self.ListOfDevices[NWKID]['ConfigSource'],str(self.ListOfDevices[NWKID]['Ep'])))
 
@@ -318,6 +348,8 @@ def processNotinDBDevices( self, Devices, NWKID , status , RIA ):
             identifyEffect( self, NWKID, ep , effect='Blink' )
 
             for iterEp in self.ListOfDevices[NWKID]['Ep']:
+                if self.ListOfDevices[NWKID].get('ConfigSource') == 'Template' and 'Attributes List' in self.ListOfDevices[NWKID]:
+                    break   # Already provided by the learned template
                 Domoticz.Debug('looking for List of Attributes ep: %s' %iterEp)
                 for iterCluster in  self.ListOfDevices[NWKID]['Ep'][iterEp]:
                     if iterCluster in ( 'Type', 'ClusterType', 'ColorMode' ): 
@@ -338,6 +370,12 @@ def processNotinDBDevices( self, Devices, NWKID , status , RIA ):
     #end ( self.pluginconf.storeDiscoveryFrames == 0 and status != "UNKNOW" and status != "DUP")  or (  self.pluginconf.storeDiscoveryFrames == 1 and status == "8043" )
     
 
+def processRouteWarming( self ):
+
+    skip = self.ZigateComm.breaker.openCircuits() + [ NWKID for NWKID in self.ListOfDevices if not self.warmup.ready( NWKID ) ]
+    for NWKID in self.routeWarmer.candidates( skip, admit=lambda: self.ZigateComm.admission.admit( 'RouteWarming' )):
+        routeKeepAlive( self, NWKID )
+
 def processListOfDevices( self , Devices ):
     # Let's check if we do not have a command in TimeOut
     self.ZigateComm.checkTOwaitFor()
@@ -409,16 +447,20 @@ def processListOfDevices( self , Devices ):
     # LQI Scanner
     #    - LQI = 0 - no scanning at all otherwise delay the scan by n x HEARTBEAT
     if self.pluginconf.logLQI != 0 and \
-            self.HeartbeatCount > (( 120 + self.pluginconf.logLQI) // HEARTBEAT):
-        if self.ZigateComm.loadTransmit() < 5 :
-            LQIcontinueScan( self, Devices )
+            self.HeartbeatCount > (( 120 + self.pluginconf.warmupWindow + self.pluginconf.logLQI) // HEARTBEAT):
+        LQIcontinueScan( self, Devices )
 
     if ( self.HeartbeatCount % (60 // HEARTBEAT)) == 0:
         # Trigger Conifre Reporting to eligeable decices
         processConfigureReporting( self )
+        # Reconfigure the Attributes which stopped reporting
+        processSilentReporting( self )
+        # Keep the routes to the mains powered devices
+        processRouteWarming( self )
     
     if self.pluginconf.networkScan != 0 and \
-            (self.HeartbeatCount == ( 120 // HEARTBEAT ) or (self.HeartbeatCount % ((300+self.pluginconf.networkScan ) // HEARTBEAT )) == 0) :
+            (self.HeartbeatCount == (( 120 + self.pluginconf.warmupWindow ) // HEARTBEAT ) or (self.HeartbeatCount % ((300+self.pluginconf.networkScan ) // HEARTBEAT )) == 0) and \
+            self.ZigateComm.admission.admit( 'NetworkScan' ):
         NwkMgtUpdReq( self, ['11','12','13','14','15','16','17','18','19','20','21','22','23','24','25','26'] , mode='scan')
 
     return True
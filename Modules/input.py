@@ -20,12 +20,13 @@ import json
 
 from Modules.domoticz import MajDomoDevice, lastSeenUpdate
 from Modules.tools import timeStamped, updSQN, DeviceExist, getSaddrfromIEEE, IEEEExist, initDeviceInList
-from Modules.output import sendZigateCmd, leaveMgtReJoin, rebind_Clusters
+from Modules.output import sendZigateCmd, leaveMgtReJoin, rebind_Clusters, ReadAttributeRequest_0000
 from Modules.status import DisplayStatusCode
 from Modules.readClusters import ReadCluster
-from Modules.LQI import mgtLQIresp
+from Modules.LQI import mgtLQIresp, mgtLQIstatus
 from Modules.database import saveZigateNetworkData
 from Modules.consts import ADDRESS_MODE
+from Modules.command import processOptimisticUpdates
 
 #from Modules.adminWidget import updateNotificationWidget, updateStatusWidget
 
@@ -70,6 +71,7 @@ def ZigateRead(self, Devices, Data):
     elif str(MsgType)=="8000":  # Status
         Domoticz.Debug("ZigateRead - MsgType 8000 - reception status : " + Data)
         Decode8000_v2(self, MsgData)
+        processOptimisticUpdates(self, Devices)
         return
 
     elif str(MsgType)=="8001":  # Log
@@ -266,10 +268,12 @@ def ZigateRead(self, Devices, Data):
 
     elif str(MsgType)=="80a1":  #
         Domoticz.Log("ZigateRead - MsgType 80a1 - Reception Add scene response : " + Data)
+        Decode80A1(self, MsgData)
         return
 
     elif str(MsgType)=="80a2":  #
         Domoticz.Log("ZigateRead - MsgType 80a2 - Reception Remove scene response : " + Data)
+        Decode80A2(self, MsgData)
         return
 
     elif str(MsgType)=="80a3":  #
@@ -278,10 +282,12 @@ def ZigateRead(self, Devices, Data):
 
     elif str(MsgType)=="80a4":  #
         Domoticz.Log("ZigateRead - MsgType 80a4 - Reception Store scene response : " + Data)
+        Decode80A4(self, MsgData)
         return
 
     elif str(MsgType)=="80a6":  #
-        Domoticz.Log("ZigateRead - MsgType 80a6 - Reception Scene membership response : " + Data)
+        Domoticz.Debug("ZigateRead - MsgType 80a6 - Reception Scene membership response : " + Data)
+        Decode80A6(self, MsgData)
         return
     elif str(MsgType)=="80a7":
         Domoticz.Debug("ZigateRead - MsgType 80a7 - Reception Remote command : " + Data)
@@ -496,6 +502,9 @@ def Decode8000_v2(self, MsgData) : # Status
     elif PacketType=="0026" : Domoticz.Log("Remove Device cmd status : " +  Status )
     elif PacketType=="0044" : Domoticz.Log("request Power Descriptor status : " +  Status )
 
+    if PacketType == '004e' and self.LQIScan:
+        mgtLQIstatus( self, SEQ, MsgData[0:2] )
+
     # Group Management
     if PacketType in ('0060', '0061', '0062', '0063', '0064', '0065'):
         self.groupmgt.statusGroupRequest( MsgData )
@@ -520,36 +529,46 @@ def Decode8002(self, MsgData) : # Data indication
     MsgLen=len(MsgData)
     Domoticz.Debug("Decode8002 - MsgData lenght is : " + str(MsgLen) + " out of 2" )
 
+    if MsgLen < 28:
+        Domoticz.Log("Decode8002 - Data indication too short: %s" %MsgData)
+        return
+
     MsgLogLvl=MsgData[0:2]
     MsgProfilID=MsgData[2:6]
     MsgClusterID=MsgData[6:10]
     MsgSourcePoint=MsgData[10:12]
     MsgEndPoint=MsgData[12:14]
-    MsgSourceAddressMode=MsgData[16:18]
-    if int(MsgSourceAddressMode)==0 :
-        MsgSourceAddress=MsgData[18:24]  # uint16_t
-        MsgDestinationAddressMode=MsgData[24:26]
-        if int(MsgDestinationAddressMode)==0 : # uint16_t
-            MsgDestinationAddress=MsgData[26:32]
-            MsgPayloadSize=MsgData[32:34]
-            MsgPayload=MsgData[34:len(MsgData)]
-        else : # uint32_t
-            MsgDestinationAddress=MsgData[26:42]
-            MsgPayloadSize=MsgData[42:44]
-            MsgPayload=MsgData[44:len(MsgData)]
-    else : # uint32_t
-        MsgSourceAddress=MsgData[18:34]
-        MsgDestinationAddressMode=MsgData[34:36]
-        if int(MsgDestinationAddressMode)==0 : # uint16_t
-            MsgDestinationAddress=MsgData[36:40]
-            MsgPayloadSize=MsgData[40:42]
-            MsgPayload=MsgData[42:len(MsgData)]
-        else : # uint32_t
-            MsgDestinationAddress=MsgData[36:52]
-            MsgPayloadSize=MsgData[52:54]
-            MsgPayload=MsgData[54:len(MsgData)]
+    MsgSourceAddressMode=MsgData[14:16]
+    idx = 16
+    if int(MsgSourceAddressMode,16) == ADDRESS_MODE['ieee']: # uint64_t
+        MsgSourceAddress=MsgData[idx:idx+16]
+        idx += 16
+    else : # uint16_t
+        MsgSourceAddress=MsgData[idx:idx+4]
+        idx += 4
+    MsgDestinationAddressMode=MsgData[idx:idx+2]
+    idx += 2
+    if int(MsgDestinationAddressMode,16) == ADDRESS_MODE['ieee']: # uint64_t
+        MsgDestinationAddress=MsgData[idx:idx+16]
+        idx += 16
+    else : # uint16_t
+        MsgDestinationAddress=MsgData[idx:idx+4]
+        idx += 4
+    MsgPayloadSize=MsgData[idx:idx+2]
+    MsgPayload=MsgData[idx+2:len(MsgData)]
     
     Domoticz.Status("Reception Data indication, Source Address : " + MsgSourceAddress + " Destination Address : " + MsgDestinationAddress + " ProfilID : " + MsgProfilID + " ClusterID : " + MsgClusterID + " Payload size : " + MsgPayloadSize + " Message Payload : " + MsgPayload)
+
+    if MsgClusterID == "0020" and int(MsgSourceAddressMode,16) == ADDRESS_MODE['short']:
+        # Poll Control: ZCL frame control, SQN, Command
+        zclFrame = MsgPayload
+        if len(zclFrame) < 6:
+            return
+        if int(zclFrame[0:2],16) & 0x04:   # Manufacturer specific
+            zclFrame = zclFrame[0:2] + zclFrame[6:]
+        if len(zclFrame) >= 6 and zclFrame[4:6] == "00" and MsgSourceAddress in self.ListOfDevices:
+            Domoticz.Debug("Decode8002 - Poll Control Check-in from %s" %MsgSourceAddress)
+            self.ZigateComm.mailbox.checkIn( MsgSourceAddress, MsgSourcePoint, zclFrame[2:4] )
     return
 
 def Decode8003(self, MsgData) : # Device cluster list
@@ -1083,6 +1102,13 @@ def Decode8043(self, MsgData) : # Reception Simple descriptor response
             MsgDataCluster=""
             i=i+1
 
+    # If we have learned templates, get the Model from the first Ep with the Basic cluster. In case of a match we will not wait for the other Simple Descriptors
+    if self.ListOfDevices[MsgDataShAddr]['Status'] != "inDB" and self.deviceTemplates and self.deviceTemplates.hasTemplates():
+        if self.ListOfDevices[MsgDataShAddr].get('Model') in ( {}, '', None ) and '0000' in self.ListOfDevices[MsgDataShAddr]['Ep'].get( MsgDataEp, {} ) and \
+                not [ iterEp for iterEp in self.ListOfDevices[MsgDataShAddr]['Ep'] if iterEp != MsgDataEp and '0000' in self.ListOfDevices[MsgDataShAddr]['Ep'][iterEp] ]:
+            Domoticz.Status("[%s] NEW OBJECT: %s Request Model Name on Ep %s" %('-', MsgDataShAddr, MsgDataEp))
+            ReadAttributeRequest_0000(self, MsgDataShAddr )
+
     # Decoding Cluster Out
     idx = 24 + int(MsgDataInClusterCount,16) *4
     MsgDataOutClusterCount=MsgData[idx:idx+2]
@@ -1315,17 +1341,10 @@ def Decode804A(self, Devices, MsgData) : # Management Network Update response
         Domoticz.Status("     Channel: %s Interference: : %s " %(chan, int(inter,16)))
 
     # Write the report onto file
-    _filename =  self.pluginconf.pluginReports + 'Network_scan-' + '%02d' %self.HardwareID + '.txt'
-    #Domoticz.Status("Network Scan report save on " +str(_filename))
-    #with open(_filename , 'at') as file:
-    #    for key in nwkscan:
-    #        file.write(str(key) + ": " + str(nwkscan[key]) + "\n")
-
-    _filename =  self.pluginconf.pluginReports + 'Network_scan-' + '%02d' %self.HardwareID 
-    json_filename = _filename + ".json"
-    with open( json_filename , 'at') as json_file:
-        json_file.write('\n')
-        json.dump( nwkscan, json_file)
+    self.reportManifest.addSnapshot( 'Network', timing, nwkscan[timing] )
+
+    self.reportStore.addChannelScan( { chan: nwkscan[timing][chan] for chan in channelList if chan in nwkscan[timing] },
+            nwkscan[timing]['Total Tx'], nwkscan[timing]['Total failures'], timing )
 
     self.adminWidgets.updateNotificationWidget( Devices, 'A new Network Scan report is available' )
 
@@ -1380,6 +1399,8 @@ def Decode80A1(self, MsgData) : # Add Scene response
     MsgSceneID=MsgData[14:16]
     
     Domoticz.Log("ZigateRead - MsgType 80A1 - Add Scene response, Sequence number : " + MsgSequenceNumber + " EndPoint : " + MsgEP + " ClusterID : " + MsgClusterID + " Status : " + DisplayStatusCode( MsgDataStatus ) + " Group ID : " + MsgGroupID + " Scene ID : " + MsgSceneID)
+    if self.scenemgt:
+        self.scenemgt.addSceneResponse( MsgData )
     return
 
 def Decode80A2(self, MsgData) : # Remove Scene response
@@ -1394,6 +1415,8 @@ def Decode80A2(self, MsgData) : # Remove Scene response
     MsgSceneID=MsgData[14:16]
     
     Domoticz.Log("ZigateRead - MsgType 80A2 - Remove Scene response, Sequence number : " + MsgSequenceNumber + " EndPoint : " + MsgEP + " ClusterID : " + MsgClusterID + " Status : " + DisplayStatusCode( MsgDataStatus ) + " Group ID : " + MsgGroupID + " Scene ID : " + MsgSceneID)
+    if self.scenemgt:
+        self.scenemgt.removeSceneResponse( MsgData )
     return
 
 def Decode80A3(self, MsgData) : # Remove All Scene response
@@ -1421,6 +1444,8 @@ def Decode80A4(self, MsgData) : # Store Scene response
     MsgSceneID=MsgData[14:16]
     
     Domoticz.Log("ZigateRead - MsgType 80A4 - Store Scene response, Sequence number : " + MsgSequenceNumber + " EndPoint : " + MsgEP + " ClusterID : " + MsgClusterID + " Status : " + DisplayStatusCode( MsgDataStatus ) + " Group ID : " + MsgGroupID + " Scene ID : " + MsgSceneID)
+    if self.scenemgt:
+        self.scenemgt.addSceneResponse( MsgData )
     return
     
 def Decode80A6(self, MsgData) : # Scene Membership response
@@ -1434,9 +1459,12 @@ def Decode80A6(self, MsgData) : # Scene Membership response
     MsgCapacity=MsgData[10:12]
     MsgGroupID=MsgData[12:16]
     MsgSceneCount=MsgData[16:18]
-    MsgSceneList=MsgData[18:len(MsgData)]
+    MsgSceneList=MsgData[18:len(MsgData)-4]
+    MsgSrcAddr=MsgData[len(MsgData)-4:len(MsgData)]
     
-    Domoticz.Log("ZigateRead - MsgType 80A6 - Scene Membership response, Sequence number : " + MsgSequenceNumber + " EndPoint : " + MsgEP + " ClusterID : " + MsgClusterID + " Status : " + DisplayStatusCode( MsgDataStatus ) + " Group ID : " + MsgGroupID + " Scene ID : " + MsgSceneID)
+    Domoticz.Debug("ZigateRead - MsgType 80A6 - Scene Membership response, Sequence number : " + MsgSequenceNumber + " EndPoint : " + MsgEP + " ClusterID : " + MsgClusterID + " Status : " + DisplayStatusCode( MsgDataStatus ) + " Group ID : " + MsgGroupID + " Scene List : " + MsgSceneList + " Source : " + MsgSrcAddr)
+    if self.scenemgt:
+        self.scenemgt.sceneMembershipResponse( MsgData )
     return
 
 #Reponses Attributs
@@ -1452,7 +1480,7 @@ def Decode8100(self, Devices, MsgData, MsgRSSI) :  # Report Individual Attribute
     MsgClusterData=MsgData[24:len(MsgData)]
 
     Domoticz.Debug("Decode8100 - Report Individual Attribute : [%s:%s] ClusterID: %s AttributeID: %s Status: %s Type: %s Size: %s ClusterData: >%s<" \
-            %(MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, MsgAttStatus, MsgAttType, MsgAttSize, MsgClusterData ))
+            %(MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, MsgAttrStatus, MsgAttType, MsgAttSize, MsgClusterData ))
 
     timeStamped( self, MsgSrcAddr , 0x8100)
     if ( self.pluginconf.logFORMAT == 1 ) :
@@ -1464,6 +1492,9 @@ def Decode8100(self, Devices, MsgData, MsgRSSI) :  # Report Individual Attribute
 
     lastSeenUpdate( self, Devices, NwkId=MsgSrcAddr)
     updSQN( self, MsgSrcAddr, MsgSQN)
+    # No duplicate filter: the SQN of a Read Attribute response is the one of the Zigate request
+    if MsgAttrStatus == '00':
+        self.optimistic.reported( MsgSrcAddr, MsgSrcEp, MsgClusterId )
     ReadCluster(self, Devices, MsgData) 
 
     return
@@ -1510,6 +1541,11 @@ def Decode8102(self, Devices, MsgData, MsgRSSI) :  # Report Individual Attribute
         lastSeenUpdate( self, Devices, NwkId=MsgSrcAddr)
         timeStamped( self, MsgSrcAddr , 0x8102)
         updSQN( self, MsgSrcAddr, str(MsgSQN) )
+        if self.duplicateFilter.isDuplicate( MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, MsgSQN ):
+            return
+        self.polling.reported( MsgSrcAddr, MsgSrcEp, MsgClusterId )
+        self.reportingMonitor.reported( MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID )
+        self.optimistic.reported( MsgSrcAddr, MsgSrcEp, MsgClusterId )
         ReadCluster(self, Devices, MsgData) 
     else :
         # This device is unknown, and we don't have the IEEE to check if there is a device coming with a new sAddr
@@ -1742,7 +1778,12 @@ def Decode8702(self, MsgData) : # Reception APS Data confirm fail
             return
 
     timeStamped( self, MsgDataDestAddr , 0x8702)
-    updSQN( self, MsgDataDestAddr, MsgDataSQN)
+    # The SQN is the one of the failed request, not one from the device. Don't use updSQN() which tells the device is alive
+    if int(MsgDataDestMode,16) == ADDRESS_MODE['ieee']:
+        self.ZigateComm.breaker.failure( self.IEEE2NWK.get( MsgDataDestAddr ), "APS %s" %MsgDataStatus )
+    elif int(MsgDataDestMode,16) == ADDRESS_MODE['short']:
+        # Up to 030f, the short address is in the low bytes of a 64 bits field
+        self.ZigateComm.breaker.failure( MsgDataDestAddr[-4:], "APS %s" %MsgDataStatus )
     if self.pluginconf.enableAPSFailureLoging:
         Domoticz.Log("Decode8702 - SQN: %s AddrMode: %s DestAddr: %s SrcEP: %s DestEP: %s Status: %s - %s" \
             %( MsgDataSQN, MsgDataDestMode, MsgDataDestAddr, MsgDataSrcEp, MsgDataDestEp, MsgDataStatus, DisplayStatusCode( MsgDataStatus )))
@@ -1801,7 +1842,11 @@ def Decode004d(self, Devices, MsgData, MsgRSSI) : # Reception Device announce
                 del self.ListOfDevices[MsgSrcAddr]['ConfigureReporting']
                 self.ListOfDevices[MsgSrcAddr]['Hearbeat'] = 0
 
+        # The route to the device may have changed
+        self.routeWarmer.rejoined( MsgSrcAddr )
+
     timeStamped( self, MsgSrcAddr , 0x004d)
+    self.ZigateComm.deviceHeard( MsgSrcAddr )
 
     if self.pluginconf.allowStoreDiscoveryFrames:
         self.DiscoveryDevices[MsgSrcAddr] = {}
@@ -155,14 +155,14 @@ def ReadAttributeReq( self, addr, EpIn, EpOut, Cluster , ListOfAttributes ):
             self.ListOfDevices[addr]['ReadAttributes']['Ep'][EpOut][str(Cluster)] = {}
         if 'TimeStamps' not in self.ListOfDevices[addr]['ReadAttributes']:
             self.ListOfDevices[addr]['ReadAttributes']['TimeStamps'] = {}
-            self.ListOfDevices[addr]['ReadAttributes']['TimeStamps'][EpOut+'-'+str(Cluster)] = 0
+            self.ListOfDevices[addr]['ReadAttributes']['TimeStamps'][EpOut+'-'+str(Cluster).lower()] = 0
     else:
         self.ListOfDevices[addr]['ReadAttributes'] = {}
         self.ListOfDevices[addr]['ReadAttributes']['Ep'] = {}
         self.ListOfDevices[addr]['ReadAttributes']['Ep'][EpOut] = {}
         self.ListOfDevices[addr]['ReadAttributes']['Ep'][EpOut][str(Cluster)] = {}
         self.ListOfDevices[addr]['ReadAttributes']['TimeStamps'] = {}
-        self.ListOfDevices[addr]['ReadAttributes']['TimeStamps'][EpOut+'-'+str(Cluster)] = 0
+        self.ListOfDevices[addr]['ReadAttributes']['TimeStamps'][EpOut+'-'+str(Cluster).lower()] = 0
 
     if not isinstance(ListOfAttributes, list):
         # We received only 1 attribute
@@ -195,7 +195,7 @@ def ReadAttributeReq( self, addr, EpIn, EpOut, Cluster , ListOfAttributes ):
             return
 
     Domoticz.Debug("ReadAttributeReq - addr =" +str(addr) +" Cluster = " +str(Cluster) +" Attributes = " +str(ListOfAttributes) ) 
-    self.ListOfDevices[addr]['ReadAttributes']['TimeStamps'][str(EpOut) + '-' + str(Cluster)] = int(time())
+    self.ListOfDevices[addr]['ReadAttributes']['TimeStamps'][str(EpOut) + '-' + str(Cluster).lower()] = int(time())
     datas = "02" + addr + EpIn + EpOut + Cluster + direction + manufacturer_spec + manufacturer + "%02x" %(lenAttr) + Attr
     sendZigateCmd(self, "0100", datas )
 
@@ -284,6 +284,19 @@ def ReadAttributeRequest_Ack(self, key):
     ReadAttributeReq( self, key, EPin, EPout, "0000", listAttributes )
 
 
+def routeKeepAlive( self, key ):
+    ' Read the ZCL Version of the Basic cluster: a lightweight request which makes the route to the device discovered '
+
+    EPout= "01"
+    for tmpEp in self.ListOfDevices[key]['Ep']:
+        if "0000" in self.ListOfDevices[key]['Ep'][tmpEp]:
+            EPout= tmpEp
+            break
+    Domoticz.Debug("routeKeepAlive for %s/%s" %(key, EPout))
+    datas = "02" + key + "01" + EPout + "0000" + "00" + "00" + "0000" + "01" + "0000"
+    sendZigateCmd(self, "0100", datas )
+
+
 def ReadAttributeRequest_0001(self, key):
 
     Domoticz.Debug("ReadAttributeRequest_0001 - Key: %s " %key)
@@ -584,6 +597,84 @@ def getListofAttribute(self, nwkid, EpOut, cluster):
     sendZigateCmd(self, "0140", datas )
 
 
+# Configure Reporting settings per Cluster / Attribute
+ATTRIBUTESbyCLUSTERS = {
+        # 0xFFFF sable reporting-
+        # 0x0E10 - 3600s A hour
+        # 0x0708 - 30'
+        # 0x0384 - 15'
+        # 0x012C - 5'
+        # 0x003C - 1'
+    # Basic Cluster
+    '0000': {'Attributes': { '0000': {'DataType': '21', 'MinInterval':'012C', 'MaxInterval':'FFFE', 'TimeOut':'0000','Change':'01'},
+                             '0032': {'DataType': '10', 'MinInterval':'0005', 'MaxInterval':'1C20', 'TimeOut':'0FFF','Change':'01'},
+                             '0033': {'DataType': '10', 'MinInterval':'0005', 'MaxInterval':'1C20', 'TimeOut':'0FFF','Change':'01'}}},
+
+    # Power Cluster
+    '0001': {'Attributes': { '0000': {'DataType': '21', 'MinInterval':'012C', 'MaxInterval':'FFFE', 'TimeOut':'0000','Change':'01'},
+                             '0020': {'DataType': '29', 'MinInterval':'0E10', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
+                             '0021': {'DataType': '29', 'MinInterval':'0E10', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'}}},
+
+    # On/Off Cluster
+    '0006': {'Attributes': { '0000': {'DataType': '10', 'MinInterval':'0005', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'}}},
+    #'0006': {'Attributes': { '0000': {'DataType': '10', 'MinInterval':'0003', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'00'}}},
+
+    # Level Control Cluster
+    '0008': {'Attributes': { '0000': {'DataType': '20', 'MinInterval':'0005', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'05'}}},
+    #'0008': {'Attributes': { '0000': {'DataType': '20', 'MinInterval':'0003', 'MaxInterval':'0000', 'TimeOut':'0FFF','Change':'00'}}},
+
+    # Windows Covering
+    '0102': {'Attributes': { '0000': {'DataType': '30', 'MinInterval':'0005', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'05'},
+                             '0003': {'DataType': '21', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
+                             '0004': {'DataType': '21', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
+                             '0008': {'DataType': '20', 'MinInterval':'0001', 'MaxInterval':'0384', 'TimeOut':'0FFF','Change':'01'},
+                             '0009': {'DataType': '20', 'MinInterval':'0001', 'MaxInterval':'0384', 'TimeOut':'0FFF','Change':'01'},
+                             '000A': {'DataType': '16', 'MinInterval':'0001', 'MaxInterval':'0384', 'TimeOut':'0FFF','Change':'01'},
+                             '0011': {'DataType': '21', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
+                             '0013': {'DataType': '21', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
+                             '0017': {'DataType': '16', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'}}},
+    # Binary Input 
+    #'000f': {'Attributes': { '0055': {'DataType': '39', 'MinInterval':'000A', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'}}},
+    # Thermostat
+    '0201': {'Attributes': { '0000': {'DataType': '29', 'MinInterval':'012C', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'},
+                             '0008': {'DataType': '29', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
+                             '0011': {'DataType': '29', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
+                             '0012': {'DataType': '29', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
+                             '0014': {'DataType': '29', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
+                             '001B': {'DataType': '30', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
+                             '001C': {'DataType': '30', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'}}},
+    # Colour Control
+    '0300': {'Attributes': { '0007': {'DataType': '21', 'MinInterval':'0001', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'}, # Color Temp
+                             #'0000': {'DataType': '20', 'MinInterval':'0384', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
+                             #'0001': {'DataType': '20', 'MinInterval':'0001', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'}, 
+                             '0003': {'DataType': '21', 'MinInterval':'0001', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'}, # Color X
+                             '0004': {'DataType': '21', 'MinInterval':'0001', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'}, # Color Y
+                             '0008': {'DataType': '30', 'MinInterval':'0001', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'}}}, # Color Mode
+    # Illuminance Measurement
+    '0400': {'Attributes': { '0000': {'DataType': '21', 'MinInterval':'0005', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'0F'}}},
+    # Temperature
+    '0402': {'Attributes': { '0000': {'DataType': '29', 'MinInterval':'000A', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'}}},
+    # Pression Atmo
+    '0403': {'Attributes': { '0000': {'DataType': '20', 'MinInterval':'003C', 'MaxInterval':'0384', 'TimeOut':'0FFF','Change':'01'},
+                             '0010': {'DataType': '29', 'MinInterval':'003C', 'MaxInterval':'0384', 'TimeOut':'0FFF','Change':'01'}}},
+    # Humidity
+    '0405': {'Attributes': { '0000': {'DataType': '21', 'MinInterval':'003C', 'MaxInterval':'0384', 'TimeOut':'0FFF','Change':'01'}}},
+    # Occupancy Sensing
+    '0406': {'Attributes': { '0030': {'DataType': '20', 'MinInterval':'0005', 'MaxInterval':'1C20', 'TimeOut':'0FFF','Change':'01'},
+                             '0000': {'DataType': '18', 'MinInterval':'0001', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'}}},
+
+    #'0406': {'Attributes': { '0000': {'DataType': '18', 'MinInterval':'0001', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'FF'},
+    #                         '0030': {'DataType': '20', 'MinInterval':'0005', 'MaxInterval':'1C20', 'TimeOut':'0FFF','Change':'01'}}},
+
+    # IAS ZOne
+    '0500': {'Attributes': { '0000': {'DataType': '30', 'MinInterval':'003C', 'MaxInterval':'0384', 'TimeOut':'0FFF','Change':'01'},
+                             '0001': {'DataType': '31', 'MinInterval':'003C', 'MaxInterval':'0384', 'TimeOut':'0FFF','Change':'01'},
+                             '0002': {'DataType': '19', 'MinInterval':'003C', 'MaxInterval':'0384', 'TimeOut':'0FFF','Change':'01'}}},
+    # Power
+    '0702': {'Attributes': { '0000': {'DataType': '25', 'MinInterval':'FFFF', 'MaxInterval':'0000', 'TimeOut':'0000','Change':'00'},
+                             '0400': {'DataType': '2a', 'MinInterval':'0005', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'}}}
+    }
+
 
 def processConfigureReporting( self, NWKID=None ):
     '''
@@ -596,88 +687,10 @@ def processConfigureReporting( self, NWKID=None ):
 
     '''
 
-    ATTRIBUTESbyCLUSTERS = {
-            # 0xFFFF sable reporting-
-            # 0x0E10 - 3600s A hour
-            # 0x0708 - 30'
-            # 0x0384 - 15'
-            # 0x012C - 5'
-            # 0x003C - 1'
-        # Basic Cluster
-        '0000': {'Attributes': { '0000': {'DataType': '21', 'MinInterval':'012C', 'MaxInterval':'FFFE', 'TimeOut':'0000','Change':'01'},
-                                 '0032': {'DataType': '10', 'MinInterval':'0005', 'MaxInterval':'1C20', 'TimeOut':'0FFF','Change':'01'},
-                                 '0033': {'DataType': '10', 'MinInterval':'0005', 'MaxInterval':'1C20', 'TimeOut':'0FFF','Change':'01'}}},
-
-        # Power Cluster
-        '0001': {'Attributes': { '0000': {'DataType': '21', 'MinInterval':'012C', 'MaxInterval':'FFFE', 'TimeOut':'0000','Change':'01'},
-                                 '0020': {'DataType': '29', 'MinInterval':'0E10', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
-                                 '0021': {'DataType': '29', 'MinInterval':'0E10', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'}}},
-
-        # On/Off Cluster
-        '0006': {'Attributes': { '0000': {'DataType': '10', 'MinInterval':'0005', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'}}},
-        #'0006': {'Attributes': { '0000': {'DataType': '10', 'MinInterval':'0003', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'00'}}},
-
-        # Level Control Cluster
-        '0008': {'Attributes': { '0000': {'DataType': '20', 'MinInterval':'0005', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'05'}}},
-        #'0008': {'Attributes': { '0000': {'DataType': '20', 'MinInterval':'0003', 'MaxInterval':'0000', 'TimeOut':'0FFF','Change':'00'}}},
-
-        # Windows Covering
-        '0102': {'Attributes': { '0000': {'DataType': '30', 'MinInterval':'0005', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'05'},
-                                 '0003': {'DataType': '21', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
-                                 '0004': {'DataType': '21', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
-                                 '0008': {'DataType': '20', 'MinInterval':'0001', 'MaxInterval':'0384', 'TimeOut':'0FFF','Change':'01'},
-                                 '0009': {'DataType': '20', 'MinInterval':'0001', 'MaxInterval':'0384', 'TimeOut':'0FFF','Change':'01'},
-                                 '000A': {'DataType': '16', 'MinInterval':'0001', 'MaxInterval':'0384', 'TimeOut':'0FFF','Change':'01'},
-                                 '0011': {'DataType': '21', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
-                                 '0013': {'DataType': '21', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
-                                 '0017': {'DataType': '16', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'}}},
-        # Binary Input 
-        #'000f': {'Attributes': { '0055': {'DataType': '39', 'MinInterval':'000A', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'}}},
-        # Thermostat
-        '0201': {'Attributes': { '0000': {'DataType': '29', 'MinInterval':'012C', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'},
-                                 '0008': {'DataType': '29', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
-                                 '0011': {'DataType': '29', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
-                                 '0012': {'DataType': '29', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
-                                 '0014': {'DataType': '29', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
-                                 '001B': {'DataType': '30', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
-                                 '001C': {'DataType': '30', 'MinInterval':'012C', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'}}},
-        # Colour Control
-        '0300': {'Attributes': { '0007': {'DataType': '21', 'MinInterval':'0001', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'}, # Color Temp
-                                 #'0000': {'DataType': '20', 'MinInterval':'0384', 'MaxInterval':'0E10', 'TimeOut':'0FFF','Change':'01'},
-                                 #'0001': {'DataType': '20', 'MinInterval':'0001', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'}, 
-                                 '0003': {'DataType': '21', 'MinInterval':'0001', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'}, # Color X
-                                 '0004': {'DataType': '21', 'MinInterval':'0001', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'}, # Color Y
-                                 '0008': {'DataType': '30', 'MinInterval':'0001', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'}}}, # Color Mode
-        # Illuminance Measurement
-        '0400': {'Attributes': { '0000': {'DataType': '21', 'MinInterval':'0005', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'0F'}}},
-        # Temperature
-        '0402': {'Attributes': { '0000': {'DataType': '29', 'MinInterval':'000A', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'}}},
-        # Pression Atmo
-        '0403': {'Attributes': { '0000': {'DataType': '20', 'MinInterval':'003C', 'MaxInterval':'0384', 'TimeOut':'0FFF','Change':'01'},
-                                 '0010': {'DataType': '29', 'MinInterval':'003C', 'MaxInterval':'0384', 'TimeOut':'0FFF','Change':'01'}}},
-        # Humidity
-        '0405': {'Attributes': { '0000': {'DataType': '21', 'MinInterval':'003C', 'MaxInterval':'0384', 'TimeOut':'0FFF','Change':'01'}}},
-        # Occupancy Sensing
-        '0406': {'Attributes': { '0030': {'DataType': '20', 'MinInterval':'0005', 'MaxInterval':'1C20', 'TimeOut':'0FFF','Change':'01'},
-                                 '0000': {'DataType': '18', 'MinInterval':'0001', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'}}},
-
-        #'0406': {'Attributes': { '0000': {'DataType': '18', 'MinInterval':'0001', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'FF'},
-        #                         '0030': {'DataType': '20', 'MinInterval':'0005', 'MaxInterval':'1C20', 'TimeOut':'0FFF','Change':'01'}}},
-
-        # IAS ZOne
-        '0500': {'Attributes': { '0000': {'DataType': '30', 'MinInterval':'003C', 'MaxInterval':'0384', 'TimeOut':'0FFF','Change':'01'},
-                                 '0001': {'DataType': '31', 'MinInterval':'003C', 'MaxInterval':'0384', 'TimeOut':'0FFF','Change':'01'},
-                                 '0002': {'DataType': '19', 'MinInterval':'003C', 'MaxInterval':'0384', 'TimeOut':'0FFF','Change':'01'}}},
-        # Power
-        '0702': {'Attributes': { '0000': {'DataType': '25', 'MinInterval':'FFFF', 'MaxInterval':'0000', 'TimeOut':'0000','Change':'00'},
-                                 '0400': {'DataType': '2a', 'MinInterval':'0005', 'MaxInterval':'012C', 'TimeOut':'0FFF','Change':'01'}}}
-        }
-
     now = int(time())
     if NWKID is None :
-        if self.busy or len(self.ZigateComm._normalQueue) > 2:
-            Domoticz.Debug("configureReporting - skip configureReporting for now ... system too busy (%s/%s) for %s"
-                  %(self.busy, len(self.ZigateComm._normalQueue), NWKID))
+        if self.busy:
+            Domoticz.Debug("configureReporting - skip configureReporting for now ... system too busy")
             return # Will do at the next round
         target = self.ListOfDevices
         clusterlist = None
@@ -689,16 +702,11 @@ def processConfigureReporting( self, NWKID=None ):
         # Let's check that we can do a Configure Reporting. Only during the pairing process (NWKID is provided) or we are on the Main Power
         Domoticz.Debug("configurereporting - processing %s" %key)
         if key == '0000': continue
+        if NWKID is None and not ( self.warmup.ready( key ) and self.ZigateComm.breaker.allow( key )):
+            continue
         #if NWKID is None and 'PowerSource' in self.ListOfDevices[key]:
         #    if self.ListOfDevices[key]['PowerSource'] != 'Main': continue
 
-        #if 'Manufacturer' in self.ListOfDevices[key]:
-        #    manufacturer = self.ListOfDevices[key]['Manufacturer']
-        #    manufacturer_spec = "01"
-        manufacturer = "0000"
-        manufacturer_spec = "00"
-        direction = "00"
-        addr_mode = "02"
 
         for Ep in self.ListOfDevices[key]['Ep']:
             #if NWKID is None:
@@ -747,39 +755,72 @@ def processConfigureReporting( self, NWKID=None ):
                 if  self.ListOfDevices[key]['ConfigureReporting']['TimeStamps'][_idx] != 0:
                      #if now <= ( self.ListOfDevices[key]['ConfigureReporting']['TimeStamps'][_idx] + (24 * 3600)):  # Do only every day
                      # Basically , we will do configure reporting only when we have reset the ConfigureReporting data structuure
+                     if cluster in ATTRIBUTESbyCLUSTERS:
+                         # Configured before a restart, let the ReportingMonitor know what to expect
+                         self.reportingMonitor.configured( key, Ep, cluster, { attr: int( ATTRIBUTESbyCLUSTERS[cluster]['Attributes'][attr]['MaxInterval'], 16)
+                                 for attr in ATTRIBUTESbyCLUSTERS[cluster]['Attributes'] } )
                      continue
 
                 if cluster in ATTRIBUTESbyCLUSTERS:
-                    if NWKID is None and (self.busy or len(self.ZigateComm._normalQueue) > 2):
-                        Domoticz.Debug("configureReporting - skip configureReporting for now ... system too busy (%s/%s) for %s"
-                            %(self.busy, len(self.ZigateComm._normalQueue), key))
+                    if NWKID is None and (self.busy or not self.ZigateComm.admission.admit( 'ConfigureReporting', 2 )):
+                        Domoticz.Debug("configureReporting - skip configureReporting for now ... system too busy (%s) or no airtime for %s"
+                            %(self.busy, key))
                         return # Will do at the next round
 
                     if self.pluginconf.allowReBindingClusters:
-                        del self.ListOfDevices[key]['Bind']
+                        self.ListOfDevices[key].pop( 'Bind', None )
                         bindDevice( self, self.ListOfDevices[key]['IEEE'], Ep, cluster )
 
                     self.ListOfDevices[key]['ConfigureReporting']['TimeStamps'][_idx] = int(time())
+                    configureReportingAttributes( self, key, Ep, cluster, list( ATTRIBUTESbyCLUSTERS[cluster]['Attributes'] ))
+
+def configureReportingAttributes( self, key, Ep, cluster, attributes ):
+    '''
+    Send a Configure Reporting ( 0x0120 ) for these Attributes of the cluster, with their ATTRIBUTESbyCLUSTERS settings
+    '''
+
+    #if 'Manufacturer' in self.ListOfDevices[key]:
+    #    manufacturer = self.ListOfDevices[key]['Manufacturer']
+    #    manufacturer_spec = "01"
+    manufacturer = "0000"
+    manufacturer_spec = "00"
+    direction = "00"
+    addr_mode = "02"
+
+    attrList = ''
+    attrLen = 0
+    maxIntervals = {}
+    for attr in attributes:
+        attrdirection = "00"
+        attrType = ATTRIBUTESbyCLUSTERS[cluster]['Attributes'][attr]['DataType']
+        minInter = ATTRIBUTESbyCLUSTERS[cluster]['Attributes'][attr]['MinInterval']
+        maxInter = ATTRIBUTESbyCLUSTERS[cluster]['Attributes'][attr]['MaxInterval']
+        timeOut = ATTRIBUTESbyCLUSTERS[cluster]['Attributes'][attr]['TimeOut']
+        chgFlag = ATTRIBUTESbyCLUSTERS[cluster]['Attributes'][attr]['Change']
+
+        attrList += attrdirection + attrType + attr + minInter + maxInter + timeOut + chgFlag
+        attrLen += 1
+        maxIntervals[attr] = int(maxInter, 16)
+
+    datas =   addr_mode + key + "01" + Ep + cluster + direction + manufacturer_spec + manufacturer 
+    datas +=  "%02x" %(attrLen) + attrList
+    Domoticz.Debug("configureReporting for [%s] - cluster: %s on Attribute: %s >%s< " %(key, cluster, attributes, datas) )
+    sendZigateCmd(self, "0120", datas )
+    self.reportingMonitor.configured( key, Ep, cluster, maxIntervals, sent=True )
+
+def processSilentReporting( self ):
+    '''
+    Bind and Configure Reporting again the Attributes which stopped reporting
+    '''
 
-                    attrDisp = []   # Used only for printing purposes
-                    attrList = ''
-                    attrLen = 0
-                    for attr in ATTRIBUTESbyCLUSTERS[cluster]['Attributes']:
-                        attrdirection = "00"
-                        attrType = ATTRIBUTESbyCLUSTERS[cluster]['Attributes'][attr]['DataType']
-                        minInter = ATTRIBUTESbyCLUSTERS[cluster]['Attributes'][attr]['MinInterval']
-                        maxInter = ATTRIBUTESbyCLUSTERS[cluster]['Attributes'][attr]['MaxInterval']
-                        timeOut = ATTRIBUTESbyCLUSTERS[cluster]['Attributes'][attr]['TimeOut']
-                        chgFlag = ATTRIBUTESbyCLUSTERS[cluster]['Attributes'][attr]['Change']
-
-                        attrList += attrdirection + attrType + attr + minInter + maxInter + timeOut + chgFlag
-                        attrLen += 1
-                        attrDisp.append(attr)
-
-                    datas =   addr_mode + key + "01" + Ep + cluster + direction + manufacturer_spec + manufacturer 
-                    datas +=  "%02x" %(attrLen) + attrList
-                    Domoticz.Debug("configureReporting for [%s] - cluster: %s on Attribute: %s >%s< " %(key, cluster, attrDisp, datas) )
-                    sendZigateCmd(self, "0120", datas )
+    for key, Ep, cluster, attributes in self.reportingMonitor.overdue( skip=self.ZigateComm.breaker.openCircuits(),
+            admit=lambda: self.ZigateComm.admission.admit( 'Reporting', 2 )):
+        if 'IEEE' not in self.ListOfDevices[key] or cluster not in ATTRIBUTESbyCLUSTERS:
+            continue
+        if 'Bind' in self.ListOfDevices[key] and cluster in self.ListOfDevices[key]['Bind']:
+            del self.ListOfDevices[key]['Bind'][cluster]
+        bindDevice( self, self.ListOfDevices[key]['IEEE'], Ep, cluster )
+        configureReportingAttributes( self, key, Ep, cluster, attributes )
 
 def bindDevice( self, ieee, ep, cluster, destaddr=None, destep="01"):
     '''
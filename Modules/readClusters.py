@@ -273,7 +273,9 @@ def Cluster0702( self, Devices, MsgSQN, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgA
         Domoticz.Debug("Cluster0702 - 0x0400 Instant demand %s" %(value))
         value = round(value/10, 3)
         self.ListOfDevices[MsgSrcAddr]['Ep'][MsgSrcEp][MsgClusterId] = str(value)
-        MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId,str(value))
+        value = self.downsampler.accept( MsgSrcAddr, MsgSrcEp, MsgClusterId, value )
+        if value is not None:
+            MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId,str(value))
 
     else:
         Domoticz.Log("ReadCluster - 0x0702 - NOT IMPLEMENTED YET - MsgAttrID = " +str(MsgAttrID) + " value = " + str(MsgClusterData) )
@@ -377,7 +379,9 @@ def Cluster000c( self, Devices, MsgSQN, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgA
                 if ep == MsgSrcEp:
                     Domoticz.Debug("ReadCluster - ClusterId=000c - MsgAttrID=0055 - reception Conso Prise Xiaomi: " + str(value) )
                     self.ListOfDevices[MsgSrcAddr]['Ep'][MsgSrcEp][MsgClusterId]=str(value)
-                    MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, '0702',str(value))   # For to Power Cluster
+                    value = self.downsampler.accept( MsgSrcAddr, MsgSrcEp, MsgClusterId, value )
+                    if value is not None:
+                        MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, '0702',str(value))   # For to Power Cluster
                     break      # We just need to send once
         else:
             Domoticz.Log("ReadCluster 000c - received unknown value - MsgAttrID: %s, MsgAttType: %s, MsgAttSize: %s, MsgClusterData: %s" \
@@ -417,6 +421,8 @@ def Cluster0008( self, Devices, MsgSQN, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgA
         Domoticz.Debug("ReadCluster - ClusterId=0008 - Level Control: " + str(MsgClusterData) )
         self.ListOfDevices[MsgSrcAddr]['Ep'][MsgSrcEp][MsgClusterId] = MsgClusterData
         MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgClusterData)
+        if self.groupmgt:
+            self.groupmgt.memberStateChanged( MsgSrcAddr, MsgSrcEp )
     elif MsgAttrID == 'f000':
         Domoticz.Debug("ReadCluster - ClusterId=0008 - Attribute f000: " + str(MsgClusterData) )
 
@@ -438,6 +444,8 @@ def Cluster0006( self, Devices, MsgSQN, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgA
     if MsgAttrID=="0000" or MsgAttrID=="8000":
         MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgClusterData)
         self.ListOfDevices[MsgSrcAddr]['Ep'][MsgSrcEp][MsgClusterId]=MsgClusterData
+        if self.groupmgt:
+            self.groupmgt.memberStateChanged( MsgSrcAddr, MsgSrcEp )
         Domoticz.Debug("ReadCluster - ClusterId=0006 - reception General: On/Off: " + str(MsgClusterData) )
 
     elif MsgAttrID == "f000" and MsgAttType == "0023" and MsgAttSize == "0004":
@@ -736,7 +744,7 @@ def Cluster0000( self, Devices, MsgSQN, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgA
                             return
 
                 if 'Model' in self.ListOfDevices[MsgSrcAddr]:
-                    if self.ListOfDevices[MsgSrcAddr]['Model'] == modelName and self.ListOfDevices[MsgSrcAddr]['Model'] in self.DeviceConf:
+                    if self.ListOfDevices[MsgSrcAddr]['Model'] == modelName and self.DeviceConfIndex.isKnown( modelName ):
                         Domoticz.Log("ReadCluster - %s / %s - no action" %(MsgClusterId, MsgAttrID))
                         return
                 else:
@@ -745,38 +753,41 @@ def Cluster0000( self, Devices, MsgSQN, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgA
                 if self.ListOfDevices[MsgSrcAddr]['Model'] == '' or self.ListOfDevices[MsgSrcAddr]['Model'] == {}:
                     self.ListOfDevices[MsgSrcAddr]['Model'] = modelName
                 else:
-                    if self.ListOfDevices[MsgSrcAddr]['Model'] in self.DeviceConf:  
+                    if self.DeviceConfIndex.isKnown( self.ListOfDevices[MsgSrcAddr]['Model'] ):
                         modelName = self.ListOfDevices[MsgSrcAddr]['Model']
-                    elif modelName in self.DeviceConf:
+                    elif self.DeviceConfIndex.isKnown( modelName ):
                         self.ListOfDevices[MsgSrcAddr]['Model'] = modelName
 
                 # Let's see if this model is known in DeviceConf. If so then we will retreive already the Eps
-                if self.ListOfDevices[MsgSrcAddr]['Model'] in self.DeviceConf:                 # If the model exist in DeviceConf.txt
+                modelConf = self.DeviceConfIndex.getModelConf( self.ListOfDevices[MsgSrcAddr]['Model'] )
+                if modelConf is not None:                                                      # If the model exist in DeviceConf.txt
                     modelName = self.ListOfDevices[MsgSrcAddr]['Model']
-                    Domoticz.Debug("Extract all info from Model : %s" %self.DeviceConf[modelName])
-                    if 'Type' in self.DeviceConf[modelName]:                                   # If type exist at top level : copy it
+                    Domoticz.Debug("Extract all info from Model : %s" %modelConf)
+                    if modelConf['HasType']:                                                   # If type exist at top level : copy it
                         self.ListOfDevices[MsgSrcAddr]['ConfigSource'] ='DeviceConf'
-                        self.ListOfDevices[MsgSrcAddr]['Type']=self.DeviceConf[modelName]['Type']
+                        self.ListOfDevices[MsgSrcAddr]['Type'] = modelConf['Type']
                         if 'Ep' in self.ListOfDevices[MsgSrcAddr]:
                             Domoticz.Debug("Removing existing received Ep")
                             del self.ListOfDevices[MsgSrcAddr]['Ep']                           # It has been prepopulated by some 0x8043 message, let's remove them.
                             self.ListOfDevices[MsgSrcAddr]['Ep'] = {}                          # It has been prepopulated by some 0x8043 message, let's remove them.
 
-                    for Ep in self.DeviceConf[modelName]['Ep']:                                # For each Ep in DeviceConf.txt
+                    for Ep in modelConf['EpList']:                                             # For each Ep in DeviceConf.txt
                         if Ep not in self.ListOfDevices[MsgSrcAddr]['Ep']:                     # If this EP doesn't exist in database
-                            self.ListOfDevices[MsgSrcAddr]['Ep'][Ep]={}                        # create it.
-                        for cluster in self.DeviceConf[modelName]['Ep'][Ep]:                   # For each cluster discribe in DeviceConf.txt
+                            self.ListOfDevices[MsgSrcAddr]['Ep'][Ep] = {}                      # create it.
+                        for cluster in modelConf['Ep'][Ep]['Clusters']:                        # For each cluster discribe in DeviceConf.txt
                             if cluster not in self.ListOfDevices[MsgSrcAddr]['Ep'][Ep]:        # If this cluster doesn't exist in database
-                                self.ListOfDevices[MsgSrcAddr]['Ep'][Ep][cluster]={}           # create it.
-                        if 'Type' in self.DeviceConf[modelName]['Ep'][Ep]:                     # If type exist at EP level : copy it
-                            self.ListOfDevices[MsgSrcAddr]['Ep'][Ep]['Type']=self.DeviceConf[modelName]['Ep'][Ep]['Type']
-                        if 'ColorMode' in self.DeviceConf[modelName]['Ep'][Ep]:
+                                self.ListOfDevices[MsgSrcAddr]['Ep'][Ep][cluster] = {}         # create it.
+                        if modelConf['Ep'][Ep]['Type'] is not None:                            # If type exist at EP level : copy it
+                            self.ListOfDevices[MsgSrcAddr]['Ep'][Ep]['Type'] = modelConf['Ep'][Ep]['Type']
+                        if modelConf['Ep'][Ep]['ColorMode'] is not None:
                             if 'ColorInfos' not in self.ListOfDevices[MsgSrcAddr]:
                                 self.ListOfDevices[MsgSrcAddr]['ColorInfos'] ={}
-                            if 'ColorMode' in  self.DeviceConf[modelName]['Ep'][Ep]:
-                                self.ListOfDevices[MsgSrcAddr]['ColorInfos']['ColorMode'] = int(self.DeviceConf[modelName]['Ep'][Ep]['ColorMode'])
+                            self.ListOfDevices[MsgSrcAddr]['ColorInfos']['ColorMode'] = modelConf['Ep'][Ep]['ColorMode']
                     Domoticz.Debug("Result based on DeviceConf is: %s" %str(self.ListOfDevices[MsgSrcAddr]))
 
+                elif self.deviceTemplates and self.deviceTemplates.applyTemplate( MsgSrcAddr ):
+                    Domoticz.Debug("Result based on learned template is: %s" %str(self.ListOfDevices[MsgSrcAddr]))
+
                 if self.pluginconf.allowStoreDiscoveryFrames and MsgSrcAddr in self.DiscoveryDevices:
                     self.DiscoveryDevices[MsgSrcAddr]['Model'] = modelName
 
@@ -880,6 +891,9 @@ def Cluster0000( self, Devices, MsgSQN, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgA
             MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, '0008',sLevel)
             self.ListOfDevices[MsgSrcAddr]['Ep'][MsgSrcEp]['0008'] = sLevel
 
+        if ( sOnOff != '' or sOnOff2 != '' or sLevel != '' ) and self.groupmgt:
+            self.groupmgt.memberStateChanged( MsgSrcAddr, MsgSrcEp )
+
         if stag10 != '':
             # f400 --
             # 4602 --
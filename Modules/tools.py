@@ -369,6 +369,9 @@ def updSQN( self, key, newSQN) :
              newSQN == {} or newSQN == '' or newSQN is None:
         return
 
+    # A frame from the device, it is reachable
+    self.ZigateComm.deviceHeard( key )
+
     # For now, we are simply updating the SQN. When ready we will be able to implement a cross-check in SQN sequence
     Domoticz.Debug("Device : " + key + " MacCapa : " + self.ListOfDevices[key]['MacCapa'] + " updating SQN to " + str(newSQN) )
 
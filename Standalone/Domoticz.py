@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+"""
+Module Domoticz ( standalone runtime )
+
+Description: Substitute of the Domoticz Python Plugin framework API, used when the plugin core is hosted by
+Standalone/zigated.py instead of Domoticz. It is only on the import path of the standalone runtime.
+
+    - Log, Status, Error, Debug, Debugging, Heartbeat are mapped on the Python logging
+    - Device and Devices keep the widgets in memory. Each Create/Update/Delete is forwarded to the Mirror
+      installed by the runtime ( JSON file, and optionally a running Domoticz through its JSON API )
+    - Connection is an asyncio stream ( TCP/IP, or Serial through termios ) which calls back the plugin
+      onConnect, onMessage and onDisconnect, exactly like Domoticz does from its plugin thread
+"""
+
+import asyncio
+import errno
+import logging
+import os
+import termios
+import tty
+
+from time import strftime, localtime
+
+LOGGER = logging.getLogger('zigated')
+
+Devices = {}                # Unit -> Device, the Devices dictionary of the plugin
+Runtime = None              # Set by the runtime: provides loop, plugin, mirror and setHeartbeat()
+
+_debugging = 0
+
+
+# Logging
+def Log( message ):
+    LOGGER.info( message )
+
+def Status( message ):
+    LOGGER.warning( message )
+
+def Error( message ):
+    LOGGER.error( message )
+
+def Debug( message ):
+    if _debugging:
+        LOGGER.debug( message )
+
+def Debugging( mode ):
+    global _debugging
+    _debugging = int(mode)
+    LOGGER.setLevel( logging.DEBUG if _debugging else logging.INFO )
+
+def Heartbeat( interval ):
+    if Runtime:
+        Runtime.setHeartbeat( interval )
+
+
+# Widgets
+class Device:
+
+    _lastID = 0
+
+    def __init__( self, Name='', Unit=0, DeviceID='', TypeName='', Type=0, Subtype=0, Switchtype=0, Image=0,
+            Options=None, Used=0, Description='' ):
+
+        self.ID = -1
+        self.Name = Name
+        self.Unit = Unit
+        self.DeviceID = DeviceID
+        self.TypeName = TypeName
+        self.Type = Type
+        self.SubType = Subtype
+        self.SwitchType = Switchtype
+        self.Image = Image
+        self.Options = Options if Options is not None else {}
+        self.Used = Used
+        self.Description = Description
+        self.nValue = 0
+        self.sValue = ''
+        self.LastLevel = 0
+        self.Color = ''
+        self.SignalLevel = 12
+        self.BatteryLevel = 255
+        self.TimedOut = 0
+        self.LastUpdate = strftime( "%Y-%m-%d %H:%M:%S", localtime() )
+
+    def __str__( self ):
+        return "Unit: %s, ID: %s, Name: '%s', DeviceID: '%s', nValue: %s, sValue: '%s'" \
+                %(self.Unit, self.ID, self.Name, self.DeviceID, self.nValue, self.sValue)
+
+    def Create( self ):
+
+        if self.Unit in Devices or not 0 < self.Unit < 256:
+            Error("Device creation failed, Unit %s not available" %self.Unit)
+            return
+        if self.ID == -1:
+            Device._lastID += 1
+            self.ID = Device._lastID
+        Devices[ self.Unit ] = self
+        if Runtime and Runtime.mirror:
+            Runtime.mirror.created( self )
+
+    def Update( self, nValue=None, sValue=None, Image=None, SignalLevel=None, BatteryLevel=None, Options=None,
+            TimedOut=None, Name=None, TypeName=None, Type=None, Subtype=None, Switchtype=None, Used=None,
+            Description=None, Color=None, SuppressTriggers=False ):
+
+        if nValue is not None:
+            self.nValue = nValue
+            if nValue > 1:
+                self.LastLevel = nValue
+        if sValue is not None:
+            self.sValue = sValue
+            if sValue.isdigit():
+                self.LastLevel = int(sValue)
+        for attribute, value in ( ('Image', Image), ('SignalLevel', SignalLevel), ('BatteryLevel', BatteryLevel),
+                ('Options', Options), ('TimedOut', TimedOut), ('Name', Name), ('TypeName', TypeName), ('Type', Type),
+                ('SubType', Subtype), ('SwitchType', Switchtype), ('Used', Used), ('Description', Description),
+                ('Color', Color) ):
+            if value is not None:
+                setattr( self, attribute, value )
+        self.LastUpdate = strftime( "%Y-%m-%d %H:%M:%S", localtime() )
+        if Runtime and Runtime.mirror:
+            Runtime.mirror.updated( self )
+
+    def Touch( self ):
+
+        self.LastUpdate = strftime( "%Y-%m-%d %H:%M:%S", localtime() )
+
+    def Delete( self ):
+
+        if Devices.get( self.Unit ) is self:
+            del Devices[ self.Unit ]
+        if Runtime and Runtime.mirror:
+            Runtime.mirror.deleted( self )
+
+
+# Communication
+class Connection:
+    """
+    Stream connection with the same interface as Domoticz.Connection ( Protocol None only ).
+    Transport "Serial": Address is the tty ( or the pty of a simulator ), Baud the speed.
+    Transport "TCP/IP": Address and Port of the Zigate Wifi ( or of a simulator ).
+    """
+
+    def __init__( self, Name, Transport, Protocol="None", Address=None, Port=None, Baud=115200 ):
+
+        self.Name = Name
+        self.Transport = Transport
+        self.Protocol = Protocol
+        self.Address = Address
+        self.Port = Port
+        self.Baud = Baud
+        self._reader = None
+        self._writer = None
+        self._readTask = None
+        self._fd = None
+        self._output = bytearray()  # Serial bytes not written yet, in order
+        self._connected = False
+        self._connecting = False
+
+    def __str__( self ):
+        return "Name: '%s', Transport: '%s', Address: '%s', Port: '%s', Connected: %s" \
+                %(self.Name, self.Transport, self.Address, self.Port, self._connected)
+
+    def Connected( self ):
+        return self._connected
+
+    def Connecting( self ):
+        return self._connecting
+
+    def Connect( self ):
+
+        if self._connected or self._connecting:
+            return
+        self._connecting = True
+        Runtime.loop.create_task( self._connect() )
+
+    async def _connect( self ):
+
+        try:
+            if self.Transport == "Serial":
+                self._openSerial()
+            else:
+                self._reader, self._writer = await asyncio.open_connection( self.Address, int(self.Port) )
+                self._readTask = Runtime.loop.create_task( self._readStream() )
+        except (OSError, ValueError, termios.error) as e:
+            self._connecting = False
+            Runtime.callback( 'onConnect', self, 1, str(e) )
+            return
+        self._connecting = False
+        self._connected = True
+        Runtime.callback( 'onConnect', self, 0, "Connected" )
+
+    def _openSerial( self ):
+
+        baud = getattr( termios, "B%s" %self.Baud )
+        fd = os.open( self.Address, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK )
+        try:
+            tty.setraw( fd )
+            attributes = termios.tcgetattr( fd )
+            attributes[4] = attributes[5] = baud
+            termios.tcsetattr( fd, termios.TCSANOW, attributes )
+        except termios.error:
+            os.close( fd )
+            raise
+        self._fd = fd
+        Runtime.loop.add_reader( fd, self._readSerial )
+
+    def _readSerial( self ):
+
+        try:
+            data = os.read( self._fd, 4096 )
+        except OSError as e:
+            if e.errno in ( errno.EAGAIN, errno.EWOULDBLOCK ):
+                return
+            data = b''
+        if data:
+            Runtime.callback( 'onMessage', self, data )
+        else:
+            self._lost()
+
+    async def _readStream( self ):
+
+        while True:
+            try:
+                data = await self._reader.read( 4096 )
+            except OSError:
+                data = b''
+            if not data:
+                break
+            Runtime.callback( 'onMessage', self, data )
+        self._readTask = None
+        if self._connected:
+            self._lost()
+
+    def _lost( self ):
+
+        self._close()
+        Runtime.callback( 'onDisconnect', self )
+
+    def _close( self ):
+
+        self._connected = False
+        if self._fd is not None:
+            Runtime.loop.remove_reader( self._fd )
+            if self._output:
+                Runtime.loop.remove_writer( self._fd )
+                self._output = bytearray()
+            os.close( self._fd )
+            self._fd = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._readTask is not None:
+            self._readTask.cancel()
+            self._readTask = None
+
+    def Send( self, Message, Delay=0 ):
+
+        if isinstance( Message, str ):
+            Message = Message.encode()
+        if Delay:
+            Runtime.loop.call_later( Delay, self._write, Message )
+        else:
+            self._write( Message )
+
+    def _write( self, Message ):
+
+        if not self._connected:
+            Error("Connection %s - Send while not connected" %self.Name)
+            return
+        if self._writer is not None:
+            self._writer.write( Message )
+            return
+        if self._output:
+            # The previous frames are not written yet, keep the order
+            self._output += Message
+            return
+        self._output += Message
+        self._drainSerial()
+
+    def _drainSerial( self ):
+        ' write the pending bytes, wait for the serial port to be writable for the rest '
+
+        try:
+            while self._output:
+                written = os.write( self._fd, self._output )
+                del self._output[:written]
+        except BlockingIOError:
+            Runtime.loop.add_writer( self._fd, self._drainSerial )
+            return
+        except OSError as e:
+            Error("Connection %s - write failed: %s" %(self.Name, e))
+            self._lost()
+            return
+        Runtime.loop.remove_writer( self._fd )
+
+    def Disconnect( self ):
+
+        if self._connected:
+            self._close()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+"""
+zigated - Standalone runtime of the Zigate plugin
+
+Description: Host the plugin core ( ZigateTransport, the decoders, the heartbeat logic ) in an asyncio daemon,
+outside of Domoticz. This is intended for profiling and load testing ( see Tools/ZigateSimulator.py ), and to
+run the plugin on a machine which is not the Domoticz server.
+
+    - The Zigate is reached through a TCP/IP or a Serial stream ( Standalone/Domoticz.py Connection )
+    - onHeartbeat is called by a timer at the interval requested by the plugin, and the Transport timeouts and
+      retransmits are checked every --tick ms instead of only on heartbeats and incoming frames
+    - The widgets are kept in memory and mirrored into a JSON file ( --devices ), and optionally into a running
+      Domoticz through its JSON API ( --domoticz ) for the widgets which already exist there for this HardwareID
+
+Usage:
+    python3 Standalone/zigated.py --tcp 192.168.1.10:9999 --hardware-id 5
+    python3 Standalone/zigated.py --serial /dev/ttyUSB0 --profile zigated.prof --duration 600
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import cProfile
+import importlib
+import json
+import logging
+import os
+import os.path
+import signal
+import sys
+import traceback
+import urllib.parse
+import urllib.request
+
+from time import time
+
+# The Domoticz substitute is next to this file, hence first on sys.path. The plugin is in the parent directory
+HOME_FOLDER = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ))) + '/'
+sys.path.insert( 1, HOME_FOLDER )
+
+import Domoticz
+
+DEVICES_FILENAME = "Standalone-Devices-%02d.json"
+DEFAULT_TICK = 100              # ms, Transport timeouts and retransmits check
+MIRROR_FLUSH = 5                # sec, delay before writing the widgets file after a change
+DOMOTICZ_VERSION = "4.9700"     # Prevent the plugin from opening the Domoticz database
+
+DEVICE_ATTRIBUTES = ( 'ID', 'Name', 'Unit', 'DeviceID', 'TypeName', 'Type', 'SubType', 'SwitchType', 'Image',
+                      'Options', 'Used', 'Description', 'nValue', 'sValue', 'LastLevel', 'Color', 'LastUpdate' )
+
+
+class DeviceMirror:
+    """
+    Keep the widgets in a JSON file, so the Units are stable across restarts, and forward the changes to
+    Domoticz when an URL is provided.
+    """
+
+    def __init__( self, loop, filename, HardwareID, domoticzUrl=None ):
+
+        self.loop = loop
+        self.filename = filename
+        self.HardwareID = HardwareID
+        self.domoticzUrl = domoticzUrl
+        self.dirty = None           # Flush timer
+        self.idx = {}               # ( DeviceID, Unit ) -> Domoticz idx
+        self.executor = None
+        if self.domoticzUrl:
+            # One worker keeps the updates in order
+            self.executor = concurrent.futures.ThreadPoolExecutor( max_workers=1 )
+
+    def load( self ):
+
+        if not os.path.isfile( self.filename ):
+            return
+        with open( self.filename, 'rt') as handle:
+            widgets = json.load( handle )
+        for widget in widgets:
+            device = Domoticz.Device()
+            for attribute in DEVICE_ATTRIBUTES:
+                if attribute in widget:
+                    setattr( device, attribute, widget[attribute] )
+            Domoticz.Devices[ device.Unit ] = device
+            Domoticz.Device._lastID = max( Domoticz.Device._lastID, device.ID )
+        Domoticz.Log("DeviceMirror - %s widgets loaded from %s" %(len(Domoticz.Devices), self.filename))
+
+    def flush( self ):
+
+        if self.dirty:
+            self.dirty.cancel()
+            self.dirty = None
+        widgets = [ { attribute: getattr( Domoticz.Devices[unit], attribute ) for attribute in DEVICE_ATTRIBUTES }
+                for unit in sorted( Domoticz.Devices ) ]
+        with open( self.filename + '.tmp', 'wt') as handle:
+            json.dump( widgets, handle, indent=1 )
+        os.replace( self.filename + '.tmp', self.filename )
+
+    def _changed( self ):
+
+        if self.dirty is None:
+            self.dirty = self.loop.call_later( MIRROR_FLUSH, self.flush )
+
+    def _domoticz( self, params ):
+
+        url = self.domoticzUrl + '/json.htm?' + urllib.parse.urlencode( params )
+        with urllib.request.urlopen( url, timeout=10 ) as response:
+            return json.loads( response.read().decode('utf-8') )
+
+    def _loadIdx( self ):
+
+        result = self._domoticz( { 'type': 'devices', 'filter': 'all', 'used': 'all' } )
+        for widget in result.get( 'result', [] ):
+            if int( widget.get('HardwareID', -1) ) == self.HardwareID:
+                self.idx[ ( widget['ID'], int(widget['Unit']) ) ] = widget['idx']
+        return len(self.idx)
+
+    def _push( self, device, nValue, sValue ):
+
+        if not self.idx:
+            Domoticz.Log("DeviceMirror - %s widgets found in Domoticz for HardwareID %s" %(self._loadIdx(), self.HardwareID))
+        idx = self.idx.get( ( device.DeviceID, device.Unit ) )
+        if idx is None:
+            return
+        self._domoticz( { 'type': 'command', 'param': 'udevice', 'idx': idx, 'nvalue': nValue, 'svalue': sValue } )
+
+    def _pushed( self, future ):
+
+        if future.exception():
+            Domoticz.Error("DeviceMirror - Domoticz update failed: %s" %future.exception())
+
+    def created( self, device ):
+        self._changed()
+
+    def updated( self, device ):
+
+        self._changed()
+        if self.executor:
+            self.loop.run_in_executor( self.executor, self._push, device, device.nValue, device.sValue ).add_done_callback( self._pushed )
+
+    def deleted( self, device ):
+        self._changed()
+
+    def close( self ):
+
+        self.flush()
+        if self.executor:
+            self.executor.shutdown( wait=True )
+
+
+class Runtime:
+    """
+    Event loop hosting the plugin. All plugin callbacks are made from the loop thread, one at a time,
+    as Domoticz does from its plugin thread.
+    """
+
+    def __init__( self, loop, plugin, mirror, tick ):
+
+        self.loop = loop
+        self.plugin = plugin
+        self.mirror = mirror
+        self.tick = tick / 1000
+        self.heartbeat = 10         # Domoticz default, until the plugin calls Domoticz.Heartbeat()
+        self.heartbeatTimer = None
+        self.tickTimer = None
+        self.stopping = False
+        self.lateness = 0.0         # Worst heartbeat delay, in sec, due to a busy loop
+
+    def callback( self, name, *args ):
+
+        try:
+            getattr( self.plugin, name )( *args )
+        except Exception:
+            Domoticz.Error("%s failed:\n%s" %(name, traceback.format_exc()))
+
+    def setHeartbeat( self, interval ):
+
+        self.heartbeat = interval
+        if self.heartbeatTimer:
+            self.heartbeatTimer.cancel()
+            self._scheduleHeartbeat( self.loop.time() )
+
+    def _scheduleHeartbeat( self, last ):
+
+        self.heartbeatTimer = self.loop.call_at( last + self.heartbeat, self._onHeartbeat, last + self.heartbeat )
+
+    def _onHeartbeat( self, expected ):
+
+        self.lateness = max( self.lateness, self.loop.time() - expected )
+        self._scheduleHeartbeat( expected )
+        self.callback( 'onHeartbeat' )
+
+    def _onTick( self ):
+
+        self.tickTimer = self.loop.call_later( self.tick, self._onTick )
+        transport = getattr( self.plugin._plugin, 'ZigateComm', None )
+        if transport:
+            try:
+                transport.checkTOwaitFor()
+            except Exception:
+                transport._checkTO_flag = False
+                Domoticz.Error("checkTOwaitFor failed:\n%s" %traceback.format_exc())
+
+    def start( self ):
+
+        self.callback( 'onStart' )
+        self._scheduleHeartbeat( self.loop.time() )
+        self.tickTimer = self.loop.call_later( self.tick, self._onTick )
+
+    def stop( self ):
+
+        if self.stopping:
+            return
+        self.stopping = True
+        for timer in ( self.heartbeatTimer, self.tickTimer ):
+            if timer:
+                timer.cancel()
+        self.callback( 'onStop' )
+        transport = getattr( self.plugin._plugin, 'ZigateComm', None )
+        if transport and transport._connection:
+            transport._connection.Disconnect()
+        self.mirror.close()
+        Domoticz.Status("Heartbeat worst delay: %.3f s, CPU: %.2f s" %(self.lateness, sum( os.times()[0:2] )))
+        # Let the cancelled tasks complete before stopping
+        self.loop.call_soon( self.loop.stop )
+
+
+def parseArguments():
+
+    parser = argparse.ArgumentParser( description="Standalone runtime of the Zigate plugin" )
+    link = parser.add_mutually_exclusive_group( required=True )
+    link.add_argument( '--serial', help="Serial port of the Zigate ( or pty of the simulator )" )
+    link.add_argument( '--tcp', help="host:port of the Zigate Wifi ( or of the simulator )" )
+    parser.add_argument( '--hardware-id', type=int, default=99, help="HardwareID, selects the plugin files ( default 99 )" )
+    parser.add_argument( '--devices', help="Widgets file ( default Data/Standalone-Devices-<hardware-id>.json )" )
+    parser.add_argument( '--domoticz', help="Domoticz URL ( http://host:8080 ) to mirror the widget updates to" )
+    parser.add_argument( '--permit-join', default="0", help="Permit to join on start ( 0-255, default 0 )" )
+    parser.add_argument( '--tick', type=int, default=DEFAULT_TICK, help="Transport timeout check, in ms ( default %s )" %DEFAULT_TICK )
+    parser.add_argument( '--debug', default="0", help="Plugin debug mode, as the Mode6 parameter ( default 0 )" )
+    parser.add_argument( '--duration', type=float, help="Stop after this number of sec" )
+    parser.add_argument( '--profile', help="Write the cProfile statistics in this file" )
+    return parser.parse_args()
+
+
+def buildParameters( args ):
+
+    Parameters = { 'HomeFolder': HOME_FOLDER, 'HardwareID': args.hardware_id, 'Key': 'Zigate', 'Name': 'Zigate',
+            'Mode1': 'USB', 'Mode2': args.permit_join, 'Mode3': 'False', 'Mode4': 'False', 'Mode5': 'False',
+            'Mode6': args.debug, 'SerialPort': '', 'Address': '', 'Port': '',
+            'DomoticzVersion': DOMOTICZ_VERSION, 'DomoticzHash': 'standalone', 'DomoticzBuildTime': '',
+            'StartupFolder': HOME_FOLDER, 'UserDataFolder': HOME_FOLDER, 'WebRoot': HOME_FOLDER + 'www/', 'Database': '' }
+    if args.serial:
+        Parameters['SerialPort'] = args.serial
+    else:
+        Parameters['Mode1'] = 'Wifi'
+        Parameters['Address'], Parameters['Port'] = args.tcp.rsplit( ':', 1 )
+    return Parameters
+
+
+def main():
+
+    args = parseArguments()
+    logging.basicConfig( format="%(asctime)s.%(msecs)03d %(levelname)-7s %(message)s", datefmt="%Y-%m-%d %H:%M:%S",
+            level=logging.INFO )
+    Domoticz.Debugging( 0 )
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop( loop )
+
+    devicesFile = args.devices or HOME_FOLDER + 'Data/' + DEVICES_FILENAME %args.hardware_id
+    mirror = DeviceMirror( loop, devicesFile, args.hardware_id, args.domoticz )
+    mirror.load()
+
+    plugin = importlib.import_module( 'plugin' )
+    plugin.Parameters = buildParameters( args )
+    plugin.Devices = Domoticz.Devices
+    plugin.Images = {}
+
+    runtime = Runtime( loop, plugin, mirror, args.tick )
+    Domoticz.Runtime = runtime
+    for signum in ( signal.SIGINT, signal.SIGTERM ):
+        loop.add_signal_handler( signum, runtime.stop )
+    if args.duration:
+        loop.call_later( args.duration, runtime.stop )
+
+    profiler = None
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = time()
+    loop.call_soon( runtime.start )
+    try:
+        loop.run_forever()
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats( args.profile )
+            Domoticz.Status("Profile written to %s ( %.1f s )" %(args.profile, time() - start))
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
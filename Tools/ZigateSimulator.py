@@ -0,0 +1,923 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+"""
+ZigateSimulator - Zigate coordinator and virtual Zigbee network, for load and latency testing
+
+Description: Speak the Zigate serial protocol over a TCP socket ( like the Wifi Zigate ) or a pty ( like the USB
+Zigate ), and emulate a Coordinator plus N virtual devices:
+    - lumi.weather  Xiaomi Temperature/Humidity/Pressure sensor ( battery, End Device )
+    - LCT001        Hue bulb ( mains, Router, On/Off, Level, Groups )
+    - lumi.plug     Xiaomi plug ( mains, Router, On/Off, Power )
+
+The Coordinator answers each command with its 0x8000 status, then the targeted device answers after --latency,
+unless the frame is lost ( --loss ). Handled commands:
+    0009 0010 0014 0015 0049        Coordinator
+    0045 0043 0042                  Active Endpoints / Simple Descriptor / Node Descriptor ( interview )
+    0100 0120 0030 0140             Read Attribute / Configure Reporting / Bind / Attribute Discovery
+    0062                            Group Membership
+    00A1 00A2 00A4 00A5 00A6        Add / Remove / Store / Recall Scene, Scene Membership
+    004E                            Management LQI ( paginated Neighbour tables of a simulated mesh )
+    0092 0081                       On/Off, Move to Level ( followed by an attribute report )
+The On/Off, Move to Level and Scenes commands can be group-cast ( address mode 01 ): each member of the group reacts,
+and does not answer the Scenes commands.
+Any other command gets a 0x8000 Success.
+
+The devices announce themselves ( 0x004D ) after the first connection, unless --no-announce ( when the plugin
+already knows this network: the devices are the same for the same --seed and --devices ), then report their
+measurements every --report-interval sec. --rejoin makes devices rejoin the network ( new announcement ).
+
+Measurements, printed every --stats-interval sec and at the end:
+    - frames and bytes in both directions, lost frames
+    - reaction time of the plugin: 0x004D -> 0x0045, 0x8045 -> 0x0043 for the same device
+    - turnaround: time between the last frame completing a command and the next command, when the plugin had
+      commands waiting ( this is the plugin processing time per command under load )
+    - CPU of the simulator, and of the plugin when started with --exec
+
+Usage:
+    python3 Tools/ZigateSimulator.py --devices 500 --tcp 127.0.0.1:9999 --duration 600 \\
+        --exec "python3 Standalone/zigated.py --tcp {address} --hardware-id 90"
+    python3 Tools/ZigateSimulator.py --devices 50 --pty --link /tmp/zigate --loss 0.05 --latency 80
+"""
+
+import argparse
+import asyncio
+import os
+import pty
+import random
+import resource
+import shlex
+import signal
+import struct
+import subprocess
+import sys
+import tty
+
+from time import time
+
+FIRMWARE = "0003030f"           # Major version, Installer version
+EXT_PANID = "ebe2b8a2f6d9c84b"
+COORDINATOR_IEEE = "00158d0001c4ca20"
+LQI_PAGE = 3                    # Neighbour table entries per 0x804E
+TURNAROUND_WINDOW = 1.0         # sec, a command coming later than that was not waiting in the plugin queue
+
+# Device types of the LQI Neighbour tables
+COORDINATOR = 0
+ROUTER = 1
+END_DEVICE = 2
+
+# Relationship of the LQI Neighbour tables
+PARENT = 0
+CHILD = 1
+SIBLING = 2
+
+# ( Endpoint, Cluster, Attribute ) -> ( Data type, generator ). Generators are in VirtualDevice.value()
+PROFILES = {
+    'lumi.weather': {
+        'Share': 0.6, 'IEEE': '00158d00', 'MacCapa': '80', 'Type': END_DEVICE, 'Manufacturer': 'LUMI', 'ManufacturerCode': '115f',
+        'Endpoints': {
+            '01': { 'ProfileID': '0104', 'DeviceID': '5f01',
+                    'In': ( '0000', '0003', 'ffff', '0402', '0403', '0405' ), 'Out': ( '0000', '0004', 'ffff' ) } },
+        'Attributes': {
+            ( '01', '0402', '0000' ): ( '29', 'temperature' ),
+            ( '01', '0405', '0000' ): ( '21', 'humidity' ),
+            ( '01', '0403', '0000' ): ( '29', 'pressure' ) },
+        'Reports': ( ( '01', '0402', '0000' ), ( '01', '0405', '0000' ), ( '01', '0403', '0000' ) ),
+        'Groups': False },
+    'LCT001': {
+        'Share': 0.25, 'IEEE': '00178801', 'MacCapa': '8e', 'Type': ROUTER, 'Manufacturer': 'Philips', 'ManufacturerCode': '100b',
+        'Endpoints': {
+            '0b': { 'ProfileID': '0104', 'DeviceID': '0210',
+                    'In': ( '0000', '0003', '0004', '0005', '0006', '0008', '0300', '1000', 'fc01' ), 'Out': ( '0019', ) } },
+        'Attributes': {
+            ( '0b', '0006', '0000' ): ( '10', 'onoff' ),
+            ( '0b', '0008', '0000' ): ( '20', 'level' ) },
+        'Reports': (),
+        'Groups': True },
+    'lumi.plug': {
+        'Share': 0.15, 'IEEE': '00158d00', 'MacCapa': '8e', 'Type': ROUTER, 'Manufacturer': 'LUMI', 'ManufacturerCode': '115f',
+        'Endpoints': {
+            '01': { 'ProfileID': '0104', 'DeviceID': '0051',
+                    'In': ( '0000', '0004', '0003', '0006', '0010', '0005', '000a', '0001', '0002' ), 'Out': ( '0019', '000a' ) },
+            '02': { 'ProfileID': '0104', 'DeviceID': '0009', 'In': ( '000c', ), 'Out': ( '000c', '0004' ) } },
+        'Attributes': {
+            ( '01', '0006', '0000' ): ( '10', 'onoff' ),
+            ( '02', '000c', '0055' ): ( '39', 'power' ) },
+        'Reports': ( ( '02', '000c', '0055' ), ),
+        'Groups': True },
+    }
+
+
+# Zigate framing
+def encodeFrame( msgType, payload, rssi=0 ):
+    ' Build a Zigate frame: 0x01, escaped( type, length, checksum, data, rssi ), 0x03 '
+
+    data = bytes.fromhex( payload ) + bytes( ( rssi, ) )
+    raw = struct.pack( '>HH', msgType, len(data) )
+    checksum = 0
+    for byte in raw + data:
+        checksum ^= byte
+    raw += bytes( ( checksum, ) ) + data
+    frame = bytearray( b'\x01' )
+    for byte in raw:
+        if byte < 0x10:
+            frame += bytes( ( 0x02, byte ^ 0x10 ) )
+        else:
+            frame.append( byte )
+    frame.append( 0x03 )
+    return bytes( frame )
+
+
+class FrameDecoder:
+    ' Re-frame the byte stream sent by the plugin. Return ( command, data hex ) for each valid frame '
+
+    def __init__( self ):
+
+        self.buffer = bytearray()
+        self.errors = 0
+
+    def feed( self, data ):
+
+        self.buffer += data
+        frames = []
+        while True:
+            start = self.buffer.find( b'\x01' )
+            if start == -1:
+                self.buffer.clear()
+                break
+            end = self.buffer.find( b'\x03', start )
+            if end == -1:
+                del self.buffer[:start]
+                break
+            escaped = self.buffer[ start + 1:end ]
+            del self.buffer[:end + 1]
+
+            raw = bytearray()
+            iterator = iter( escaped )
+            for byte in iterator:
+                if byte == 0x02:
+                    byte = next( iterator, 0x10 ) ^ 0x10
+                raw.append( byte )
+            if len(raw) < 5:
+                self.errors += 1
+                continue
+            command, length = struct.unpack( '>HH', raw[0:4] )
+            checksum = 0
+            for idx, byte in enumerate( raw ):
+                if idx != 4:
+                    checksum ^= byte
+            if length != len(raw) - 5 or checksum != raw[4]:
+                self.errors += 1
+                continue
+            frames.append( ( command, raw[5:].hex() ) )
+        return frames
+
+
+def encodeValue( dataType, value ):
+
+    if dataType in ( '10', '20' ):
+        return "%02x" %( int(value) & 0xff )
+    if dataType in ( '21', '29' ):
+        return "%04x" %( int(value) & 0xffff )
+    if dataType == '39':
+        return struct.pack( '>f', value ).hex()
+    if dataType == '42':
+        return value.encode().hex()
+    raise ValueError( "unsupported data type %s" %dataType )
+
+
+class VirtualDevice:
+
+    def __init__( self, index, model, nwkid, rand ):
+
+        self.profile = PROFILES[ model ]
+        self.model = model
+        self.nwkid = nwkid
+        self.ieee = self.profile['IEEE'] + "%08x" %( index + 1 )
+        self.type = self.profile['Type']
+        self.rand = rand
+        self.sqn = rand.randrange( 256 )
+        self.announced = False
+        self.parent = None          # Parent in the mesh
+        self.neighbours = {}        # nwkid -> ( relationship, lqi )
+        self.groups = {}            # ep -> list of groups
+        self.scenes = {}            # ( ep, group, scene ) -> stored { 'onoff', 'level' }
+        self.nextReport = None
+        self.state = { 'temperature': rand.uniform( 17, 24 ), 'humidity': rand.uniform( 35, 60 ),
+                'pressure': rand.uniform( 990, 1030 ), 'onoff': 0, 'level': 254, 'power': 0.0 }
+
+    def nextSQN( self ):
+
+        self.sqn = ( self.sqn + 1 ) % 256
+        return "%02x" %self.sqn
+
+    def value( self, generator, drift ):
+
+        if drift:
+            if generator == 'temperature':
+                self.state[generator] += self.rand.uniform( -0.3, 0.3 )
+            elif generator == 'humidity':
+                self.state[generator] = min( 99, max( 5, self.state[generator] + self.rand.uniform( -1, 1 )))
+            elif generator == 'pressure':
+                self.state[generator] += self.rand.uniform( -0.5, 0.5 )
+            elif generator == 'power':
+                self.state[generator] = self.rand.uniform( 5, 2000 ) if self.state['onoff'] else 0.0
+        if generator == 'temperature':
+            return int( self.state[generator] * 100 )
+        if generator == 'humidity':
+            return int( self.state[generator] * 100 )
+        if generator == 'pressure':
+            return int( self.state[generator] )
+        return self.state[generator]
+
+    def attribute( self, ep, cluster, attribute, drift=False ):
+        ' Return ( data type, hex value ) or None if the attribute is not supported '
+
+        if cluster == '0000' and ep == sorted( self.profile['Endpoints'] )[0]:
+            if attribute == '0005':
+                return ( '42', encodeValue( '42', self.model ))
+            if attribute == '0004':
+                return ( '42', encodeValue( '42', self.profile['Manufacturer'] ))
+            if attribute == '0000':
+                return ( '20', '01' )
+            if attribute == '0007':
+                return ( '30', '01' if self.type == ROUTER else '03' )
+        key = ( ep, cluster, attribute )
+        if key not in self.profile['Attributes']:
+            return None
+        dataType, generator = self.profile['Attributes'][ key ]
+        return ( dataType, encodeValue( dataType, self.value( generator, drift )) )
+
+    def attributes( self, ep, cluster ):
+        ' Return the ( attribute, data type ) supported by the Ep/Cluster, for the Attribute Discovery '
+
+        result = []
+        if cluster == '0000' and ep == sorted( self.profile['Endpoints'] )[0]:
+            result += [ ( attribute, self.attribute( ep, cluster, attribute )[0] ) for attribute in ( '0000', '0004', '0005', '0007' ) ]
+        result += [ ( key[2], self.profile['Attributes'][key][0] ) for key in sorted( self.profile['Attributes'] )
+                if key[0] == ep and key[1] == cluster ]
+        return result
+
+
+class Statistics:
+
+    def __init__( self ):
+
+        self.start = time()
+        self.framesIn = {}          # command -> count
+        self.framesOut = {}         # msgType -> count
+        self.bytesIn = 0
+        self.bytesOut = 0
+        self.lost = 0
+        self.reaction = []          # sec
+        self.turnaround = []        # sec
+        self.cpuStart = resource.getrusage( resource.RUSAGE_SELF )
+
+    @staticmethod
+    def percentiles( values ):
+
+        if not values:
+            return "n/a"
+        values = sorted( values )
+        def _at( ratio ):
+            return values[ min( len(values) - 1, int( ratio * len(values) )) ] * 1000
+        return "n=%s p50=%.1fms p95=%.1fms p99=%.1fms max=%.1fms" %( len(values), _at( 0.5 ), _at( 0.95 ), _at( 0.99 ), values[-1] * 1000 )
+
+    @staticmethod
+    def cpu( usage, start=None ):
+
+        total = usage.ru_utime + usage.ru_stime
+        if start:
+            total -= start.ru_utime + start.ru_stime
+        return total
+
+    def report( self, child=None ):
+
+        elapsed = max( 0.001, time() - self.start )
+        lines = []
+        lines.append( "--- %.0f s" %elapsed )
+        lines.append( "frames in : %s ( %s bytes ) %s" %( sum( self.framesIn.values() ), self.bytesIn,
+                ' '.join( "%04x:%s" %( key, self.framesIn[key] ) for key in sorted( self.framesIn ))))
+        lines.append( "frames out: %s ( %s bytes, %.1f/s ) lost: %s" %( sum( self.framesOut.values() ), self.bytesOut,
+                sum( self.framesOut.values() ) / elapsed, self.lost ))
+        lines.append( "reaction  : %s" %self.percentiles( self.reaction ))
+        lines.append( "turnaround: %s" %self.percentiles( self.turnaround ))
+        cpu = self.cpu( resource.getrusage( resource.RUSAGE_SELF ), self.cpuStart )
+        lines.append( "simulator CPU: %.2f s ( %.1f %% )" %( cpu, 100 * cpu / elapsed ))
+        if child is not None:
+            lines.append( "plugin CPU: %.2f s ( %.1f %% )" %( child, 100 * child / elapsed ))
+        return '\n'.join( lines )
+
+
+class Simulator:
+
+    def __init__( self, args ):
+
+        self.args = args
+        self.rand = random.Random( args.seed )
+        self.loop = None
+        self.stats = Statistics()
+        self.decoder = FrameDecoder()
+        self.writer = None          # TCP client
+        self.ptyMaster = None
+        self.sqn = 0                # Coordinator SQN ( 0x8000 and the related responses )
+        self.permitJoin = 0
+        self.connected = False
+        self.announceStarted = False
+        self.lastCompletion = None  # Time of the last frame completing a command
+        self.pendingReaction = {}   # ( nwkid, command expected ) -> time
+        self.coordinatorNeighbours = {}
+        self.devices = {}           # nwkid -> VirtualDevice
+        self.ieee = {}              # ieee -> VirtualDevice
+        self._buildNetwork()
+
+    # Network
+    def _newNwkid( self ):
+
+        while True:
+            nwkid = "%04x" %self.rand.randrange( 0x0001, 0xfff7 )
+            if nwkid not in self.devices:
+                return nwkid
+
+    def _buildNetwork( self ):
+
+        models = list( PROFILES )
+        weights = [ PROFILES[model]['Share'] for model in models ]
+        for index in range( self.args.devices ):
+            model = self.rand.choices( models, weights )[0]
+            device = VirtualDevice( index, model, self._newNwkid(), self.rand )
+            self.devices[ device.nwkid ] = device
+            self.ieee[ device.ieee ] = device
+            device.announced = self.args.no_announce
+            if device.profile['Groups']:
+                for ep in device.profile['Endpoints']:
+                    if '0004' in device.profile['Endpoints'][ep]['In'] and self.args.groups:
+                        device.groups[ep] = [ "%04x" %( 0x0100 + self.rand.randrange( self.args.groups )) ]
+
+        # Mesh: a Router is attached to the Coordinator or to a previous Router, an End Device to any of them
+        routers = []
+        for nwkid in self.devices:
+            device = self.devices[nwkid]
+            if device.type == ROUTER:
+                candidates = routers[-8:] + [ '0000' ] * 2
+            else:
+                candidates = ( routers[-16:] or [] ) + [ '0000' ]
+            device.parent = self.rand.choice( candidates )
+            self._link( device.parent, nwkid, CHILD )
+            if device.type == ROUTER:
+                for sibling in self.rand.sample( routers, min( 2, len(routers) )):
+                    if sibling != device.parent:
+                        self._link( sibling, nwkid, SIBLING )
+                routers.append( nwkid )
+
+    def _neighbours( self, nwkid ):
+
+        if nwkid == '0000':
+            return self.coordinatorNeighbours
+        return self.devices[nwkid].neighbours
+
+    def _link( self, node, other, relationship ):
+
+        lqi = self.rand.randrange( 40, 256 )
+        self._neighbours( node )[other] = ( relationship, lqi )
+        reverse = { CHILD: PARENT, SIBLING: SIBLING }[ relationship ]
+        self._neighbours( other )[node] = ( reverse, lqi )
+
+    def _nodeType( self, nwkid ):
+
+        if nwkid == '0000':
+            return COORDINATOR
+        return self.devices[nwkid].type
+
+    def _ieeeOf( self, nwkid ):
+
+        if nwkid == '0000':
+            return COORDINATOR_IEEE
+        return self.devices[nwkid].ieee
+
+    def _depth( self, nwkid ):
+
+        depth = 0
+        while nwkid != '0000' and depth < 16:
+            nwkid = self.devices[nwkid].parent
+            depth += 1
+        return depth
+
+    # Output
+    def send( self, msgType, payload, rssi=0 ):
+
+        frame = encodeFrame( msgType, payload, rssi )
+        if self.writer is not None:
+            self.writer.write( frame )
+        elif self.ptyMaster is not None:
+            try:
+                os.write( self.ptyMaster, frame )
+            except OSError:
+                return
+        else:
+            return
+        self.stats.framesOut[ msgType ] = self.stats.framesOut.get( msgType, 0 ) + 1
+        self.stats.bytesOut += len(frame)
+
+    def fromDevice( self, device, msgType, payload, completes=False, reaction=None ):
+        ' Send a frame coming over the air, after the latency, unless lost '
+
+        if self.rand.random() < self.args.loss:
+            self.stats.lost += 1
+            return
+        latency = self.args.latency / 1000 * self.rand.uniform( 0.5, 1.5 )
+        rssi = self.rand.randrange( 60, 220 )
+        self.loop.call_later( latency, self._deliver, device, msgType, payload, rssi, completes, reaction )
+
+    def _deliver( self, device, msgType, payload, rssi, completes, reaction ):
+
+        self.send( msgType, payload, rssi )
+        now = time()
+        if completes:
+            self.lastCompletion = now
+        if reaction and device is not None:
+            self.pendingReaction[ ( device.nwkid, reaction ) ] = now
+
+    def status( self, command, status='00' ):
+
+        self.sqn = ( self.sqn + 1 ) % 256
+        self.send( 0x8000, "%s%02x%04x" %( status, self.sqn, command ))
+        return "%02x" %self.sqn
+
+    # Input
+    def received( self, data ):
+
+        self.stats.bytesIn += len(data)
+        for command, payload in self.decoder.feed( data ):
+            self.stats.framesIn[ command ] = self.stats.framesIn.get( command, 0 ) + 1
+            now = time()
+            if self.lastCompletion is not None and now - self.lastCompletion < TURNAROUND_WINDOW:
+                self.stats.turnaround.append( now - self.lastCompletion )
+            self.lastCompletion = None
+            try:
+                self.handle( command, payload )
+            except (ValueError, IndexError, KeyError) as e:
+                print( "Command %04x %s: %s" %( command, payload, e ), file=sys.stderr )
+                self.status( command, '01' )
+
+    def _reaction( self, nwkid, command ):
+
+        sent = self.pendingReaction.pop( ( nwkid, command ), None )
+        if sent is not None:
+            self.stats.reaction.append( time() - sent )
+
+    def handle( self, command, payload ):
+
+        handler = getattr( self, "cmd%04X" %command, None )
+        if handler is None:
+            self.status( command )
+            self.lastCompletion = time()
+            return
+        handler( command, payload )
+
+    def _target( self, command, nwkid ):
+        ' 0x8000 for a command to a device. Return ( device, sqn ), device is None when unknown '
+
+        sqn = self.status( command )
+        device = self.devices.get( nwkid )
+        if device is None:
+            self.lastCompletion = time()
+        return device, sqn
+
+    # Coordinator commands
+    def cmd0009( self, command, payload ):
+
+        self.status( command )
+        self.send( 0x8009, "0000" + COORDINATOR_IEEE + "1a62" + EXT_PANID + "%02x" %self.args.channel )
+        self.lastCompletion = time()
+        if not self.announceStarted:
+            self.announceStarted = True
+            self.loop.call_later( self.args.announce_delay, self._announceNext )
+
+    def cmd0010( self, command, payload ):
+
+        self.status( command )
+        self.send( 0x8010, FIRMWARE )
+        self.lastCompletion = time()
+
+    def cmd0014( self, command, payload ):
+
+        self.status( command )
+        self.send( 0x8014, "01" if self.permitJoin else "00" )
+        self.lastCompletion = time()
+
+    def cmd0015( self, command, payload ):
+
+        self.status( command )
+        entries = ''
+        for idx, device in enumerate( list( self.devices.values() )[:0x80] ):
+            entries += "%02x%s%s%s%02x" %( idx, device.nwkid, device.ieee, '01' if device.type == ROUTER else '00',
+                    self.rand.randrange( 60, 220 ))
+        self.send( 0x8015, entries )
+        self.lastCompletion = time()
+
+    def cmd0049( self, command, payload ):
+
+        self.permitJoin = int( payload[4:6], 16 )
+        self.status( command )
+        self.lastCompletion = time()
+
+    def _announceNext( self ):
+
+        for device in self.devices.values():
+            if not device.announced:
+                device.announced = True
+                self.fromDevice( device, 0x004d, device.nwkid + device.ieee + device.profile['MacCapa'], reaction=0x0045 )
+                self.loop.call_later( 1 / self.args.announce_rate, self._announceNext )
+                return
+
+    # Interview
+    def cmd0045( self, command, payload ):
+
+        nwkid = payload[0:4]
+        device, sqn = self._target( command, nwkid )
+        self._reaction( nwkid, command )
+        if device is None:
+            return
+        eps = sorted( device.profile['Endpoints'] )
+        self.fromDevice( device, 0x8045, sqn + "00" + nwkid + "%02x" %len(eps) + ''.join( eps ), completes=True, reaction=0x0043 )
+
+    def cmd0043( self, command, payload ):
+
+        nwkid, ep = payload[0:4], payload[4:6]
+        device, sqn = self._target( command, nwkid )
+        self._reaction( nwkid, command )
+        if device is None:
+            return
+        if ep not in device.profile['Endpoints']:
+            self.fromDevice( device, 0x8043, sqn + "83" + nwkid + "00", completes=True )
+            return
+        endpoint = device.profile['Endpoints'][ep]
+        descriptor = ep + endpoint['ProfileID'] + endpoint['DeviceID'] + "01"
+        descriptor += "%02x" %len( endpoint['In'] ) + ''.join( endpoint['In'] )
+        descriptor += "%02x" %len( endpoint['Out'] ) + ''.join( endpoint['Out'] )
+        self.fromDevice( device, 0x8043, sqn + "00" + nwkid + "%02x" %( len(descriptor) // 2 ) + descriptor, completes=True )
+
+    def cmd0042( self, command, payload ):
+        ' Node Descriptor: addr '
+
+        nwkid = payload[0:4]
+        device, sqn = self._target( command, nwkid )
+        if device is None:
+            return
+        # Manufacturer, max rx, max tx, server mask, descriptor capability, MAC capability, max buffer, logical type
+        descriptor = device.profile['ManufacturerCode'] + "0052" + "0052" + "0000" + "00" + device.profile['MacCapa'] + "52" + \
+                "%04x" %( 1 if device.type == ROUTER else 2 )
+        self.fromDevice( device, 0x8042, sqn + "00" + nwkid + descriptor, completes=True )
+
+    # ZCL
+    def cmd0100( self, command, payload ):
+        ' Read Attribute: mode, addr, src ep, dst ep, cluster, direction, manuf spec, manuf, count, attributes '
+
+        nwkid, ep, cluster = payload[2:6], payload[8:10], payload[10:14]
+        count = int( payload[22:24], 16 )
+        device, sqn = self._target( command, nwkid )
+        if device is None:
+            return
+        for idx in range( count ):
+            attribute = payload[ 24 + 4 * idx:28 + 4 * idx ]
+            value = device.attribute( ep, cluster, attribute )
+            if value is None:
+                response = "%s%s%s%s%s86000000" %( sqn, nwkid, ep, cluster, attribute )
+            else:
+                response = "%s%s%s%s%s00%s%04x%s" %( sqn, nwkid, ep, cluster, attribute, value[0], len( value[1] ) // 2, value[1] )
+            self.fromDevice( device, 0x8100, response, completes=( idx == count - 1 ))
+
+    def cmd0120( self, command, payload ):
+        ' Configure Reporting: mode, addr, src ep, dst ep, cluster, ... '
+
+        nwkid, ep, cluster = payload[2:6], payload[8:10], payload[10:14]
+        device, sqn = self._target( command, nwkid )
+        if device is None:
+            return
+        supported = any( key[0] == ep and key[1] == cluster for key in device.profile['Attributes'] )
+        self.fromDevice( device, 0x8120, sqn + nwkid + ep + cluster + ( "00" if supported else "86" ), completes=True )
+
+    def cmd0030( self, command, payload ):
+        ' Bind: ieee, ep, cluster, mode, destination, destination ep '
+
+        device = self.ieee.get( payload[0:16] )
+        sqn = self.status( command )
+        if device is None:
+            self.lastCompletion = time()
+            return
+        supported = payload[16:18] in device.profile['Endpoints']
+        self.fromDevice( device, 0x8030, sqn + ( "00" if supported else "82" ), completes=True )
+
+    def cmd0140( self, command, payload ):
+        ' Attribute Discovery: mode, addr, src ep, dst ep, cluster, start attribute, direction, manuf spec, manuf, max '
+
+        nwkid, ep, cluster = payload[2:6], payload[8:10], payload[10:14]
+        device, sqn = self._target( command, nwkid )
+        if device is None:
+            return
+        attributes = device.attributes( ep, cluster )
+        if not attributes:
+            self.fromDevice( device, 0x8140, "01" + "00" + "0000", completes=True )
+            return
+        for idx, ( attribute, dataType ) in enumerate( attributes ):
+            last = idx == len(attributes) - 1
+            self.fromDevice( device, 0x8140, ( "01" if last else "00" ) + dataType + attribute + nwkid + ep + cluster, completes=last )
+
+    def cmd0062( self, command, payload ):
+        ' Group Membership: mode, addr, src ep, dst ep, count, groups '
+
+        nwkid, ep = payload[2:6], payload[8:10]
+        device, sqn = self._target( command, nwkid )
+        if device is None:
+            return
+        if not device.profile['Groups'] or ep not in device.profile['Endpoints']:
+            self.fromDevice( device, 0x8101, sqn + ep + "0004" + "02" + "c3", completes=True )
+            return
+        groups = device.groups.get( ep, [] )
+        self.fromDevice( device, 0x8062, sqn + ep + "0004" + "%02x" %( 16 - len(groups) ) + "%02x" %len(groups)
+                + ''.join( groups ) + nwkid, completes=True )
+
+    def cmd004E( self, command, payload ):
+        ' Management LQI: addr, start index '
+
+        nwkid, index = payload[0:4], int( payload[4:6], 16 )
+        if nwkid != '0000' and nwkid not in self.devices:
+            self.status( command )
+            self.lastCompletion = time()
+            return
+        sqn = self.status( command )
+        source = None if nwkid == '0000' else self.devices[nwkid]
+        if source is not None and source.type != ROUTER:
+            self.fromDevice( source, 0x804e, sqn + "84" + "000000", completes=True )
+            return
+
+        neighbours = sorted( self._neighbours( nwkid ).items() )
+        page = neighbours[ index:index + LQI_PAGE ]
+        entries = ''
+        for neighbour, ( relationship, lqi ) in page:
+            nodeType = self._nodeType( neighbour )
+            rxOnWhenIdle = 1 if nodeType != END_DEVICE else 0
+            bitmap = nodeType | ( relationship << 4 ) | ( rxOnWhenIdle << 6 )
+            entries += neighbour + EXT_PANID + self._ieeeOf( neighbour ) + "%02x%02x%02x" %( self._depth( neighbour ), lqi, bitmap )
+        response = sqn + "00" + "%02x%02x%02x" %( len(neighbours), len(page), index ) + entries
+        if source is None:
+            self.send( 0x804e, response )
+            self.lastCompletion = time()
+        else:
+            self.fromDevice( source, 0x804e, response, completes=True )
+
+    def _report( self, device, ep, cluster, attribute, drift=False, completes=False ):
+
+        value = device.attribute( ep, cluster, attribute, drift )
+        if value is None:
+            return
+        payload = "%s%s%s%s%s00%s%04x%s" %( device.nextSQN(), device.nwkid, ep, cluster, attribute, value[0], len( value[1] ) // 2, value[1] )
+        self.fromDevice( device, 0x8102, payload, completes=completes )
+
+    def _members( self, group ):
+        ' ( device, ep ) members of the group '
+
+        return [ ( device, ep ) for device in self.devices.values() if device.announced
+                for ep, groups in device.groups.items() if group in groups ]
+
+    def _targets( self, command, payload ):
+        ' 0x8000 for a command to a device or a group. Return ( [ ( device, ep ) ], sqn, groupcast ) '
+
+        if payload[0:2] == '01':
+            sqn = self.status( command )
+            self.lastCompletion = time()
+            return self._members( payload[2:6] ), sqn, True
+        device, sqn = self._target( command, payload[2:6] )
+        return ( [ ( device, payload[8:10] ) ] if device else [] ), sqn, False
+
+    def cmd0092( self, command, payload ):
+        ' On/Off: mode, addr, src ep, dst ep, command '
+
+        action = int( payload[10:12], 16 )
+        members, sqn, groupcast = self._targets( command, payload )
+        for device, ep in members:
+            if action == 2:
+                device.state['onoff'] ^= 1
+            else:
+                device.state['onoff'] = action & 1
+            self._report( device, ep, '0006', '0000', completes=not groupcast )
+
+    def cmd0081( self, command, payload ):
+        ' Move to Level: mode, addr, src ep, dst ep, with on/off, level, transition '
+
+        members, sqn, groupcast = self._targets( command, payload )
+        for device, ep in members:
+            device.state['level'] = int( payload[12:14], 16 )
+            if payload[10:12] == '01':
+                device.state['onoff'] = 1 if device.state['level'] else 0
+            self._report( device, ep, '0008', '0000', completes=not groupcast )
+
+    def _sceneAnswer( self, device, ep, msgType, sqn, status, group, scene ):
+
+        self.fromDevice( device, msgType, sqn + ep + "0005" + status + group + scene + device.nwkid, completes=True )
+
+    def cmd00A1( self, command, payload ):
+        ' Add Scene: mode, addr, src ep, dst ep, group, scene, transition, name '
+
+        group, scene = payload[10:14], payload[14:16]
+        members, sqn, groupcast = self._targets( command, payload )
+        for device, ep in members:
+            member = group in device.groups.get( ep, [] )
+            if member:
+                device.scenes.setdefault( ( ep, group, scene ), {} )
+            if not groupcast:
+                self._sceneAnswer( device, ep, 0x80A1, sqn, "00" if member else "85", group, scene )
+
+    def cmd00A2( self, command, payload ):
+        ' Remove Scene: mode, addr, src ep, dst ep, group, scene '
+
+        group, scene = payload[10:14], payload[14:16]
+        members, sqn, groupcast = self._targets( command, payload )
+        for device, ep in members:
+            found = device.scenes.pop( ( ep, group, scene ), None ) is not None
+            if not groupcast:
+                self._sceneAnswer( device, ep, 0x80A2, sqn, "00" if found else "8b", group, scene )
+
+    def cmd00A4( self, command, payload ):
+        ' Store Scene: mode, addr, src ep, dst ep, group, scene '
+
+        group, scene = payload[10:14], payload[14:16]
+        members, sqn, groupcast = self._targets( command, payload )
+        for device, ep in members:
+            member = group in device.groups.get( ep, [] )
+            if member:
+                device.scenes[ ( ep, group, scene ) ] = { 'onoff': device.state['onoff'], 'level': device.state['level'] }
+            if not groupcast:
+                self._sceneAnswer( device, ep, 0x80A4, sqn, "00" if member else "85", group, scene )
+
+    def cmd00A5( self, command, payload ):
+        ' Recall Scene: mode, addr, src ep, dst ep, group, scene '
+
+        group, scene = payload[10:14], payload[14:16]
+        members, sqn, groupcast = self._targets( command, payload )
+        for device, ep in members:
+            stored = device.scenes.get( ( ep, group, scene ) )
+            if not stored:
+                continue
+            device.state.update( stored )
+            self._report( device, ep, '0006', '0000', completes=not groupcast )
+
+    def cmd00A6( self, command, payload ):
+        ' Scene Membership: mode, addr, src ep, dst ep, group '
+
+        nwkid, ep, group = payload[2:6], payload[8:10], payload[10:14]
+        device, sqn = self._target( command, nwkid )
+        if device is None:
+            return
+        if group not in device.groups.get( ep, [] ):
+            self.fromDevice( device, 0x80A6, sqn + ep + "0005" + "85" + "10" + group + "00" + nwkid, completes=True )
+            return
+        scenes = sorted( scene for ( sEp, sGroup, scene ) in device.scenes if sEp == ep and sGroup == group )
+        self.fromDevice( device, 0x80A6, sqn + ep + "0005" + "00" + "%02x" %( 16 - len(scenes) ) + group + "%02x" %len(scenes)
+                + ''.join( scenes ) + nwkid, completes=True )
+
+    # Activity
+    def _activity( self ):
+        ' Reports and rejoins of the devices, checked every 100ms '
+
+        self.loop.call_later( 0.1, self._activity )
+        if not self.connected:
+            return
+        now = time()
+        rejoin = self.args.rejoin / 3600 * 0.1
+        for device in list( self.devices.values() ):
+            if not device.announced:
+                continue
+            if device.nextReport is None:
+                device.nextReport = now + self.rand.uniform( 0, self.args.report_interval )
+            elif now >= device.nextReport:
+                device.nextReport = now + self.args.report_interval * self.rand.uniform( 0.9, 1.1 )
+                for ep, cluster, attribute in device.profile['Reports']:
+                    self._report( device, ep, cluster, attribute, drift=True )
+            if rejoin and self.rand.random() < rejoin:
+                self._rejoin( device )
+
+    def _rejoin( self, device ):
+
+        if self.rand.random() < self.args.readdress:
+            # Rejoin with a new short address: the mesh links follow the device
+            old = device.nwkid
+            del self.devices[old]
+            device.nwkid = self._newNwkid()
+            self.devices[ device.nwkid ] = device
+            for neighbour in list( device.neighbours ):
+                links = self._neighbours( neighbour )
+                links[ device.nwkid ] = links.pop( old )
+            for other in self.devices.values():
+                if other.parent == old:
+                    other.parent = device.nwkid
+        self.fromDevice( device, 0x004d, device.nwkid + device.ieee + device.profile['MacCapa'], reaction=0x0045 )
+
+    def _printStats( self ):
+
+        self.loop.call_later( self.args.stats_interval, self._printStats )
+        print( self.stats.report(), flush=True )
+
+    # Links
+    async def _client( self, reader, writer ):
+
+        if self.writer is not None:
+            self.writer.close()
+        self.writer = writer
+        self.connected = True
+        print( "Plugin connected from %s" %( writer.get_extra_info('peername'), ), flush=True )
+        while True:
+            data = await reader.read( 4096 )
+            if not data:
+                break
+            self.received( data )
+        if self.writer is writer:
+            self.writer = None
+            self.connected = False
+        print( "Plugin disconnected", flush=True )
+
+    def _readPty( self ):
+
+        try:
+            data = os.read( self.ptyMaster, 4096 )
+        except OSError:
+            return
+        self.connected = True
+        self.received( data )
+
+    async def run( self ):
+
+        self.loop = asyncio.get_running_loop()
+        if self.args.pty:
+            self.ptyMaster, slave = pty.openpty()
+            tty.setraw( self.ptyMaster )
+            address = os.ttyname( slave )
+            if self.args.link:
+                if os.path.islink( self.args.link ):
+                    os.remove( self.args.link )
+                os.symlink( address, self.args.link )
+                address = self.args.link
+            self.loop.add_reader( self.ptyMaster, self._readPty )
+        else:
+            host, port = self.args.tcp.rsplit( ':', 1 )
+            server = await asyncio.start_server( self._client, host, int(port) )
+            address = self.args.tcp
+        print( "Zigate simulator on %s: %s devices ( %s )" %( address, len(self.devices),
+                ', '.join( "%s %s" %( sum( 1 for device in self.devices.values() if device.model == model ), model ) for model in PROFILES )),
+                flush=True )
+
+        child = None
+        if self.args.exec:
+            child = subprocess.Popen( shlex.split( self.args.exec.replace( '{address}', address )))
+        self.loop.call_later( 0.1, self._activity )
+        self.loop.call_later( self.args.stats_interval, self._printStats )
+
+        stop = asyncio.Event()
+        for signum in ( signal.SIGINT, signal.SIGTERM ):
+            self.loop.add_signal_handler( signum, stop.set )
+        if self.args.duration:
+            self.loop.call_later( self.args.duration, stop.set )
+        await stop.wait()
+
+        childCpu = None
+        if child is not None:
+            child.send_signal( signal.SIGTERM )
+            await self.loop.run_in_executor( None, child.wait )
+            childCpu = Statistics.cpu( resource.getrusage( resource.RUSAGE_CHILDREN ))
+        print( self.stats.report( childCpu ), flush=True )
+        if self.args.link and os.path.islink( self.args.link ):
+            os.remove( self.args.link )
+
+
+def main():
+
+    parser = argparse.ArgumentParser( description="Zigate protocol simulator for load and latency testing" )
+    link = parser.add_mutually_exclusive_group()
+    link.add_argument( '--tcp', default="127.0.0.1:9999", help="host:port to listen on ( default 127.0.0.1:9999 )" )
+    link.add_argument( '--pty', action='store_true', help="Use a pty instead of TCP, its name is printed" )
+    parser.add_argument( '--link', help="With --pty, symlink to create to the pty ( ex: /tmp/zigate )" )
+    parser.add_argument( '--devices', type=int, default=50, help="Number of virtual devices ( default 50 )" )
+    parser.add_argument( '--seed', type=int, default=1, help="Random seed: same seed and --devices, same network" )
+    parser.add_argument( '--channel', type=int, default=15, help="Zigbee channel ( default 15 )" )
+    parser.add_argument( '--groups', type=int, default=4, help="Number of groups the bulbs and plugs are member of ( default 4 )" )
+    parser.add_argument( '--report-interval', type=float, default=60, help="Sec between 2 reports of a device ( default 60 )" )
+    parser.add_argument( '--latency', type=float, default=30, help="Mean over the air latency in ms ( default 30 )" )
+    parser.add_argument( '--loss', type=float, default=0.0, help="Probability to lose a frame from a device ( default 0 )" )
+    parser.add_argument( '--rejoin', type=float, default=0.0, help="Rejoins per device per hour ( default 0 )" )
+    parser.add_argument( '--readdress', type=float, default=0.2, help="Probability a rejoin comes with a new short address ( default 0.2 )" )
+    parser.add_argument( '--no-announce', action='store_true', help="The devices are already known by the plugin" )
+    parser.add_argument( '--announce-rate', type=float, default=2, help="Device announcements per sec ( default 2 )" )
+    parser.add_argument( '--announce-delay', type=float, default=15, help="Sec after the first 0x0009 before the announcements ( default 15 )" )
+    parser.add_argument( '--stats-interval', type=float, default=60, help="Sec between 2 statistics reports ( default 60 )" )
+    parser.add_argument( '--duration', type=float, help="Stop after this number of sec" )
+    parser.add_argument( '--exec', help="Command starting the plugin, {address} is replaced by the simulator address" )
+    args = parser.parse_args()
+
+    asyncio.run( Simulator( args ).run() )
+
+
+if __name__ == '__main__':
+    main()
@@ -89,17 +89,30 @@ from Modules.output import sendZigateCmd, ZigateConf, ZigateConf_light, removeZi
 from Modules.input import ZigateRead
 from Modules.heartbeat import processListOfDevices
 from Modules.database import importDeviceConf, LoadDeviceList, checkListOfDevice2Devices, checkListOfDevice2Devices, WriteDeviceList
-from Modules.domoticz import ResetDevice
-from Modules.command import mgtCommand
+from Modules.domoticz import ResetDevice, MajDomoDevice
+from Modules.command import mgtCommand, processOptimisticTimeouts
 from Modules.LQI import LQIdiscovery
 from Modules.consts import HEARTBEAT, CERTIFICATION
 
 from Classes.IAS import IAS_Zone_Management
-from Classes.PluginConf import PluginConf
+from Classes.PluginConf import PluginConf, TRANSPORT_SETTINGS
 from Classes.Transport import ZigateTransport
 from Classes.TransportStats import TransportStatistics
+from Classes.Mailbox import SleepyMailbox
+from Classes.DuplicateFilter import DuplicateFilter
+from Classes.Downsampler import ReportDownsampler
+from Classes.AdaptivePolling import AdaptivePolling
+from Classes.ReportingMonitor import ReportingMonitor
+from Classes.WarmUp import WarmUpPlanner
+from Classes.RouteWarmer import RouteWarmer
+from Classes.ReportStore import ReportStore
+from Classes.ReportManifest import ReportManifest
 from Classes.GroupMgt import GroupsManagement
+from Classes.SceneMgt import SceneManagement
+from Classes.FanOut import FanOutOptimizer
+from Classes.Optimistic import OptimisticUpdates
 from Classes.AdminWidgets import AdminWidgets
+from Classes.DeviceTemplates import DeviceTemplates
 
 class BasePlugin:
     enabled = False
@@ -117,6 +130,8 @@ class BasePlugin:
         self.permitTojoin = None
         self.groupmgt = None
         self.groupmgt_NotStarted = True
+        self.scenemgt = None
+        self.fanout = None            # Group-cast for the bursts of commands to the members of a group
         self.CommiSSionning = False    # This flag is raised when a Device Annocement is receive, in order to give priority to commissioning
 
         self.busy = False    # This flag is raised when a Device Annocement is receive, in order to give priority to commissioning
@@ -133,10 +148,22 @@ class BasePlugin:
 
         self.Ping = {}
         self.connectionState = None
-        self.LQISource = None
+        self.LQIScan = None
         self.initdone = None
         self.statistics = None
+        self.reportStore = None     # Time series of the reports ( Transport, Network scan, LQI )
+        self.reportManifest = None  # Index of the reports for the Web UI
+        self.duplicateFilter = None # Duplicated Attribute Reports suppression
+        self.downsampler = None     # Downsampling of the power/metering widget updates
+        self.polling = None         # Report aware ReadAttribute poll intervals
+        self.reportingMonitor = None # Liveness of the Configure Reporting
+        self.warmup = None          # Spread of the start-up requests to the known devices
+        self.routeWarmer = None     # Keep the routes to the mains powered devices
+        self.optimistic = None      # Widget updates of the commands on the Zigate acceptance
         self.iaszonemgt = None      # Object to manage IAS Zone
+        self.deviceTemplates = None # Learned interview templates for Models not in DeviceConf
+        self.DeviceConf = {}        # Content of DeviceConf.txt
+        self.DeviceConfIndex = None # Compiled DeviceConf.txt
         self.HBcount = 0
         self.HeartbeatCount = 0
         self.currentChannel = None  # Curent Channel. Set in Decode8009/Decode8024
@@ -238,6 +265,17 @@ class BasePlugin:
 
         # Create Statistics object
         self.statistics = TransportStatistics(self.pluginconf)
+        self.reportStore = ReportStore( self.pluginconf, self.HardwareID )
+        self.reportStore.maintenance()
+        self.reportManifest = ReportManifest( self.pluginconf, self.HardwareID )
+        self.reportManifest.writeDeviceIndex( Devices, self.ListOfDevices )
+        self.duplicateFilter = DuplicateFilter( self.pluginconf )
+        self.downsampler = ReportDownsampler( self.pluginconf, self.DeviceConfIndex, self.ListOfDevices )
+        self.polling = AdaptivePolling( self.ListOfDevices )
+        self.deviceTemplates = DeviceTemplates( self.pluginconf, self.ListOfDevices )
+        self.reportingMonitor = ReportingMonitor( self.pluginconf, self.ListOfDevices )
+        self.warmup = WarmUpPlanner( self.pluginconf, self.ListOfDevices )
+        self.warmup.plan()
 
         # Check update for web GUI
         # CheckForUpdate( self )
@@ -256,6 +294,15 @@ class BasePlugin:
             Domoticz.Error("Unknown Transport comunication protocol : "+str(self.transport) )
             return
 
+        # Commands to battery devices wait until they are awake
+        self.ZigateComm.mailbox = SleepyMailbox( self.pluginconf, self.ZigateComm, self.ListOfDevices, self.IEEE2NWK )
+        # Routes to the mains powered devices are kept warm
+        self.routeWarmer = RouteWarmer( self.pluginconf, self.ListOfDevices )
+        self.ZigateComm.routeWarmer = self.routeWarmer
+        # Widgets of the commands are updated once the Zigate accepts them
+        self.optimistic = OptimisticUpdates( self.pluginconf )
+        self.ZigateComm.optimistic = self.optimistic
+
         Domoticz.Debug("Establish Zigate connection" )
         self.ZigateComm.openConn()
         self.busy = False
@@ -276,7 +323,15 @@ class BasePlugin:
         #self.ZigateComm.closeConn()
         WriteDeviceList(self, 0)
         self.statistics.printSummary()
-        self.statistics.writeReport()
+        self.ZigateComm.admission.printSummary()
+        if self.fanout:
+            self.fanout.printSummary()
+        self.optimistic.printSummary()
+        self.statistics.writeReport( self.reportStore )
+        self.duplicateFilter.writeReport( self.reportStore )
+        self.ZigateComm.admission.writeReport( self.reportStore )
+        Domoticz.Status("Power/Metering reports held back by the downsampling: %s" %self.downsampler.dropped)
+        self.reportStore.close()
         self.adminWidgets.updateStatusWidget( Devices, 'No Communication')
 
     def onDeviceRemoved( self, Unit ) :
@@ -300,6 +355,9 @@ class BasePlugin:
                 Domoticz.Log("onDeviceRemoved - removing Group of Devices")
                 # Command belongs to a Zigate group
                 self.groupmgt.processRemoveGroup( Unit, Devices[Unit].DeviceID )
+            elif self.scenemgt and self.scenemgt.isScene( Devices[Unit].DeviceID ):
+                Domoticz.Log("onDeviceRemoved - removing Scene")
+                self.scenemgt.widgetRemoved( Devices[Unit].DeviceID )
 
         # We might evaluate teh removal of the physical device from Zigate.
         # Could be done if a Flag is enabled in the PluginConf.txt.
@@ -393,6 +451,11 @@ class BasePlugin:
             # Command belongs to a end node
             mgtCommand( self, Devices, Unit, Command, Level, Color )
 
+        elif self.scenemgt and self.scenemgt.isScene( Devices[Unit].DeviceID ):
+            # Command belongs to a Zigbee scene
+            Domoticz.Log("Command: %s/%s to Scene: %s" %(Command,Level, Devices[Unit].DeviceID))
+            self.scenemgt.processCommand( Unit, Devices[Unit].DeviceID, Command, Level )
+
         elif self.pluginconf.enablegroupmanagement and self.groupmgt:
             #if Devices[Unit].DeviceID in self.groupmgt.ListOfGroups:
             #    # Command belongs to a Zigate group
@@ -481,6 +544,13 @@ class BasePlugin:
                     self.groupmgt = GroupsManagement( self.pluginconf, self.adminWidgets, self.ZigateComm, Parameters["HomeFolder"], 
                             self.HardwareID, Parameters["Mode5"], Devices, self.ListOfDevices, self.IEEE2NWK )
                     self.groupmgt_NotStarted = False
+                    self.scenemgt = SceneManagement( self.pluginconf, self.adminWidgets, self.ZigateComm, self.HardwareID,
+                            Devices, self.ListOfDevices, self.groupmgt )
+                    self.fanout = FanOutOptimizer( self.pluginconf, self.groupmgt )
+                    self.ZigateComm.fanout = self.fanout
+                    self.optimistic.groupmgt = self.groupmgt
+                    self.groupmgt.optimistic = self.optimistic
+                    self.ZigateComm.groupmgt = self.groupmgt
 
             Domoticz.Status("Plugin with Zigate firmware %s correctly initialized" %self.FirmwareVersion)
 
@@ -503,10 +573,44 @@ class BasePlugin:
         # Reset Motion sensors
         ResetDevice( self, Devices, "Motion",5)
 
+        # Widgets of the commands not confirmed by the devices
+        processOptimisticTimeouts( self, Devices )
+
+        # Power/Metering reports held back by the downsampling
+        for NwkId, Ep, ClusterId, value in self.downsampler.due():
+            MajDomoDevice( self, Devices, NwkId, Ep, ClusterId, str(value) )
+
+        # Reload DeviceConf.txt and PluginConf.txt if they have been modified
+        if ( self.HeartbeatCount % ( 60 // HEARTBEAT)) == 0:
+            if self.DeviceConfIndex.isModified():
+                Domoticz.Status("DeviceConf.txt has been modified, reloading")
+                importDeviceConf( self )
+            if self.pluginconf.isModified():
+                Domoticz.Status("PluginConf has been modified, reloading")
+                applied, restart = self.pluginconf.reload()
+                if [ param for param in applied if param in TRANSPORT_SETTINGS ]:
+                    self.ZigateComm.updateTunables( self.pluginconf )
+                if applied or restart:
+                    self.adminWidgets.updateNotificationWidget( Devices, 'PluginConf reloaded: %s applied, %s at next restart' \
+                            %(', '.join( sorted(applied)) or 'none', ', '.join( sorted(restart)) or 'none'))
+
+        # Complete and save the learned templates
+        self.deviceTemplates.heartbeat()
+
+        # Transport statistics every hour, reports downsampling and retention once a day
+        if ( self.HeartbeatCount % ( 3600 // HEARTBEAT)) == 0:
+            self.statistics.writeReport( self.reportStore )
+            self.duplicateFilter.writeReport( self.reportStore )
+            self.ZigateComm.admission.writeReport( self.reportStore )
+            self.reportManifest.writeDeviceIndex( Devices, self.ListOfDevices )
+            if time.time() > self.reportStore.lastMaintenance + 24 * 3600:
+                self.reportStore.maintenance()
+
         # Write the ListOfDevice in HBcount % 200 ( 3' ) or immediatly if we have remove or added a Device
         if len(Devices) != prevLenDevices:
             Domoticz.Debug("Devices size has changed , let's write ListOfDevices on disk")
             WriteDeviceList(self, 0)       # write immediatly
+            self.reportManifest.writeDeviceIndex( Devices, self.ListOfDevices )
         else:
             WriteDeviceList(self, ( 90 * 5) )
 
@@ -519,6 +623,8 @@ class BasePlugin:
             self.groupmgt.hearbeatGroupMgt()
             if self.groupmgt.stillWIP:
                 busy_ = True
+        if self.scenemgt:
+            self.scenemgt.heartbeat()
             
         # Hearbeat - Ping Zigate every minute to check connectivity
         # If fails then try to reConnect
@@ -1,4 +1,4 @@
-///version:6;
+///version:8;
 
 // Check for the various File API support.
 if (window.File && window.FileReader && window.FileList && window.Blob) {
@@ -13,48 +13,30 @@ var HwIDX = "";
 var DeviceIEEE = new Object();
 var Devices;
 var LQIlist = new Object();
-var LQIdata = new Object();
-var NETlist = new Object();
-var NETdata = new Object();
 var MatrixId = new Object();
 var Matrix = new Object();
 var orderlist;
 var OutResultLinks = "";
 var OutResultContents = "";
-var NetworkFiles;
+var ReportsManifest;
 
 function GetDevs(id) {
-    $.getJSON($.domoticzurl + "/json.htm", {
-            type: "devices",
-            format: "json"
-        },
-        function(DEVdata) {
-            var txtdev = "Pas de devices sur le HwID : " + id;
-            var tempDevicesList = '{ "ListOfDevices" : [';
-            var ii = 0;
-            if (typeof DEVdata.result != 'undefined') {
-                //txt = '</div><div id="TabDevices" class="tabcontent">';
-                txt = '<table id=Devices_Tab border=1><tr><th>Devices ID</th><th>Devices Name</th><th>Devices IEEE</th><th>Last Update</th></tr>';
-                $.each(DEVdata.result, function(i, itemDEV) {
-                    if (itemDEV.HardwareID == id) {
-                        if (CheckIfDeviceInList(itemDEV.ID) == false) {
-                            txt += "<tr><td>" + itemDEV.idx + "</td><td>" + itemDEV.Name + "</td><td>" + itemDEV.ID + "</td><td>" + itemDEV.LastUpdate + "</td></tr>";
-                            txtdev = "Chargement terminé, selectionner votre fichier LQI_report";
-                            DeviceIEEE[ii] = itemDEV.ID;
-                            ii++;
-                            if (tempDevicesList.length < 30) {
-                                tempDevicesList += '{ "id" : "' + itemDEV.idx + '", "name" : "' + itemDEV.Name + '", "IEEE" : "' + itemDEV.ID + '"}';
-                            }
-                        }
-                    }
-                });
-                tempDevicesList += "]}";
-                Devices = JSON.parse(tempDevicesList);
-                txt += "</table>";
+    // Devices of this HardwareID, written by the plugin (Classes/ReportManifest.py)
+    $.getJSON(ReportsFolder + 'Devices-' + id + '.json', function(DEVdata) {
+        var txt = '<table id=Devices_Tab border=1><tr><th>Devices ID</th><th>Devices Name</th><th>Devices IEEE</th><th>NwkId</th><th>Model</th><th>Last Update</th></tr>';
+        $.each(DEVdata, function(i, itemDEV) {
+            if (CheckIfDeviceInList(itemDEV.IEEE) == false) {
+                DeviceIEEE[Object.keys(DeviceIEEE).length] = itemDEV.IEEE;
             }
-            $('#ZigateHwLoad').html(txt);
-
+            txt += "<tr><td>" + itemDEV.idx + "</td><td>" + itemDEV.Name + "</td><td>" + itemDEV.IEEE + "</td><td>" + itemDEV.NwkId + 
+                "</td><td>" + itemDEV.Model + "</td><td>" + itemDEV.LastUpdate + "</td></tr>";
         });
+        txt += "</table>";
+        Devices = DEVdata;
+        $('#ZigateHwLoad').html(txt);
+    }).fail(function() {
+        $('#ZigateHwLoad').html("Pas de devices sur le HwID : " + id);
+    });
 };
 
 function CheckIfDeviceInList(IEEE) {
@@ -128,14 +110,6 @@ function DrawGraph(date, data, id) {
     console.log('draw LQI graph ' + date + '_' + id);
 };
 
-function DrawNetGraph(date, data, id) {
-    dateR = dateFormat(parseInt(date) * 1000, "dd/mm/yyyy HH:MM");
-    OutResultContents += '<div id="NET-' + id + '_' + date + '" class="tabcontent3"><div id="Nettab">';
-    OutResultContents += '<div id="GraphFile_' + id + '_' + date + '"><br>';
-    OutResultContents += '<output id="NET_' + id + '_' + date + '"></output></div></div>';
-    console.log('draw net graph ' + date + '_' + id);
-};
-
 function openTab(evt, TabName) {
     // Declare all variables
     var i, tabcontent, tablinks;
@@ -157,48 +131,6 @@ function openTab(evt, TabName) {
     evt.currentTarget.className += " active";
 }
 
-function openTab2(evt, TabName) {
-    // Declare all variables
-    var i, tabcontent, tablinks;
-
-    // Get all elements with class="tabcontent" and hide them
-    tabcontent = document.getElementsByClassName("tabcontent2");
-    for (i = 0; i < tabcontent.length; i++) {
-        tabcontent[i].style.display = "none";
-    }
-
-    // Get all elements with class="tablinks" and remove the class "active"
-    tablinks = document.getElementsByClassName("tablinks2");
-    for (i = 0; i < tablinks.length; i++) {
-        tablinks[i].className = tablinks[i].className.replace(" active", "");
-    }
-
-    // Show the current tab, and add an "active" class to the button that opened the tab
-    document.getElementById(TabName).style.display = "block";
-    evt.currentTarget.className += " active";
-}
-
-function openTab3(evt, TabName) {
-    // Declare all variables
-    var i, tabcontent, tablinks;
-
-    // Get all elements with class="tabcontent" and hide them
-    tabcontent = document.getElementsByClassName("tabcontent3");
-    for (i = 0; i < tabcontent.length; i++) {
-        tabcontent[i].style.display = "none";
-    }
-
-    // Get all elements with class="tablinks" and remove the class "active"
-    tablinks = document.getElementsByClassName("tablinks3");
-    for (i = 0; i < tablinks.length; i++) {
-        tablinks[i].className = tablinks[i].className.replace(" active", "");
-    }
-
-    // Show the current tab, and add an "active" class to the button that opened the tab
-    document.getElementById(TabName).style.display = "block";
-    evt.currentTarget.className += " active";
-}
-
 function sortProperties(obj) {
     // convert object into array
     var sortable = [];
@@ -222,83 +154,110 @@ function readTXT(file, id, type) {
         url: file,
         dataType: "text",
         success: function(data) {
-            if (type == 'LQI') {
-                readLQI(id, data);
-                PrintLQIGraph(id);
-            }
             if (type == 'Conf') {
                 readConf(id, data);
             }
-            if (type == 'Network') {
-                readNetwork(id, data);
-                PrintNETGraph(id);
-            }
         }
     });
 };
 
-function readLQI(id, data) {
-    // Closure to capture the file information.
-    const allLines = data.split(/\r\n|\n/); // Reading line by line 
-    allLines.map((line) => {
-        if (line.replace(/ /g, '') != '') {
-            LQIdate = line.slice(2, 12);
-            console.log('LQI reports date : ' + LQIdate)
-            LQIdata[LQIdate] = JSON.parse(line.slice(14, line.length - 1).replace(/ /g, '').replace(/'/g, '"').replace(/True/g, '"True"').replace(/False/g, '"False"'));
-            console.log('LQI reports data :' + LQIdata[LQIdate]);
-            LQIlist = Object.keys(LQIdata[LQIdate]);
-            // Make Table
-            orderlist = sortProperties(LQIlist);
-            //OutResultContents += '<div class="tabcontent2">';
-            DrawTable(LQIdate, LQIdata[LQIdate], id);
-            DrawGraph(LQIdate, LQIdata[LQIdate], id);
-            OutResultContents += '</div>';
-            console.log('Next reports (line)');
-        };
+function readLQISummary(id) {
+    // Precomputed by the plugin at the end of each LQI scan (Classes/Topology.py)
+    $.getJSON(ReportsFolder + 'LQI_summary-' + id + '.json', function(summary) {
+        var txt = "<H2>" + dateFormat(summary.TimeStamp * 1000, "dd/mm/yyyy HH:MM") + "</H2>";
+        txt += "<table id=LQI_Summary border=1><tr><th>Node</th><th>Type</th><th>Path LQI</th><th>Hops</th><th>Via</th><th>Children</th></tr>";
+        $.each(summary.Nodes, function(nwkid, node) {
+            var children = (nwkid in summary.RouterLoad) ? summary.RouterLoad[nwkid] : "";
+            var pathLQI = (node.PathLQI === null) ? "unreachable" : node.PathLQI;
+            txt += "<tr><td>" + nwkid + "</td><td>" + node.Type + "</td><td>" + pathLQI + "</td><td>" + 
+                (node.Hops === null ? "" : node.Hops) + "</td><td>" + (node.Via === null ? "" : node.Via) + "</td><td>" + children + "</td></tr>";
+        });
+        txt += "</table><br><table border=1><tr><th>Weakest links</th><th>LQI</th></tr>";
+        $.each(summary.WeakestLinks, function(i, link) {
+            txt += "<tr><td>" + link[0] + " - " + link[1] + "</td><td>" + link[2] + "</td></tr>";
+        });
+        txt += "</table><br><table border=1><tr><th>Since previous scan</th><th></th></tr>";
+        txt += "<tr><td>New nodes</td><td>" + summary.Delta.NewNodes.join(", ") + "</td></tr>";
+        txt += "<tr><td>Lost nodes</td><td>" + summary.Delta.LostNodes.join(", ") + "</td></tr>";
+        $.each(summary.Delta.Changed, function(i, link) {
+            txt += "<tr><td>" + link[0] + " - " + link[1] + "</td><td>" + link[2] + " -> " + link[3] + "</td></tr>";
+        });
+        txt += "</table>";
+        $('#LQISummary').html(txt);
     });
-    OutResultLinks += "<div class='LQItab'>"
-
-    for (ii = 0; ii < Object.keys(LQIdata).length; ii++) {
-        var datelist = Object.keys(LQIdata);
-        dateR = dateFormat(parseInt(datelist[ii]) * 1000, "dd/mm/yyyy HH:MM");
-        OutResultLinks += '<button class="tablinks2" onclick="openTab2(event,`LQI-' + id + '_' + datelist[ii] + '`)">' + id + '_' + dateR + '</button>';
-    }
-    OutResultLinks += "</div>"
-        //Print Out result
-    $('#LQIResult').html(OutResultLinks + OutResultContents);
-    //PrintGraph(id);
 }
 
-function readNetwork(id, data) {
+function readManifest(id) {
+    // Index of the reports, written by the plugin (Classes/ReportManifest.py). Only the selected scan is downloaded.
+    $.getJSON(ReportsFolder + 'Reports-' + id + '.json', function(manifest) {
+        var links = "<div class='LQItab'>";
+        $.each(manifest.Reports.LQI, function(i, entry) {
+            links += '<button class="tablinks2" onclick="loadLQI(event, `' + id + '`, ' + i + ')">' + id + '_' + dateFormat(entry.TimeStamp * 1000, "dd/mm/yyyy HH:MM") + '</button>';
+        });
+        links += "</div>";
+        $('#LQIResult').html(links + '<div id="LQIContent"></div>');
 
-    console.log('Network read');
-    // Closure to capture the file information.
-    const allLines = data.split(/\r\n|\n/); // Reading line by line 
-    allLines.map((line) => {
-        if (line.replace(/ /g, '') != '') {
-            NETdate = line.slice(2, 11);
-            console.log('Network scan reports date : ' + LQIdate)
-            NETdata[NETdate] = JSON.parse(line.slice(14, line.length - 1).replace(/ /g, '').replace(/'/g, '"').replace(/True/g, '"True"').replace(/False/g, '"False"'));
-            console.log('Network scan reports data :' + NETdata[NETdate]);
-            NETlist = Object.keys(NETdata[NETdate]);
-            DrawNetGraph(NETdate, NETdata[NETdate], id);
-            OutResultContents += '</div>';
-            console.log('Next reports (line)');
-        };
+        links = "<div class='NETtab'>";
+        $.each(manifest.Reports.Network, function(i, entry) {
+            links += '<button class="tablinks3" onclick="loadNetwork(event, `' + id + '`, ' + i + ')">' + id + '_' + dateFormat(entry.TimeStamp * 1000, "dd/mm/yyyy HH:MM") + '</button>';
+        });
+        links += "</div>";
+        $('#NetResult').html(links + '<div id="NETContent"></div>');
+        ReportsManifest = manifest;
     });
-    OutResultLinks += "<div class='NETtab'>"
+}
 
-    for (ii = 0; ii < Object.keys(NETdata).length; ii++) {
-        var datelist = Object.keys(NETdata);
-        dateR = dateFormat(parseInt(datelist[ii]) * 1000, "dd/mm/yyyy HH:MM");
-        OutResultLinks += '<button class="tablinks3" onclick="openTab3(event,`NET-' + id + '_' + datelist[ii] + '`)">' + id + '_' + dateR + '</button>';
-    }
-    OutResultLinks += "</div>"
-        //Print Out result
-    $('#NetResult').html(OutResultLinks + OutResultContents);
+function fetchSnapshot(entry, callback) {
+    // A report is either a file of its own, or a line at a byte offset of a legacy report file
+    $.ajax({
+        url: ReportsFolder + entry.File,
+        dataType: "text",
+        headers: { "Range": "bytes=" + entry.Offset + "-" + (entry.Offset + entry.Length - 1) },
+        success: function(text, status, xhr) {
+            if (xhr.status != 206 && text.length > entry.Length) {
+                // Range not supported by the server, we got the whole file
+                text = text.substr(entry.Offset, entry.Length);
+            }
+            var report = JSON.parse(text);
+            var date = Object.keys(report)[0];
+            callback(date, report[date]);
+        }
+    });
+}
 
+function selectButton(evt, className) {
+    tablinks = document.getElementsByClassName(className);
+    for (i = 0; i < tablinks.length; i++) {
+        tablinks[i].className = tablinks[i].className.replace(" active", "");
+    }
+    evt.currentTarget.className += " active";
+}
 
+function loadLQI(evt, id, idx) {
+    selectButton(evt, "tablinks2");
+    fetchSnapshot(ReportsManifest.Reports.LQI[idx], function(date, data) {
+        LQIlist = Object.keys(data);
+        orderlist = sortProperties(LQIlist);
+        OutResultContents = "";
+        DrawTable(date, data, id);
+        DrawGraph(date, data, id);
+        OutResultContents += '</div>';
+        $('#LQIContent').html(OutResultContents);
+        document.getElementById('LQI-' + id + '_' + date).style.display = "block";
+        LQIGraph(id, date, Matrix[date], MatrixId[date]);
+    });
+}
 
+function loadNetwork(evt, id, idx) {
+    selectButton(evt, "tablinks3");
+    fetchSnapshot(ReportsManifest.Reports.Network[idx], function(date, data) {
+        var txt = "<br><H2>" + dateFormat(parseInt(date) * 1000, "dd/mm/yyyy HH:MM") + "</H2><table border=1><tr><th>Channel</th><th>Interference</th></tr>";
+        $.each(data, function(channel, value) {
+            txt += "<tr><td>" + channel + "</td><td>" + value + "</td></tr>";
+        });
+        txt += "</table>";
+        $('#NETContent').html(txt);
+    });
 }
 
 function readConf(id, data) {
@@ -409,37 +368,12 @@ function LQIGraph(id, date, matriX, matrixid) {
         });
     }
 
-}
-
-function NETGraph(id, date, matriX) {
-
-
 }
 
 function n(n) {
     return n > 9 ? "" + n : "0" + n;
 }
 
-function PrintLQIGraph(id) {
-    console.log('Print Graph :' + id + ', data : ' + LQIdata);
-    for (ii = 0; ii < Object.keys(LQIdata).length; ii++) {
-        var datelist = Object.keys(LQIdata);
-        console.log("Graph for :" + id + ', date : ' + datelist[ii]);
-        //console.log('Graph(' + id + ',' + datelist[ii] + ', ' + Matrix[datelist[ii]] + ',' + MatrixId[datelist[ii]] + ');');
-        LQIGraph(id, datelist[ii], Matrix[datelist[ii]], MatrixId[datelist[ii]]);
-    }
-}
-
-function PrintNETGraph(id) {
-    console.log('Print Graph :' + id + ', data : ' + LQIdata);
-    for (ii = 0; ii < Object.keys(NETdata).length; ii++) {
-        var datelist = Object.keys(NETdata);
-        console.log("Graph for :" + id + ', date : ' + datelist[ii]);
-        //console.log('Graph(' + id + ',' + datelist[ii] + ', ' + Matrix[datelist[ii]] + ',' + MatrixId[datelist[ii]] + ');');
-        NETGraph(id, datelist[ii], NETdata[datelist[ii]]);
-    }
-}
-
 function ReadHxIDx() {
     $.domoticzurl = ""; //"http://localhost:8080";
     $.getJSON($.domoticzurl + "/json.htm", {
@@ -458,12 +392,10 @@ function ReadHxIDx() {
             }
             //console.log(txtHW);
             $('#ZigateHwLoad').html(txtHW);
-            NetworkFile = 'Network_scan-' + HwIDX + '.txt.json';
-            LQIFile = 'LQI_reports-' + HwIDX + '.txt.json';
             ConfFile = 'PluginConf-' + HwIDX + '.txt';
             GetDevs(HwIDX);
-            readTXT(ReportsFolder + LQIFile, HwIDX, "LQI");
-            readTXT(ReportsFolder + NetworkFile, HwIDX, "Network");
+            readLQISummary(HwIDX);
+            readManifest(HwIDX);
             readTXT(ConfFolder + ConfFile, HwIDX, "Conf");
 
         });